@@ -1,14 +1,39 @@
-import io
-import re
 import tempfile
+from functools import partial
 from pathlib import Path
-from datetime import datetime
 
 import pandas as pd
 import streamlit as st
-from openpyxl.styles import Font, Alignment, Border, Side
-from openpyxl.worksheet.page import PageMargins
-from openpyxl.utils import get_column_letter
+
+from create_inspection_forms import (
+    JOURNAL_LAYOUT_SHEETS,
+    JOURNAL_LAYOUT_SINGLE,
+    create_order_workbook,
+    create_vendor_journal_workbook,
+    format_inspection_workbook,
+)
+from header_probe import (
+    HOKUBU_TEMPLATE,
+    MARUHACHI_TAG,
+    MARUHACHI_TEMPLATE,
+    PROCESSED_KENSHU,
+    RAW_KENSHU,
+)
+from incremental_journal import create_vendor_journal_incremental
+from inspection_batch import format_inspection_batch
+from instrumentation import recent_traces, stage
+from kenshu_consolidate import (
+    create_consolidated_order_workbook,
+    create_consolidated_vendor_journal,
+)
+from job_pool import get_job_pool
+from kenshu_frame import enable_copy_on_write
+from kenshu_diff import create_delta_order_workbook
+from output_store import get_output_store, store_generated
+from profiling import PROFILE_ENABLED, profile_summary, recent_profiles
+from result_cache import get_result_cache
+from ui_jobs import run_generation, upload_matches
+
 # 補助機能は、ファイル不足や内部エラーでアプリ全体が停止しないよう安全に読み込む
 MARUHACHI_IMPORT_ERROR = None
 HOKUBU_IMPORT_ERROR = None
@@ -21,14 +46,22 @@ except Exception as exc:
 
 try:
     from create_order_form_hokubu import generate_hokubu_order_forms_both_facilities
+    from supplier_templates import (
+        LAYOUT_SHEETS as HOKUBU_LAYOUT_SHEETS,
+        LAYOUT_SINGLE as HOKUBU_LAYOUT_SINGLE,
+    )
 except Exception as exc:
     generate_hokubu_order_forms_both_facilities = None
+    HOKUBU_LAYOUT_SHEETS = HOKUBU_LAYOUT_SINGLE = None
     HOKUBU_IMPORT_ERROR = exc
 # ------------------------------------------------------------
 # Streamlit 基本設定
 # ------------------------------------------------------------
 st.set_page_config(page_title="発注・検収サポートシステム", layout="wide")
 
+# 作成処理は pandas の copy-on-write を前提にする（pages/ の画面も同じ）
+enable_copy_on_write()
+
 # ------------------------------------------------------------
 # 🌸 Streamlit かわいい安定版テーマ
 # ------------------------------------------------------------
@@ -313,1284 +346,224 @@ def apply_cute_theme():
 apply_cute_theme()
 
 # ------------------------------------------------------------
-# 共通ユーティリティ
-# ------------------------------------------------------------
-def parse_mmdd(value: str):
-    """文字列 '12/8月' などから月日だけ抜き出して datetime に変換"""
-    if value is None:
-        return None
-    s = str(value)
-    m = re.search(r"\d+/\d+", s)
-    if not m:
-        return None
-    try:
-        return datetime.strptime(m.group(), "%m/%d").replace(year=2000)
-    except Exception:
-        return None
-
-
-# ------------------------------------------------------------
-# ①・② 共通 Excel印刷書式
-# A3縦 / 罫線 / 納品日区切り線 / 行高26 / 文字16
+# ④・⑤ テンプレート発注書（一時フォルダで作成して出力ストアへ移す）
 # ------------------------------------------------------------
-def apply_inspection_print_style(ws):
-    # 基本フォント
-    body_font = Font(
-        name="ＭＳ ゴシック",
-        size=16
-    )
-
-    header_font = Font(
-        name="ＭＳ ゴシック",
-        size=16,
-        bold=True
-    )
-
-    # 罫線
-    thin = Side(
-        style="thin",
-        color="000000"
-    )
-
-    medium = Side(
-        style="medium",
-        color="000000"
-    )
-
-    thin_border = Border(
-        left=thin,
-        right=thin,
-        top=thin,
-        bottom=thin
-    )
-
-    # A3縦
-    ws.page_setup.paperSize = ws.PAPERSIZE_A3
-    ws.page_setup.orientation = ws.ORIENTATION_PORTRAIT
-
-    ws.sheet_properties.pageSetUpPr.fitToPage = True
-    ws.page_setup.fitToWidth = 1
-    ws.page_setup.fitToHeight = 0
-
-    ws.print_options.horizontalCentered = True
-
-    ws.page_margins = PageMargins(
-        left=0.25,
-        right=0.25,
-        top=0.35,
-        bottom=0.35,
-        header=0.15,
-        footer=0.15
-    )
-
-    # 全セル
-    for row in range(1, ws.max_row + 1):
-        ws.row_dimensions[row].height = 26
-
-        for col in range(1, ws.max_column + 1):
-            cell = ws.cell(
-                row=row,
-                column=col
+def build_maruhachi_order_files(kenshu_bytes, template_bytes, tag_bytes):
+    with tempfile.TemporaryDirectory() as td:
+        td = Path(td)
+
+        k_path = td / "kenshu.xlsx"
+        t_path = td / "template.xlsm"
+        m_path = td / "tag.xlsm"
+
+        k_path.write_bytes(kenshu_bytes)
+        t_path.write_bytes(template_bytes)
+        m_path.write_bytes(tag_bytes)
+
+        out_dir = td / "out"
+
+        tokuyou_xlsm, yuhouse_xlsm = (
+            generate_maruhachi_order_forms_both_facilities(
+                kenshu_xlsx_path=k_path,
+                template_xlsm_path=t_path,
+                tag_xlsm_path=m_path,
+                out_dir=out_dir,
+                out_prefix="丸八発注書",
             )
+        )
 
-            if row == 1:
-                cell.font = header_font
-                cell.alignment = Alignment(
-                    horizontal="center",
-                    vertical="center",
-                    wrap_text=True
-                )
-            else:
-                cell.font = body_font
-                cell.alignment = Alignment(
-                    vertical="center",
-                    wrap_text=False
-                )
-
-            cell.border = thin_border
+        store = get_output_store()
 
-    # 見出し名と列番号
-    header_map = {}
+        with stage("output_store.put"):
+            return (
+                store.put_file(tokuyou_xlsm),
+                store.put_file(yuhouse_xlsm),
+            )
 
-    for col in range(1, ws.max_column + 1):
-        value = ws.cell(
-            row=1,
-            column=col
-        ).value
 
-        if value is not None:
-            header_map[str(value).strip()] = col
+def build_hokubu_order_files(kenshu_bytes, template_bytes, layout=HOKUBU_LAYOUT_SHEETS):
+    with tempfile.TemporaryDirectory() as td:
+        td = Path(td)
 
-    # 納品日が変わったら上に太線
-    delivery_col = header_map.get("納品日")
+        k_path = td / "kenshu.xlsx"
+        t_path = td / "template.xlsm"
 
-    if delivery_col is not None:
-        previous_value = None
+        k_path.write_bytes(kenshu_bytes)
+        t_path.write_bytes(template_bytes)
 
-        for row in range(2, ws.max_row + 1):
-            current_value = ws.cell(
-                row=row,
-                column=delivery_col
-            ).value
+        out_dir = td / "out"
 
-            current_text = (
-                ""
-                if current_value is None
-                else str(current_value).strip()
+        tokuyou_xlsm, yuhouse_xlsm = (
+            generate_hokubu_order_forms_both_facilities(
+                kenshu_xlsx_path=k_path,
+                template_xlsm_path=t_path,
+                out_dir=out_dir,
+                out_prefix="北部市場発注書",
+                layout=layout,
             )
+        )
 
-            if row == 2:
-                previous_value = current_text
-                continue
-
-            if current_text != previous_value:
-                for col in range(1, ws.max_column + 1):
-                    cell = ws.cell(
-                        row=row,
-                        column=col
-                    )
-
-                    cell.border = Border(
-                        left=thin,
-                        right=thin,
-                        top=medium,
-                        bottom=thin
-                    )
-
-            previous_value = current_text
-
-    # 列幅
-    width_map = {
-        "納品日": 15,
-        "使用日": 15,
-        "朝昼夕": 11,
-        "仕入先": 24,
-        "食品名": 38,
-        "換算値": 13,
-        "総合計": 13,
-        "単位": 11,
-        "特養入所者": 15,
-        "特養職員": 15,
-        "ユーハウス": 15,
-        "コメント": 28,
-    }
+        store = get_output_store()
 
-    for header, width in width_map.items():
-        col_num = header_map.get(header)
-
-        if col_num is not None:
-            letter = get_column_letter(col_num)
-            ws.column_dimensions[letter].width = width
-
-    # 食品名は左揃え
-    food_col = header_map.get("食品名")
-
-    if food_col is not None:
-        for row in range(2, ws.max_row + 1):
-            ws.cell(
-                row=row,
-                column=food_col
-            ).alignment = Alignment(
-                horizontal="left",
-                vertical="center",
-                wrap_text=False,
-                shrink_to_fit=True
+        with stage("output_store.put"):
+            return (
+                store.put_file(tokuyou_xlsm),
+                store.put_file(yuhouse_xlsm),
             )
 
-    # 印刷範囲
-    ws.print_area = (
-        f"A1:"
-        f"{get_column_letter(ws.max_column)}"
-        f"{ws.max_row}"
-    )
-
-    # 各ページに見出し行を表示
-    ws.print_title_rows = "1:1"
-
-def detect_min_usage_date_token(df, col="使用日"):
-    """使用日の最も古い日付を MMDD 形式 '1208' のように返す"""
-    if col not in df.columns:
-        return ""
-
-    dt_list = [
-        parse_mmdd(v)
-        for v in df[col]
-    ]
-
-    dt_list = [
-        d
-        for d in dt_list
-        if d is not None
-    ]
-
-    if not dt_list:
-        return ""
-
-    return min(dt_list).strftime("%m%d")
 
 # ------------------------------------------------------------
-# ① 検収簿整形ロジック（修正版：不要列を削除）
+# 作成済みファイルのダウンロード（出力ストアから読み出す）
 # ------------------------------------------------------------
-def _is_blank(value):
-    """Excelの空白セル（NaN、None、空文字、空白だけの文字列）を判定する。"""
-    return pd.isna(value) or (isinstance(value, str) and value.strip() == "")
-
-
-def apply_ek_blank_rows_and_f_zero(df):
-    """VBA「EK空行削除_後にF空白へ0」と同じデータ整形を行う。
-
-    元ファイルの見出し行は pandas が読み取る際に除外されているため、
-    ここではデータ行だけを対象にする。
-    """
-    if df.shape[1] >= 11:
-        # ExcelのE～K列（0始まりでは4～10）がすべて空白の行を削除
-        ek_all_blank = df.iloc[:, 4:11].apply(
-            lambda row: all(_is_blank(value) for value in row), axis=1
-        )
-        df = df.loc[~ek_all_blank].copy()
-
-    if df.shape[1] >= 6:
-        # ExcelのF列（0始まりでは5）の空白を0で埋める
-        f_col = df.columns[5]
-        f_blank = df[f_col].map(_is_blank)
-        df.loc[f_blank, f_col] = 0
-
-    return df
-
-
-def format_inspection_workbook(uploaded_file):
-    df = pd.read_excel(uploaded_file, header=[6, 7])
-
-    # VBA「EK空行削除_後にF空白へ0」を自動適用
-    df = apply_ek_blank_rows_and_f_zero(df)
-
-    # ------------------------------------------------------------
-    # MultiIndex → フラット化
-    # ------------------------------------------------------------
-    flat_cols = []
-
-    for top, sub in df.columns:
-        top = "" if str(top).startswith("Unnamed") else str(top)
-        sub = "" if str(sub).startswith("Unnamed") else str(sub)
-
-        if top == "":
-            flat_cols.append(sub)
-
-        elif sub == "":
-            flat_cols.append(top)
-
-        else:
-            flat_cols.append(f"{top}_{sub}")
-
-    df.columns = flat_cols
-
-    # ------------------------------------------------------------
-    # 換算値の空白を0
-    # ------------------------------------------------------------
-    if "換算値" in df.columns:
-        conversion_blank = df["換算値"].map(_is_blank)
-        df.loc[conversion_blank, "換算値"] = 0
-
-    # ------------------------------------------------------------
-    # 欠損補完
-    # ------------------------------------------------------------
-    for col in ["納品日", "使用日", "朝昼夕", "仕入先"]:
-        if col in df.columns:
-            df[col] = df[col].ffill()
-
-    # ------------------------------------------------------------
-    # 朝昼夕の並び順
-    # ------------------------------------------------------------
-    order_map = {
-        "朝食": 1,
-        "昼食": 2,
-        "夕食": 3,
-    }
-
-    df["食事順"] = (
-        df["朝昼夕"]
-        .map(order_map)
-        .fillna(0)
-    )
-
-    # ------------------------------------------------------------
-    # ソート
-    # ------------------------------------------------------------
-    df = df.sort_values(
-        ["使用日", "食事順", "食品名"]
-    )
-
-    # ------------------------------------------------------------
-    # 特養・ユーハウスの元列を検索
-    # ------------------------------------------------------------
-
-    # 特養入所者
-    iwato_in = [
-        c for c in df.columns
-        if (
-            "いわと" in str(c)
-            and "入所" in str(c)
-            and "職員" not in str(c)
-        )
-    ]
-
-    # 特養職員
-    iwato_staff = [
-        c for c in df.columns
-        if (
-            "いわと" in str(c)
-            and "職員" in str(c)
-        )
-    ]
-
-    # ユーハウス
-    yuhouse_in = [
-        c for c in df.columns
-        if (
-            (
-                "ケアハウス" in str(c)
-                or "ユーハウス" in str(c)
-                or "ユー" in str(c)
-            )
-            and (
-                "入所者" in str(c)
-                or "入居者" in str(c)
-                or "入" in str(c)
-            )
-            and "職員" not in str(c)
-        )
-    ]
-
-    # ------------------------------------------------------------
-    # 必要列
-    # ------------------------------------------------------------
-    needed_cols = [
-        "納品日",
-        "使用日",
-        "朝昼夕",
-        "仕入先",
-        "食品名",
-        "換算値",
-        "総合計",
-        "単位",
-    ]
-
-    if iwato_in:
-        needed_cols.append(iwato_in[0])
-
-    if iwato_staff:
-        needed_cols.append(iwato_staff[0])
-
-    if yuhouse_in:
-        needed_cols.append(yuhouse_in[0])
-
-    # 実際に存在する列だけ残す
-    needed_cols = [
-        c for c in needed_cols
-        if c in df.columns
-    ]
-
-    df_out = df[needed_cols].copy()
-
-    # ------------------------------------------------------------
-    # ★列名を統一
-    # ------------------------------------------------------------
-    rename_map = {}
-
-    if iwato_in:
-        rename_map[iwato_in[0]] = "特養入所者"
-
-    if iwato_staff:
-        rename_map[iwato_staff[0]] = "特養職員"
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+XLSM_MIME = "application/vnd.ms-excel.sheet.macroEnabled.12"
+ZIP_MIME = "application/zip"
 
-    if yuhouse_in:
-        rename_map[yuhouse_in[0]] = "ユーハウス"
 
-    df_out = df_out.rename(
-        columns=rename_map
-    )
-
-    # ------------------------------------------------------------
-    # 必須の数量列が取得できたか確認
-    # ------------------------------------------------------------
-    missing_facility_cols = []
-
-    if "特養入所者" not in df_out.columns:
-        missing_facility_cols.append("特養入所者")
-
-    if "特養職員" not in df_out.columns:
-        missing_facility_cols.append("特養職員")
-
-    if "ユーハウス" not in df_out.columns:
-        missing_facility_cols.append("ユーハウス")
-
-    if missing_facility_cols:
-        raise ValueError(
-            "検収簿から次の数量列を取得できませんでした："
-            + "、".join(missing_facility_cols)
-            + "。元の検収記録簿の見出しを確認してください。"
-        )
-
-    # ------------------------------------------------------------
-    # 換算値を再確認
-    # ------------------------------------------------------------
-    if "換算値" in df_out.columns:
-        conversion_blank = (
-            df_out["換算値"]
-            .map(_is_blank)
-        )
-
-        df_out.loc[
-            conversion_blank,
-            "換算値"
-        ] = 0
-
-    # ------------------------------------------------------------
-    # Excel出力
-    # ------------------------------------------------------------
-    buffer = io.BytesIO()
-
-    with pd.ExcelWriter(
-        buffer,
-        engine="openpyxl"
-    ) as writer:
-
-        df_out.to_excel(
-            writer,
-            index=False,
-            sheet_name="検収簿"
-        )
-
-        ws = writer.book["検収簿"]
+def output_download_button(label, state_key, mime, key):
+    handle = st.session_state.get(state_key)
 
-        apply_inspection_print_style(ws)
+    if handle is None:
+        return
 
-    buffer.seek(0)
+    store = get_output_store()
 
-    token = detect_min_usage_date_token(
-        df_out,
-        "使用日"
-    )
+    if not store.exists(handle):
+        st.session_state.pop(state_key, None)
+        st.info("作成済みファイルの保存期間が過ぎました。もう一度作成してください。")
+        return
 
-    fname = (
-        f"検収簿_加工済_{token}.xlsx"
-        if token
-        else "検収簿_加工済.xlsx"
+    st.download_button(
+        label=label,
+        data=partial(store.read_bytes, handle),
+        file_name=handle.file_name,
+        mime=mime,
+        key=key,
+        use_container_width=True,
     )
 
-    return buffer.read(), fname
 
 # ------------------------------------------------------------
-# 業者別仕訳表 作成ロジック
+# 複数の加工済み検収簿をまとめたときの行数一覧
 # ------------------------------------------------------------
-def _safe_sheet_name(value, used_names):
-    """仕入先名をExcelで使用可能な一意のシート名へ変換する。"""
-    name = str(value).strip() if not pd.isna(value) else "仕入先未設定"
-    name = re.sub(r'[\\/*?:\[\]]', '＿', name)
-    name = name[:31] or "仕入先未設定"
-
-    base = name
-    index = 2
-    while name in used_names:
-        suffix = f"_{index}"
-        name = f"{base[:31 - len(suffix)]}{suffix}"
-        index += 1
-
-    used_names.add(name)
-    return name
-
-
-def create_vendor_journal_workbook(uploaded_file):
-    """加工済み検収簿から、仕入先ごとの仕訳表を作成する。"""
-
-    # ------------------------------------------------------------
-    # Excel読み込み
-    # ------------------------------------------------------------
-    df = pd.read_excel(uploaded_file)
-
-    if "仕入先" not in df.columns:
-        raise ValueError(
-            "『仕入先』列が見つかりません。"
-            "検収簿（加工済）を選択してください。"
-        )
-
-    # ------------------------------------------------------------
-    # 列名を統一
-    # ------------------------------------------------------------
-    rename_map = {}
-
-    for col in df.columns:
-        col_text = str(col)
-
-        if (
-            "介護老人福祉施設いわと" in col_text
-            and "入所者" in col_text
-        ):
-            rename_map[col] = "特養入所者"
-
-        elif (
-            "介護老人福祉施設いわと" in col_text
-            and "職員" in col_text
-        ):
-            rename_map[col] = "特養職員"
-
-        elif (
-            (
-                "ケアハウス" in col_text
-                or "ユーハウス" in col_text
-                or "ユー" in col_text
-            )
-            and (
-                "入所者" in col_text
-                or "入居者" in col_text
-            )
-            and "職員" not in col_text
-        ):
-            rename_map[col] = "ユーハウス"
-
-    df = df.rename(
-        columns=rename_map
-    )
-
-    # ------------------------------------------------------------
-    # 必須列チェック
-    # ------------------------------------------------------------
-    required_headers = [
-        "単位",
-        "特養入所者",
-        "特養職員",
-        "ユーハウス",
-    ]
-
-    missing_headers = [
-        name
-        for name in required_headers
-        if name not in df.columns
-    ]
-
-    if missing_headers:
-        raise ValueError(
-            "必要な列が見つかりません: "
-            + "、".join(missing_headers)
-            + "。検収簿（加工済）の見出しを確認してください。"
-        )
-
-    # ------------------------------------------------------------
-    # コメント列を最後へ
-    # ------------------------------------------------------------
-    if "コメント" in df.columns:
-        comment_values = df.pop(
-            "コメント"
-        )
-        df["コメント"] = (
-            comment_values
-        )
-    else:
-        df["コメント"] = ""
-
-    # ------------------------------------------------------------
-    # 仕入先の空欄処理
-    # ------------------------------------------------------------
-    df["仕入先"] = (
-        df["仕入先"]
-        .fillna("仕入先未設定")
-        .astype(str)
-        .str.strip()
-    )
-
-    df.loc[
-        df["仕入先"] == "",
-        "仕入先"
-    ] = "仕入先未設定"
-
-    # ------------------------------------------------------------
-    # Excel出力
-    # ------------------------------------------------------------
-    buffer = io.BytesIO()
-
-    used_names = set()
-
-    with pd.ExcelWriter(
-        buffer,
-        engine="openpyxl"
-    ) as writer:
-
-        for (
-            table_index,
-            (vendor, vendor_df)
-        ) in enumerate(
-            df.groupby(
-                "仕入先",
-                sort=True
-            ),
-            start=1
-        ):
-
-            # ----------------------------------------------------
-            # シート名
-            # ----------------------------------------------------
-            sheet_name = (
-                _safe_sheet_name(
-                    vendor,
-                    used_names
-                )
-            )
-
-            vendor_df = (
-                vendor_df
-                .reset_index(
-                    drop=True
-                )
-            )
+def show_consolidation_summary(state_key):
+    summary = st.session_state.get(state_key)
 
-            # ----------------------------------------------------
-            # Excelへ書き込み
-            # ----------------------------------------------------
-            vendor_df.to_excel(
-                writer,
-                sheet_name=sheet_name,
-                index=False
-            )
-
-            ws = writer.book[
-                sheet_name
-            ]
-
-            # ----------------------------------------------------
-            # ①・② 共通の印刷書式を適用
-            # ----------------------------------------------------
-            apply_inspection_print_style(
-                ws
-            )
-
-    # ------------------------------------------------------------
-    # 出力ファイル名
-    # ------------------------------------------------------------
-    buffer.seek(0)
+    if not summary:
+        return
 
-    token = (
-        detect_min_usage_date_token(
-            df,
-            "使用日"
-        )
+    st.caption(
+        "複数のファイルを1つにまとめました（期間が重なった行は、先に選んだファイルの行を使います）。"
     )
-
-    fname = (
-        f"業者別仕訳表_{token}.xlsx"
-        if token
-        else "業者別仕訳表.xlsx"
+    st.dataframe(
+        pd.DataFrame(
+            {
+                "ファイル": [s.source_name for s in summary],
+                "行数": [s.rows for s in summary],
+                "使用した行": [s.kept for s in summary],
+                "重複で除いた行": [s.duplicates for s in summary],
+            }
+        ),
+        hide_index=True,
+        use_container_width=True,
     )
 
-    return buffer.read(), fname
-
 
 # ------------------------------------------------------------
-# 注文書 書式設定（いわと／ユーハウス共通）
+# 🩺 診断パネル（処理段階ごとの所要時間・メモリ、混雑状況、キャッシュ）
 # ------------------------------------------------------------
-def apply_order_style(ws, is_tokuyou=False):
-    font_body = Font(name="ＭＳ ゴシック", size=18)
-    border = Border(
-        left=Side("thin"),
-        right=Side("thin"),
-        top=Side("thin"),
-        bottom=Side("thin")
+def show_diagnostics_panel():
+    st.markdown("---")
+    st.markdown("### 🩺 診断パネル")
+
+    c1, c2 = st.columns(2)
+
+    with c1:
+        st.caption("作成処理の混雑状況")
+        st.json(get_job_pool().snapshot())
+
+    with c2:
+        st.caption("作成結果キャッシュ")
+        st.json(get_result_cache().stats())
+
+    traces = recent_traces()
+
+    if not traces:
+        st.info("まだ作成処理の記録がありません。")
+        return
+
+    st.caption("直近の作成処理")
+    st.dataframe(
+        pd.DataFrame(
+            [
+                {
+                    "開始": t["started_at"],
+                    "処理": t["name"],
+                    "秒": t["total_seconds"],
+                    "ピークMB": t["peak_mb"],
+                    "エラー": t["error"] or "",
+                }
+                for t in traces
+            ]
+        ),
+        hide_index=True,
+        use_container_width=True,
     )
 
-    header_row = 6
-
-    # --- 6行目：ヘッダー行 ---
-    for cell in ws[header_row]:
-        cell.font = Font(name="ＭＳ ゴシック", size=12, bold=True)
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-        cell.border = border
-
-    # --- 7行目以降：データ行 ---
-    for row in ws.iter_rows(min_row=header_row + 1):
-        for c in row:
-            c.font = font_body
-            c.border = border
-            c.alignment = Alignment(
-                vertical="center",
-                wrap_text=False,      # 折り返しなし
-            )
-
-    # --- 行高 ---
-    for i in range(1, ws.max_row + 1):
-        ws.row_dimensions[i].height = 30
-
-    # ------------------------------------------------------------
-    # 列幅設定（注文書仕様）
-    # ------------------------------------------------------------
-
-    # A列：使用日
-    ws.column_dimensions["A"].width = 15.18
-
-    # B列：食品名（広く）
-    ws.column_dimensions["B"].width = 60.09
-
-    # D〜H列：7.73 に変更（数量・単位・確認欄）
-    for col in ["D", "E", "F", "G", "H"]:
-        ws.column_dimensions[col].width = 7.73
-
-    # C・I・J・K・L・M は 15.18
-    for col in ["C", "I", "J", "K", "L", "M"]:
-        ws.column_dimensions[col].width = 15.18
-
-    # 特養用マクロの指定
-    if is_tokuyou:
-        for col in ["I", "L", "M"]:
-            ws.column_dimensions[col].width = 7
-
-        # C～E列の外枠を太線にする（内側の罫線は維持）
-        thick = Side(style="thick")
-        start_row = 6
-        end_row = ws.max_row
-        if end_row >= start_row:
-            for row in range(start_row, end_row + 1):
-                ws.cell(row, 3).border = Border(
-                    left=thick,
-                    right=ws.cell(row, 3).border.right,
-                    top=thick if row == start_row else ws.cell(row, 3).border.top,
-                    bottom=thick if row == end_row else ws.cell(row, 3).border.bottom,
-                )
-                ws.cell(row, 5).border = Border(
-                    left=ws.cell(row, 5).border.left,
-                    right=thick,
-                    top=thick if row == start_row else ws.cell(row, 5).border.top,
-                    bottom=thick if row == end_row else ws.cell(row, 5).border.bottom,
-                )
-            for col in range(3, 6):
-                ws.cell(start_row, col).border = Border(
-                    left=ws.cell(start_row, col).border.left,
-                    right=ws.cell(start_row, col).border.right,
-                    top=thick,
-                    bottom=ws.cell(start_row, col).border.bottom,
-                )
-                ws.cell(end_row, col).border = Border(
-                    left=ws.cell(end_row, col).border.left,
-                    right=ws.cell(end_row, col).border.right,
-                    top=ws.cell(end_row, col).border.top,
-                    bottom=thick,
-                )
-
-    # ------------------------------------------------------------
-    # B列（食品名）を縮小して全体表示
-    # ------------------------------------------------------------
-    for row in ws.iter_rows(min_row=7, max_row=ws.max_row, min_col=2, max_col=2):
-        for cell in row:
-            cell.alignment = Alignment(
-                horizontal="left",
-                vertical="center",
-                wrap_text=False,        # 折り返しなし
-                shrink_to_fit=True      # 縮小して全体を表示
-            )
-
-    # ------------------------------------------------------------
-    # 印刷設定
-    # ------------------------------------------------------------
-    ws.page_setup.orientation = "landscape"
-    ws.page_setup.paperSize = ws.PAPERSIZE_A4
-    ws.page_margins = PageMargins(left=0.3, right=0.3, top=0.5, bottom=0.5)
-
-    # 印刷範囲（A〜M列）
-    ws.print_area = f"A1:M{ws.max_row}"
-
-
-
-# ------------------------------------------------------------
-# ヘッダー（いわと）
-# ------------------------------------------------------------
-def create_header_iwato(ws, supplier):
-    ws.merge_cells("A3:B3")
-    ws["A3"] = f"{supplier} 御中"
-    ws["A3"].font = Font(name="ＭＳ ゴシック", size=28, bold=True)
-
-    ws["B1"] = "注文書（介護老人福祉施設いわと）"
-    ws["B1"].alignment = Alignment(horizontal="center")
-    ws["B1"].font = Font(name="ＭＳ ゴシック", size=26, bold=True)
-
-    ws["K3"] = "(有) ハートミール"
-    ws["K3"].alignment = Alignment(horizontal="right")
-    ws["K3"].font = Font(name="ＭＳ ゴシック", size=24, bold=True)
-
-
-
-# ------------------------------------------------------------
-# ヘッダー（ユーハウス）
-# ------------------------------------------------------------
-def create_header_yuhouse(ws, supplier):
-    ws.merge_cells("A3:B3")
-    ws["A3"] = f"{supplier} 御中"
-    ws["A3"].font = Font(name="ＭＳ ゴシック", size=28, bold=True)
-
-    ws["B1"] = "注文書（ユーハウスいわと）"
-    ws["B1"].alignment = Alignment(horizontal="center")
-    ws["B1"].font = Font(name="ＭＳ ゴシック", size=26, bold=True)
-
-    ws["K3"] = "(有) ハートミール"
-    ws["K3"].alignment = Alignment(horizontal="right")
-    ws["K3"].font = Font(name="ＭＳ ゴシック", size=24, bold=True)
-
-
-# ------------------------------------------------------------
-# ③ 注文書作成
-# 特養 / ユーハウス
-# ------------------------------------------------------------
-def create_order_workbook(uploaded_file, order_type):
-
-    df = pd.read_excel(uploaded_file)
-
-    # ------------------------------------------------------------
-    # 基本必須列チェック
-    # ------------------------------------------------------------
-    required_cols = [
-        "使用日",
-        "仕入先",
-        "食品名",
-        "単位",
-    ]
-
-    missing_cols = [
-        c for c in required_cols
-        if c not in df.columns
-    ]
-
-    if missing_cols:
-        raise ValueError(
-            "必要な列が見つかりません："
-            + "、".join(missing_cols)
-            + "。①検収簿整形で作成した"
-              "加工済み検収簿を使用してください。"
-        )
-
-    # ------------------------------------------------------------
-    # 欠損補完
-    # ------------------------------------------------------------
-    for c in [
-        "使用日",
-        "仕入先",
-        "食品名",
-        "単位",
-    ]:
-        df[c] = df[c].ffill()
-
-    df["使用日"] = (
-        df["使用日"]
-        .astype(str)
+    labels = [f'{t["started_at"]}  {t["name"]}' for t in traces]
+    selected = st.selectbox("段階ごとの内訳", range(len(traces)), format_func=labels.__getitem__)
+
+    st.dataframe(
+        pd.DataFrame(traces[selected]["stages"]).rename(
+            columns={
+                "stage": "段階",
+                "calls": "回数",
+                "seconds": "秒",
+                "peak_mb": "ピークMB",
+            }
+        ),
+        hide_index=True,
+        use_container_width=True,
     )
 
-    # ------------------------------------------------------------
-    # 特養
-    # ------------------------------------------------------------
-    if "特養" in order_type:
-
-        raw_qty = "特養入所者"
-        raw_staff = "特養職員"
-
-        missing_tokuyou = []
-
-        if raw_qty not in df.columns:
-            missing_tokuyou.append(
-                "特養入所者"
-            )
-
-        if raw_staff not in df.columns:
-            missing_tokuyou.append(
-                "特養職員"
-            )
-
-        if missing_tokuyou:
-            raise ValueError(
-                "特養の数量列が見つかりません："
-                + "、".join(missing_tokuyou)
-                + "。①検収簿整形で作成した"
-                  "最新の加工済み検収簿を使用してください。"
-            )
-
-        df[raw_qty] = pd.to_numeric(
-            df[raw_qty],
-            errors="coerce"
-        ).fillna(0)
+    show_profiles()
 
-        df[raw_staff] = pd.to_numeric(
-            df[raw_staff],
-            errors="coerce"
-        ).fillna(0)
 
-    # ------------------------------------------------------------
-    # ユーハウス
-    # ------------------------------------------------------------
-    else:
+def show_profiles():
+    profiles = recent_profiles()
 
-        raw_qty = "ユーハウス"
-        raw_staff = None
+    st.markdown("#### 🔬 cProfile")
 
-        if raw_qty not in df.columns:
-            raise ValueError(
-                "『ユーハウス』列が見つかりません。"
-                "①検収簿整形で作成した"
-                "最新の加工済み検収簿を使用してください。"
-            )
+    if not profiles:
+        st.info(
+            "保存済みのプロファイルはありません。"
+            "サイドバーの「🔬 cProfile を取る」をオンにして作成すると保存されます。"
+        )
+        return
 
-        df[raw_qty] = pd.to_numeric(
-            df[raw_qty],
-            errors="coerce"
-        ).fillna(0)
-
-    # ------------------------------------------------------------
-    # 検収用空欄
-    # ------------------------------------------------------------
-    inspection_cols = [
-        "鮮度",
-        "品温",
-        "異物",
-        "包装",
-        "期限",
-        "備考欄",
-        "検収者",
+    labels = [
+        f"{p.created_at}  {p.name}  ({p.input_hash})"
+        for p in profiles
     ]
-
-    for c in inspection_cols:
-        if c not in df.columns:
-            df[c] = ""
-
-    # 納品日は空欄
-    df["納品日"] = ""
-
-    # ------------------------------------------------------------
-    # 仕入先整理
-    # ------------------------------------------------------------
-    df["仕入先"] = (
-        df["仕入先"]
-        .fillna("")
-        .astype(str)
-        .str.strip()
-    )
-
-    # 仕入先空欄は除外
-    df = df[
-        df["仕入先"] != ""
-    ].copy()
-
-    suppliers = (
-        df["仕入先"]
-        .drop_duplicates()
-        .tolist()
+    selected = st.selectbox(
+        "プロファイル",
+        range(len(profiles)),
+        format_func=labels.__getitem__,
+        key="profile_selector",
     )
+    record = profiles[selected]
 
-    if not suppliers:
-        raise ValueError(
-            "仕入先が見つかりません。"
-        )
-
-    # ------------------------------------------------------------
-    # Excel出力
-    # ------------------------------------------------------------
-    buffer = io.BytesIO()
-
-    used_sheet_names = set()
-    created_sheet_count = 0
-
-    with pd.ExcelWriter(
-        buffer,
-        engine="openpyxl"
-    ) as writer:
-
-        for supplier in suppliers:
-
-            sub = df[
-                df["仕入先"] == supplier
-            ].copy()
-
-            # ----------------------------------------------------
-            # 使用日で並び替え
-            # ----------------------------------------------------
-            sub["使用日_dt"] = (
-                sub["使用日"]
-                .apply(parse_mmdd)
-            )
-
-            sub = sub.sort_values(
-                [
-                    "使用日_dt",
-                    "食品名",
-                ],
-                na_position="last",
-            )
-
-            # ----------------------------------------------------
-            # 特養
-            # ----------------------------------------------------
-            if "特養" in order_type:
-
-                # 加工済み検収簿では
-                # 「特養入所者」「特養職員」を使用
-                sub = sub.rename(
-                    columns={
-                        "特養入所者": "入所者",
-                        "特養職員": "職員",
-                    }
-                )
-
-                qty_label = "入所者"
-                staff_label = "職員"
-
-                qty_values = pd.to_numeric(
-                    sub[qty_label],
-                    errors="coerce"
-                ).fillna(0)
-
-                staff_values = pd.to_numeric(
-                    sub[staff_label],
-                    errors="coerce"
-                ).fillna(0)
-
-                # ------------------------------------------------
-                # 入所者または職員の
-                # どちらかに数量があれば残す
-                # ------------------------------------------------
-                sub = sub.loc[
-                    (qty_values != 0)
-                    |
-                    (staff_values != 0)
-                ].copy()
-
-                if sub.empty:
-                    continue
-
-                # 再計算
-                qty_values = pd.to_numeric(
-                    sub[qty_label],
-                    errors="coerce"
-                ).fillna(0)
-
-                staff_values = pd.to_numeric(
-                    sub[staff_label],
-                    errors="coerce"
-                ).fillna(0)
-
-                # 0は注文書では空欄
-                sub[qty_label] = (
-                    sub[qty_label]
-                    .astype(object)
-                )
-
-                sub[staff_label] = (
-                    sub[staff_label]
-                    .astype(object)
-                )
-
-                sub.loc[
-                    qty_values == 0,
-                    qty_label
-                ] = ""
-
-                sub.loc[
-                    staff_values == 0,
-                    staff_label
-                ] = ""
-
-            # ----------------------------------------------------
-            # ユーハウス
-            # ----------------------------------------------------
-            else:
-
-                # 加工済み検収簿の
-                # 「ユーハウス」を使用
-                sub = sub.rename(
-                    columns={
-                        "ユーハウス":
-                        "ユーハウス入居者"
-                    }
-                )
-
-                qty_label = (
-                    "ユーハウス入居者"
-                )
-
-                staff_label = None
-
-                qty_values = pd.to_numeric(
-                    sub[qty_label],
-                    errors="coerce"
-                ).fillna(0)
-
-                # 数量0は除外
-                sub = sub.loc[
-                    qty_values != 0
-                ].copy()
-
-                if sub.empty:
-                    continue
-
-            # ----------------------------------------------------
-            # 出力列
-            # ----------------------------------------------------
-            col_order = [
-                "使用日",
-                "食品名",
-                qty_label,
-                "単位",
-            ]
-
-            if staff_label:
-                col_order.append(
-                    staff_label
-                )
-
-            col_order += [
-                "鮮度",
-                "品温",
-                "異物",
-                "包装",
-                "期限",
-                "備考欄",
-                "納品日",
-                "検収者",
-            ]
-
-            for c in col_order:
-                if c not in sub.columns:
-                    sub[c] = ""
-
-            sub = sub[
-                col_order
-            ].copy()
-
-            # ----------------------------------------------------
-            # 同じ使用日は最初だけ表示
-            # ----------------------------------------------------
-            sub["使用日"] = (
-                sub["使用日"].mask(
-                    sub["使用日"]
-                    .duplicated(),
-                    ""
-                )
-            )
-
-            # ----------------------------------------------------
-            # Excelシート名
-            # ----------------------------------------------------
-            sheet_name = re.sub(
-                r'[\\/*?:\[\]]',
-                '＿',
-                str(supplier)
-            )
-
-            sheet_name = (
-                sheet_name[:31]
-                or "仕入先"
-            )
-
-            base_sheet_name = (
-                sheet_name
-            )
-
-            index = 2
-
-            while (
-                sheet_name
-                in used_sheet_names
-            ):
-                suffix = f"_{index}"
-
-                sheet_name = (
-                    base_sheet_name[
-                        :31 - len(suffix)
-                    ]
-                    + suffix
-                )
-
-                index += 1
-
-            used_sheet_names.add(
-                sheet_name
-            )
-
-            # ----------------------------------------------------
-            # Excelへ書き込み
-            # ----------------------------------------------------
-            sub.to_excel(
-                writer,
-                sheet_name=sheet_name,
-                index=False,
-                startrow=5,
-            )
-
-            created_sheet_count += 1
-
-            ws = writer.book[
-                sheet_name
-            ]
-
-            apply_order_style(
-                ws,
-                is_tokuyou=(
-                    "特養"
-                    in order_type
-                ),
-            )
-
-            # ----------------------------------------------------
-            # ヘッダー
-            # ----------------------------------------------------
-            if "特養" in order_type:
+    st.caption("累積時間（cumulative）の上位")
+    st.code(profile_summary(record.path), language=None)
 
-                create_header_iwato(
-                    ws,
-                    supplier
-                )
-
-            else:
-
-                create_header_yuhouse(
-                    ws,
-                    supplier
-                )
-
-                ws["C6"] = (
-                    "ユーハウス入居者"
-                )
-
-        # --------------------------------------------------------
-        # 数量ありのシートが0件
-        # --------------------------------------------------------
-        if created_sheet_count == 0:
-            raise ValueError(
-                "注文数量が入力されている"
-                "データが見つかりませんでした。"
-            )
-
-    # ------------------------------------------------------------
-    # ファイル名
-    # ------------------------------------------------------------
-    token = detect_min_usage_date_token(
-        df,
-        "使用日"
+    st.download_button(
+        label="📥 .pstats をダウンロード",
+        data=partial(record.path.read_bytes),
+        file_name=record.file_name,
+        mime="application/octet-stream",
+        key="download_profile",
     )
 
-    if "特養" in order_type:
-        base_name = (
-            "注文書_いわと"
-        )
-    else:
-        base_name = (
-            "注文書_ユーハウス"
-        )
-
-    if token:
-        fname = (
-            f"{base_name}_{token}.xlsx"
-        )
-    else:
-        fname = (
-            f"{base_name}.xlsx"
-        )
-
-    buffer.seek(0)
-
-    return buffer.read(), fname
-
 
 # ------------------------------------------------------------
 # ------------------------------------------------------------
@@ -1641,6 +614,17 @@ with st.sidebar:
         '</div>'
     )
 
+    show_diagnostics = st.toggle("🩺 診断パネル", key="show_diagnostics")
+
+    if show_diagnostics:
+        st.toggle(
+            "🔬 cProfile を取る",
+            value=PROFILE_ENABLED,
+            disabled=PROFILE_ENABLED,
+            key="profile_generation",
+            help="作成処理を cProfile で計測し直し、段階ごとのメモリのピークも記録します（キャッシュは使いません）。",
+        )
+
 
 # ============================================================
 # ① 検収簿整形
@@ -1661,40 +645,117 @@ if page == "① 検収簿整形":
         '</div>',
     )
 
-    ins_file = st.file_uploader(
-        "📄 検収簿（原本 Excel）をアップロード",
-        type=["xlsx"],
-        key="ins",
+    ins_batch = st.toggle(
+        "📚 複数のファイルをまとめて整形する",
+        key="ins_batch_mode",
+        help="週ごと・施設ごとの原本をまとめて選ぶと、同時に整形して ZIP でダウンロードできます。",
     )
 
-    if ins_file is not None:
+    ins_file = None
+
+    if ins_batch:
+        ins_files = st.file_uploader(
+            "📄 検収簿（原本 Excel）をまとめてアップロード",
+            type=["xlsx"],
+            accept_multiple_files=True,
+            key="ins_batch_files",
+        )
+
+        ins_files = [
+            f for f in ins_files or []
+            if upload_matches(f, RAW_KENSHU)
+        ]
+
+        if ins_files:
+            if st.button(
+                f"📘 {len(ins_files)}件の検収簿をまとめて整形する",
+                key="btn_ins_batch",
+                use_container_width=True,
+            ):
+                try:
+                    (
+                        st.session_state["ins_batch_output"],
+                        st.session_state["ins_batch_status"],
+                    ) = run_generation(
+                        "① 検収簿整形（一括）",
+                        store_generated,
+                        format_inspection_batch,
+                        [(f.name, f.getvalue()) for f in ins_files],
+                        uploads=ins_files,
+                        options={"names": [f.name for f in ins_files]},
+                    )
+                except Exception as e:
+                    st.session_state.pop("ins_batch_output", None)
+                    st.session_state.pop("ins_batch_status", None)
+                    st.error("検収簿の一括整形中にエラーが発生しました。")
+                    st.exception(e)
+
+            statuses = st.session_state.get("ins_batch_status")
+
+            if statuses:
+                ok_count = sum(s.ok for s in statuses)
+
+                if ok_count == len(statuses):
+                    st.success(f"🌸 {ok_count}件の検収簿を整形しました！")
+                else:
+                    st.warning(
+                        f"⚠ {len(statuses)}件中 {len(statuses) - ok_count}件は整形できませんでした。"
+                    )
+
+                st.dataframe(
+                    pd.DataFrame(
+                        {
+                            "ファイル": [s.source_name for s in statuses],
+                            "結果": ["✅ 完了" if s.ok else "❌ エラー" for s in statuses],
+                            "出力ファイル": [s.output_name for s in statuses],
+                            "所要時間（秒）": [s.seconds for s in statuses],
+                            "内容": [s.message for s in statuses],
+                        }
+                    ),
+                    hide_index=True,
+                    use_container_width=True,
+                )
+
+                if ok_count:
+                    output_download_button(
+                        "📥 検収簿（加工済）をまとめてダウンロード（ZIP）",
+                        "ins_batch_output",
+                        ZIP_MIME,
+                        key="download_inspection_batch",
+                    )
+
+    else:
+        ins_file = st.file_uploader(
+            "📄 検収簿（原本 Excel）をアップロード",
+            type=["xlsx"],
+            key="ins",
+        )
+
+    if upload_matches(ins_file, RAW_KENSHU):
         if st.button(
             "📘 検収簿を整形する",
             key="btn_ins",
             use_container_width=True,
         ):
             try:
-                (
-                    st.session_state["ins_data"],
-                    st.session_state["ins_fname"],
-                ) = format_inspection_workbook(ins_file)
+                st.session_state["ins_output"] = run_generation(
+                    "① 検収簿整形",
+                    store_generated,
+                    format_inspection_workbook,
+                    ins_file,
+                    uploads=[ins_file],
+                )
                 st.success("🌸 検収簿の整形が完了しました！")
             except Exception as e:
                 st.error("検収簿の整形中にエラーが発生しました。")
                 st.exception(e)
 
-        if (
-            "ins_data" in st.session_state
-            and "ins_fname" in st.session_state
-        ):
-            st.download_button(
-                label="📥 検収簿（加工済）をダウンロード",
-                data=st.session_state["ins_data"],
-                file_name=st.session_state["ins_fname"],
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key="download_inspection",
-                use_container_width=True,
-            )
+        output_download_button(
+            "📥 検収簿（加工済）をダウンロード",
+            "ins_output",
+            XLSX_MIME,
+            key="download_inspection",
+        )
 
 
 # ============================================================
@@ -1715,37 +776,99 @@ elif page == "② 業者別仕訳表":
         '</div>',
     )
 
-    vendor_file = st.file_uploader(
-        "📄 検収簿（加工済 Excel）をアップロード",
+    vendor_files = st.file_uploader(
+        "📄 検収簿（加工済 Excel）をアップロード（複数選ぶと1つにまとめます）",
         type=["xlsx"],
+        accept_multiple_files=True,
         key="vendor_journal_src",
     )
 
-    if vendor_file is not None:
+    vendor_files = [
+        f for f in vendor_files or []
+        if upload_matches(f, PROCESSED_KENSHU)
+    ]
+
+    journal_layouts = {
+        "仕入先ごとのシート": JOURNAL_LAYOUT_SHEETS,
+        "1シート（仕入先ごとに改ページ）": JOURNAL_LAYOUT_SINGLE,
+    }
+
+    journal_layout = journal_layouts[
+        st.radio(
+            "出力形式",
+            list(journal_layouts),
+            horizontal=True,
+            key="vendor_journal_layout",
+            help="1シートにまとめると、仕入先が多いときにファイルが軽くなり、早く開けます。"
+                 "印刷すると、どちらも仕入先ごとに新しいページから始まります。",
+        )
+    ]
+
+    if vendor_files:
         try:
             if st.button(
                 "📊 業者別仕訳表を作成する",
                 key="btn_vendor_journal",
                 use_container_width=True,
             ):
-                (
-                    st.session_state["vendor_journal_data"],
-                    st.session_state["vendor_journal_fname"],
-                ) = create_vendor_journal_workbook(vendor_file)
+                if len(vendor_files) == 1 and journal_layout == JOURNAL_LAYOUT_SINGLE:
+                    st.session_state["vendor_journal_output"] = run_generation(
+                        "② 業者別仕訳表",
+                        store_generated,
+                        create_vendor_journal_workbook,
+                        vendor_files[0],
+                        journal_layout,
+                        uploads=vendor_files,
+                        options={"layout": journal_layout},
+                    )
+                    st.session_state.pop("vendor_journal_summary", None)
+
+                elif len(vendor_files) == 1:
+                    # 同じ期間の前回の出力があれば、変わった仕入先のシートだけ作り直す
+                    (
+                        st.session_state["vendor_journal_output"],
+                        incremental,
+                    ) = run_generation(
+                        "② 業者別仕訳表",
+                        create_vendor_journal_incremental,
+                        vendor_files[0],
+                        uploads=vendor_files,
+                    )
+                    st.session_state.pop("vendor_journal_summary", None)
+
+                    if incremental.reused:
+                        st.info(
+                            f"前回の出力から変わった {incremental.rendered} 件の仕入先だけを作り直しました"
+                            f"（{incremental.sheet_count} シート中）。"
+                        )
+
+                else:
+                    (
+                        st.session_state["vendor_journal_output"],
+                        st.session_state["vendor_journal_summary"],
+                    ) = run_generation(
+                        "② 業者別仕訳表（まとめ）",
+                        store_generated,
+                        create_consolidated_vendor_journal,
+                        [(f.name, f.getvalue()) for f in vendor_files],
+                        journal_layout,
+                        uploads=vendor_files,
+                        options={
+                            "names": [f.name for f in vendor_files],
+                            "layout": journal_layout,
+                        },
+                    )
+
                 st.success("🌸 業者別仕訳表の作成が完了しました！")
 
-            if (
-                "vendor_journal_data" in st.session_state
-                and "vendor_journal_fname" in st.session_state
-            ):
-                st.download_button(
-                    label="📥 業者別仕訳表をダウンロード",
-                    data=st.session_state["vendor_journal_data"],
-                    file_name=st.session_state["vendor_journal_fname"],
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    key="download_vendor_journal",
-                    use_container_width=True,
-                )
+            show_consolidation_summary("vendor_journal_summary")
+
+            output_download_button(
+                "📥 業者別仕訳表をダウンロード",
+                "vendor_journal_output",
+                XLSX_MIME,
+                key="download_vendor_journal",
+            )
         except Exception as e:
             st.error("業者別仕訳表の作成中にエラーが発生しました。")
             st.exception(e)
@@ -1779,9 +902,10 @@ elif page == "③ 注文書作成":
         key="order_type",
     )
 
-    order_file = st.file_uploader(
-        "📄 注文書のもとになる検収簿 Excel",
+    order_files = st.file_uploader(
+        "📄 注文書のもとになる検収簿 Excel（複数選ぶと1つにまとめます）",
         type=["xlsx"],
+        accept_multiple_files=True,
         key="order_src",
     )
 
@@ -1789,10 +913,14 @@ elif page == "③ 注文書作成":
         "① 検収簿整形で作成した「検収簿_加工済」ファイルを使用してください。"
     )
 
-    if order_file is not None:
+    order_files = [
+        f for f in order_files or []
+        if upload_matches(f, PROCESSED_KENSHU)
+    ]
+
+    if order_files:
         current_file_id = (
-            order_file.name,
-            order_file.size,
+            tuple((f.name, f.size) for f in order_files),
             order_type,
         )
 
@@ -1800,8 +928,8 @@ elif page == "③ 注文書作成":
 
         if previous_file_id != current_file_id:
             st.session_state["order_current_file_id"] = current_file_id
-            st.session_state.pop("order_data", None)
-            st.session_state.pop("order_fname", None)
+            st.session_state.pop("order_output", None)
+            st.session_state.pop("order_summary", None)
 
         if st.button(
             "📗 注文書を作成する",
@@ -1809,30 +937,131 @@ elif page == "③ 注文書作成":
             use_container_width=True,
         ):
             try:
-                order_bytes, order_fname = create_order_workbook(
-                    order_file,
-                    order_type,
-                )
-                st.session_state["order_data"] = order_bytes
-                st.session_state["order_fname"] = order_fname
+                if len(order_files) == 1:
+                    st.session_state["order_output"] = run_generation(
+                        "③ 注文書作成",
+                        store_generated,
+                        create_order_workbook,
+                        order_files[0],
+                        order_type,
+                        uploads=order_files,
+                        options={"order_type": order_type},
+                    )
+                    st.session_state.pop("order_summary", None)
+
+                else:
+                    (
+                        st.session_state["order_output"],
+                        st.session_state["order_summary"],
+                    ) = run_generation(
+                        "③ 注文書作成（まとめ）",
+                        store_generated,
+                        create_consolidated_order_workbook,
+                        [(f.name, f.getvalue()) for f in order_files],
+                        order_type,
+                        uploads=order_files,
+                        options={
+                            "order_type": order_type,
+                            "names": [f.name for f in order_files],
+                        },
+                    )
+
                 st.success(f"🌸 {order_type} の注文書を作成しました！")
             except Exception as e:
-                st.session_state.pop("order_data", None)
-                st.session_state.pop("order_fname", None)
+                st.session_state.pop("order_output", None)
+                st.session_state.pop("order_summary", None)
                 st.error("注文書作成中にエラーが発生しました。")
                 st.exception(e)
 
+        show_consolidation_summary("order_summary")
+
+        output_download_button(
+            "📥 注文書ファイルをダウンロード",
+            "order_output",
+            XLSX_MIME,
+            key="download_order",
+        )
+
+    # --------------------------------------------------------
+    # 訂正版の検収簿が届いたとき（変わった行だけの注文書）
+    # --------------------------------------------------------
+    with st.expander("🔁 訂正版の検収簿から、変わった行だけの注文書を作成"):
+        st.caption(
+            "前回の検収簿_加工済と訂正版を、使用日・仕入先・食品名・単位で突き合わせ、"
+            "注文数量が追加・取消・変更された行がある仕入先だけの注文書を作成します。"
+            "変わった内容は備考欄に表示します（取消の行は数量を 0 とし、前回の数量を備考欄に表示）。"
+        )
+
+        diff_old = st.file_uploader(
+            "📄 前回の検収簿_加工済",
+            type=["xlsx"],
+            key="order_diff_old",
+        )
+        diff_new = st.file_uploader(
+            "📄 訂正版の検収簿_加工済",
+            type=["xlsx"],
+            key="order_diff_new",
+        )
+
         if (
-            "order_data" in st.session_state
-            and "order_fname" in st.session_state
+            upload_matches(diff_old, PROCESSED_KENSHU)
+            and upload_matches(diff_new, PROCESSED_KENSHU)
         ):
-            st.download_button(
-                label="📥 注文書ファイルをダウンロード",
-                data=st.session_state["order_data"],
-                file_name=st.session_state["order_fname"],
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key="download_order",
+            current_diff_id = (
+                diff_old.file_id,
+                diff_new.file_id,
+                order_type,
+            )
+
+            if st.session_state.get("order_diff_file_id") != current_diff_id:
+                st.session_state["order_diff_file_id"] = current_diff_id
+                st.session_state.pop("order_diff_output", None)
+                st.session_state.pop("order_diff_summary", None)
+
+            if st.button(
+                "🔁 変わった行だけの注文書を作成する",
+                key="btn_order_diff",
                 use_container_width=True,
+            ):
+                try:
+                    (
+                        st.session_state["order_diff_output"],
+                        st.session_state["order_diff_summary"],
+                    ) = run_generation(
+                        "③ 注文書作成（差分）",
+                        store_generated,
+                        create_delta_order_workbook,
+                        diff_old,
+                        diff_new,
+                        order_type,
+                        uploads=[diff_old, diff_new],
+                        options={"order_type": order_type},
+                    )
+                except ValueError as e:
+                    st.session_state.pop("order_diff_output", None)
+                    st.session_state.pop("order_diff_summary", None)
+                    st.warning(str(e))
+                except Exception as e:
+                    st.session_state.pop("order_diff_output", None)
+                    st.session_state.pop("order_diff_summary", None)
+                    st.error("差分の注文書作成中にエラーが発生しました。")
+                    st.exception(e)
+
+            diff_summary = st.session_state.get("order_diff_summary")
+
+            if diff_summary is not None:
+                st.success(
+                    f"🌸 {len(diff_summary.suppliers)} 社分の注文書を作成しました"
+                    f"（追加 {diff_summary.added} 行・取消 {diff_summary.removed} 行・"
+                    f"変更 {diff_summary.changed} 行）。"
+                )
+                st.caption("対象の仕入先：" + "、".join(diff_summary.suppliers))
+
+            output_download_button(
+                "📥 差分の注文書をダウンロード",
+                "order_diff_output",
+                XLSX_MIME,
+                key="download_order_diff",
             )
 
 
@@ -1866,6 +1095,7 @@ elif page == "④ 丸八発注書作成":
             type=["xlsx"],
             key="kenshu_maruhachi",
         )
+        kenshu_ok = upload_matches(kenshu_file, PROCESSED_KENSHU)
 
     with mcol2:
         st.html(
@@ -1879,6 +1109,7 @@ elif page == "④ 丸八発注書作成":
             type=["xlsm"],
             key="tpl_maruhachi",
         )
+        template_ok = upload_matches(template_file, MARUHACHI_TEMPLATE)
 
     with mcol3:
         st.html(
@@ -1892,6 +1123,7 @@ elif page == "④ 丸八発注書作成":
             type=["xlsm"],
             key="tag_maruhachi",
         )
+        tag_ok = upload_matches(tag_file, MARUHACHI_TAG)
 
     btn = st.button(
         "📦 丸八発注書を作成",
@@ -1908,73 +1140,55 @@ elif page == "④ 丸八発注書作成":
         elif not (kenshu_file and template_file and tag_file):
             st.warning("⚠ 3つのファイルをすべて選択してください。")
 
+        elif not (kenshu_ok and template_ok and tag_ok):
+            st.warning("⚠ 種類の違うファイルがあります。上の案内に沿って選び直してください。")
+
         else:
             try:
                 with st.spinner("丸八発注書を作成しています…"):
-                    with tempfile.TemporaryDirectory() as td:
-                        td = Path(td)
-
-                        k_path = td / "kenshu.xlsx"
-                        t_path = td / "template.xlsm"
-                        m_path = td / "tag.xlsm"
-
-                        k_path.write_bytes(kenshu_file.getbuffer())
-                        t_path.write_bytes(template_file.getbuffer())
-                        m_path.write_bytes(tag_file.getbuffer())
-
-                        out_dir = td / "out"
-
-                        tokuyou_xlsm, yuhouse_xlsm = (
-                            generate_maruhachi_order_forms_both_facilities(
-                                kenshu_xlsx_path=k_path,
-                                template_xlsm_path=t_path,
-                                tag_xlsm_path=m_path,
-                                out_dir=out_dir,
-                                out_prefix="丸八発注書",
-                            )
-                        )
-
-                        st.session_state["maruhachi_tokuyou_data"] = tokuyou_xlsm.read_bytes()
-                        st.session_state["maruhachi_tokuyou_fname"] = tokuyou_xlsm.name
-                        st.session_state["maruhachi_yuhouse_data"] = yuhouse_xlsm.read_bytes()
-                        st.session_state["maruhachi_yuhouse_fname"] = yuhouse_xlsm.name
+                    (
+                        st.session_state["maruhachi_tokuyou_output"],
+                        st.session_state["maruhachi_yuhouse_output"],
+                    ) = run_generation(
+                        "④ 丸八発注書",
+                        build_maruhachi_order_files,
+                        kenshu_file.getvalue(),
+                        template_file.getvalue(),
+                        tag_file.getvalue(),
+                        uploads=[kenshu_file, template_file, tag_file],
+                        options={"facility_mode": ["tokuyou", "yuhouse"]},
+                    )
 
                 st.success("🌸 丸八発注書を作成しました！")
 
             except Exception as e:
-                st.session_state.pop("maruhachi_tokuyou_data", None)
-                st.session_state.pop("maruhachi_tokuyou_fname", None)
-                st.session_state.pop("maruhachi_yuhouse_data", None)
-                st.session_state.pop("maruhachi_yuhouse_fname", None)
+                st.session_state.pop("maruhachi_tokuyou_output", None)
+                st.session_state.pop("maruhachi_yuhouse_output", None)
                 st.error("丸八発注書の作成中にエラーが発生しました。")
                 st.exception(e)
 
     if (
-        "maruhachi_tokuyou_data" in st.session_state
-        and "maruhachi_yuhouse_data" in st.session_state
+        "maruhachi_tokuyou_output" in st.session_state
+        and "maruhachi_yuhouse_output" in st.session_state
     ):
         st.markdown("### 📥 作成済みファイル")
 
         dcol1, dcol2 = st.columns(2)
 
         with dcol1:
-            st.download_button(
+            output_download_button(
                 "📥 特養：丸八発注書",
-                data=st.session_state["maruhachi_tokuyou_data"],
-                file_name=st.session_state["maruhachi_tokuyou_fname"],
-                mime="application/vnd.ms-excel.sheet.macroEnabled.12",
+                "maruhachi_tokuyou_output",
+                XLSM_MIME,
                 key="download_maruhachi_tokuyou",
-                use_container_width=True,
             )
 
         with dcol2:
-            st.download_button(
+            output_download_button(
                 "📥 ユーハウス：丸八発注書",
-                data=st.session_state["maruhachi_yuhouse_data"],
-                file_name=st.session_state["maruhachi_yuhouse_fname"],
-                mime="application/vnd.ms-excel.sheet.macroEnabled.12",
+                "maruhachi_yuhouse_output",
+                XLSM_MIME,
                 key="download_maruhachi_yuhouse",
-                use_container_width=True,
             )
 
 
@@ -2010,6 +1224,7 @@ elif page == "⑤ 北部市場発注書作成":
             type=["xlsx"],
             key="hokubu_kenshu",
         )
+        hokubu_kenshu_ok = upload_matches(hokubu_kenshu, PROCESSED_KENSHU)
 
     with hcol2:
         st.html(
@@ -2023,6 +1238,23 @@ elif page == "⑤ 北部市場発注書作成":
             type=["xlsm"],
             key="hokubu_tpl",
         )
+        hokubu_template_ok = upload_matches(hokubu_template, HOKUBU_TEMPLATE)
+
+    hokubu_layouts = {
+        "ページごとのシート": HOKUBU_LAYOUT_SHEETS,
+        "1シート（ページごとに改ページ）": HOKUBU_LAYOUT_SINGLE,
+    }
+
+    hokubu_layout = hokubu_layouts[
+        st.radio(
+            "出力形式",
+            list(hokubu_layouts),
+            horizontal=True,
+            key="hokubu_layout",
+            help="1シートにまとめると、ページが多い月でもファイルが軽くなり、早く作成できます。"
+                 "印刷すると、どちらも同じページ割りになります。",
+        )
+    ]
 
     btn_hokubu = st.button(
         "🥕 北部市場発注書を作成",
@@ -2041,68 +1273,63 @@ elif page == "⑤ 北部市場発注書作成":
                 "⚠ 検収簿_加工済 と 北部市場テンプレートを両方選択してください。"
             )
 
+        elif not (hokubu_kenshu_ok and hokubu_template_ok):
+            st.warning("⚠ 種類の違うファイルがあります。上の案内に沿って選び直してください。")
+
         else:
             try:
                 with st.spinner("北部市場発注書を作成しています…"):
-                    with tempfile.TemporaryDirectory() as td:
-                        td = Path(td)
-
-                        k_path = td / "kenshu.xlsx"
-                        t_path = td / "template.xlsm"
-
-                        k_path.write_bytes(hokubu_kenshu.getbuffer())
-                        t_path.write_bytes(hokubu_template.getbuffer())
-
-                        out_dir = td / "out"
-
-                        tokuyou_xlsm, yuhouse_xlsm = (
-                            generate_hokubu_order_forms_both_facilities(
-                                kenshu_xlsx_path=k_path,
-                                template_xlsm_path=t_path,
-                                out_dir=out_dir,
-                                out_prefix="北部市場発注書",
-                            )
-                        )
-
-                        st.session_state["hokubu_tokuyou_data"] = tokuyou_xlsm.read_bytes()
-                        st.session_state["hokubu_tokuyou_fname"] = tokuyou_xlsm.name
-                        st.session_state["hokubu_yuhouse_data"] = yuhouse_xlsm.read_bytes()
-                        st.session_state["hokubu_yuhouse_fname"] = yuhouse_xlsm.name
+                    (
+                        st.session_state["hokubu_tokuyou_output"],
+                        st.session_state["hokubu_yuhouse_output"],
+                    ) = run_generation(
+                        "⑤ 北部市場発注書",
+                        build_hokubu_order_files,
+                        hokubu_kenshu.getvalue(),
+                        hokubu_template.getvalue(),
+                        hokubu_layout,
+                        uploads=[hokubu_kenshu, hokubu_template],
+                        options={
+                            "facility_mode": ["tokuyou", "yuhouse"],
+                            "layout": hokubu_layout,
+                        },
+                    )
 
                 st.success("🌸 北部市場発注書を作成しました！")
 
             except Exception as e:
-                st.session_state.pop("hokubu_tokuyou_data", None)
-                st.session_state.pop("hokubu_tokuyou_fname", None)
-                st.session_state.pop("hokubu_yuhouse_data", None)
-                st.session_state.pop("hokubu_yuhouse_fname", None)
+                st.session_state.pop("hokubu_tokuyou_output", None)
+                st.session_state.pop("hokubu_yuhouse_output", None)
                 st.error("北部市場発注書の作成中にエラーが発生しました。")
                 st.exception(e)
 
     if (
-        "hokubu_tokuyou_data" in st.session_state
-        and "hokubu_yuhouse_data" in st.session_state
+        "hokubu_tokuyou_output" in st.session_state
+        and "hokubu_yuhouse_output" in st.session_state
     ):
         st.markdown("### 📥 作成済みファイル")
 
         c1, c2 = st.columns(2)
 
         with c1:
-            st.download_button(
-                label="📥 特養：北部市場発注書",
-                data=st.session_state["hokubu_tokuyou_data"],
-                file_name=st.session_state["hokubu_tokuyou_fname"],
-                mime="application/vnd.ms-excel.sheet.macroEnabled.12",
+            output_download_button(
+                "📥 特養：北部市場発注書",
+                "hokubu_tokuyou_output",
+                XLSM_MIME,
                 key="download_hokubu_tokuyou",
-                use_container_width=True,
             )
 
         with c2:
-            st.download_button(
-                label="📥 ユーハウス：北部市場発注書",
-                data=st.session_state["hokubu_yuhouse_data"],
-                file_name=st.session_state["hokubu_yuhouse_fname"],
-                mime="application/vnd.ms-excel.sheet.macroEnabled.12",
+            output_download_button(
+                "📥 ユーハウス：北部市場発注書",
+                "hokubu_yuhouse_output",
+                XLSM_MIME,
                 key="download_hokubu_yuhouse",
-                use_container_width=True,
             )
+
+
+# ============================================================
+# 🩺 診断パネル
+# ============================================================
+if show_diagnostics:
+    show_diagnostics_panel()
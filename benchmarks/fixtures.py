@@ -0,0 +1,324 @@
+"""ベンチマーク用の疑似データ（検収記録簿・テンプレート・タグ）を作成する。
+
+献ダテマンの検収記録簿と同じく、7・8行目が2段見出し
+（format_inspection_workbook が header=[6, 7] で読む形）の原本を作る。
+行数・仕入先数・日付の範囲・施設列を指定できる。
+"""
+import random
+import sys
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Sequence
+
+import openpyxl
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from create_order_form_hokubu import (  # noqa: E402
+    DETAIL_END_ROW,
+    DETAIL_START_ROW,
+    SUPPLIER_NAME as HOKUBU_SUPPLIER,
+    TOKUYOU_DELIVERY_CELL,
+    TOKUYOU_SHEET,
+    YUHOUSE_DELIVERY_CELL,
+    YUHOUSE_SHEET,
+)
+from create_order_form_maruhachi import (  # noqa: E402
+    APPEND_MAX_ROWS,
+    APPEND_START_ROW,
+    FIXED_FIRST_ROW,
+    HEADER_CELL_FACILITY,
+    SUPPLIER_NAME as MARUHACHI_SUPPLIER,
+    TAG_SHEET_NAME,
+    TEMPLATE_SHEET_NAME_TOKUYOU,
+    TEMPLATE_SHEET_NAME_YUHOUSE,
+)
+
+
+# 原本の施設列（上段見出し, 下段見出し）
+DEFAULT_FACILITIES = (
+    ("介護老人福祉施設いわと", "入所者"),
+    ("介護老人福祉施設いわと", "職員"),
+    ("ケアハウスユーハウスいわと", "入居者"),
+    ("ケアハウスユーハウスいわと", "職員"),
+)
+
+BASIC_HEADERS = ["納品日", "使用日", "朝昼夕", "仕入先", "食品名", "換算値", "総合計", "単位"]
+
+MEALS = ["朝食", "昼食", "夕食"]
+WEEKDAYS = "月火水木金土日"
+UNITS = ["kg", "g", "個", "本", "パック", "袋", "丁", "束", "缶"]
+
+FOOD_WORDS = [
+    "にんじん", "たまねぎ", "じゃがいも", "キャベツ", "だいこん", "ほうれん草", "小松菜",
+    "ごぼう", "れんこん", "ブロッコリー", "白菜", "ねぎ", "きゅうり", "トマト", "なす",
+    "豚もも肉", "鶏むね肉", "牛こま切れ", "さけ切身", "さば切身", "たら切身", "むきえび",
+    "木綿豆腐", "絹豆腐", "油揚げ", "牛乳", "ヨーグルト", "卵", "食パン", "ロールパン",
+    "うどん", "そば", "中華めん", "りんご", "バナナ", "みかん缶", "しいたけ", "えのき",
+]
+FOOD_SUFFIXES = ["", "（カット）", "（冷凍）", "　国産", " 小", " 大", "（きざみ）"]
+
+# 丸八テンプレートの固定行に載せるコード数
+MARUHACHI_FIXED_CODES = APPEND_START_ROW - FIXED_FIRST_ROW - 4
+
+
+@dataclass
+class FixtureSet:
+    """ベンチマーク1回分の入力ファイル一式。"""
+
+    rows: int
+    raw_kenshu: Path
+    maruhachi_template: Path
+    maruhachi_tag: Path
+    hokubu_template: Path
+
+
+def _date_label(d: date) -> str:
+    return f"{d.month}/{d.day}{WEEKDAYS[d.weekday()]}"
+
+
+def _vendor_names(vendor_count: int) -> list[str]:
+    names = [MARUHACHI_SUPPLIER, HOKUBU_SUPPLIER]
+    i = 1
+    while len(names) < vendor_count:
+        names.append(f"仕入先{i:02d}商店")
+        i += 1
+    return names[:max(vendor_count, 2)]
+
+
+def _food_catalog(rng: random.Random, vendors: Sequence[str], per_vendor: int) -> dict[str, list[tuple[str, str]]]:
+    catalog = {}
+    for vendor in vendors:
+        foods = []
+        for _ in range(per_vendor):
+            name = rng.choice(FOOD_WORDS) + rng.choice(FOOD_SUFFIXES)
+            foods.append((name, rng.choice(UNITS)))
+        catalog[vendor] = foods
+    return catalog
+
+
+def maruhachi_food_names() -> list[str]:
+    """丸八のタグに載せる食品名（固定行に入るもの＋追記行に入るもの）。"""
+    return [f"丸八品目{i:02d}" for i in range(1, MARUHACHI_FIXED_CODES + 6)]
+
+
+def make_raw_kenshu_workbook(
+    path: str | Path,
+    rows: int,
+    vendor_count: int = 12,
+    days: int = 14,
+    facilities: Sequence[tuple[str, str]] = DEFAULT_FACILITIES,
+    start: date = date(2000, 12, 1),
+    blank_row_ratio: float = 0.05,
+    seed: int = 0,
+) -> Path:
+    """原本（検収記録簿）を作る。
+
+    同じ納品日・使用日・朝昼夕・仕入先の2行目以降は、原本と同じく空欄にする
+    （format_inspection_workbook の前方補完の対象）。blank_row_ratio の割合で
+    E～K列が空の区切り行も混ぜる。
+    """
+    rng = random.Random(seed)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    vendors = _vendor_names(vendor_count)
+    catalog = _food_catalog(rng, vendors, per_vendor=40)
+    maruhachi_foods = maruhachi_food_names()
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("検収記録簿")
+
+    width = len(BASIC_HEADERS) + len(facilities)
+
+    ws.append(["検収記録簿"] + [None] * (width - 1))
+    ws.append([f"期間：{_date_label(start)}～{_date_label(start + timedelta(days=days - 1))}"])
+    ws.append(["施設：介護老人福祉施設いわと／ユーハウスいわと"])
+    ws.append([None])
+    ws.append(["献ダテマン 出力"])
+    ws.append([None])
+
+    # 2段見出し（上段は施設名、下段は入所者・職員など）
+    top = list(BASIC_HEADERS)
+    sub = [None] * len(BASIC_HEADERS)
+    previous_top = None
+    for facility_top, facility_sub in facilities:
+        top.append(facility_top if facility_top != previous_top else None)
+        sub.append(facility_sub)
+        previous_top = facility_top
+    ws.append(top)
+    ws.append(sub)
+
+    written = 0
+    day_index = 0
+    while written < rows:
+        use_day = start + timedelta(days=day_index % days)
+        delivery_day = use_day - timedelta(days=1)
+        day_index += 1
+
+        for meal in MEALS:
+            for vendor in vendors:
+                if written >= rows:
+                    break
+
+                lines = rng.randint(1, 6)
+                first = True
+                for _ in range(lines):
+                    if written >= rows:
+                        break
+
+                    if vendor == MARUHACHI_SUPPLIER:
+                        food, unit = rng.choice(maruhachi_foods), "個"
+                    else:
+                        food, unit = rng.choice(catalog[vendor])
+
+                    quantities = []
+                    for _facility in facilities:
+                        q = rng.choice([0, 0, 1, 2, 3, 5, 0.5, 1.5, 10, 12])
+                        quantities.append(q if q else None)
+
+                    total = sum(q or 0 for q in quantities)
+                    conversion = rng.choice([None, 1, 1, 0.5, 2])
+
+                    head = (
+                        [_date_label(delivery_day), _date_label(use_day), meal, vendor]
+                        if first
+                        else [None, None, None, None]
+                    )
+                    ws.append(head + [food, conversion, total, unit] + quantities)
+                    first = False
+                    written += 1
+
+                    if written < rows and rng.random() < blank_row_ratio:
+                        ws.append([None] * width)
+                        written += 1
+
+    wb.save(path)
+    return path
+
+
+def make_maruhachi_template(path: str | Path) -> Path:
+    """丸八発注書テンプレート（特養・ユーハウスの2シート）を作る。"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+
+    foods = maruhachi_food_names()
+
+    for sheet_name in (TEMPLATE_SHEET_NAME_TOKUYOU, TEMPLATE_SHEET_NAME_YUHOUSE):
+        ws = wb.create_sheet(sheet_name)
+        ws["A1"] = "丸八ヒロタ 御中　発注書"
+        ws[HEADER_CELL_FACILITY] = "施設名"
+        for col, label in enumerate(["使用日", "コード", "品名", "品名2", "規格", "入所者", "職員"], start=1):
+            ws.cell(FIXED_FIRST_ROW - 1, col).value = label
+
+        for i in range(MARUHACHI_FIXED_CODES):
+            r = FIXED_FIRST_ROW + i
+            ws.cell(r, 2).value = f"M{i + 1:04d}"
+            ws.cell(r, 3).value = foods[i]
+            ws.row_dimensions[r].height = 22
+
+        for r in range(APPEND_START_ROW, APPEND_START_ROW + APPEND_MAX_ROWS):
+            ws.row_dimensions[r].height = 22
+
+        ws.column_dimensions["C"].width = 30
+        ws.print_area = f"A1:G{APPEND_START_ROW + APPEND_MAX_ROWS - 1}"
+
+    wb.save(path)
+    return path
+
+
+def make_maruhachi_tag(path: str | Path) -> Path:
+    """丸八コード一覧（タグシート）を作る。一部の食品はタグなし＝追記行になる。"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = TAG_SHEET_NAME
+    ws.append(["コード", "丸八品名", "規格", "ハートミール品名"])
+
+    foods = maruhachi_food_names()
+    for i, food in enumerate(foods[:MARUHACHI_FIXED_CODES + 2]):
+        ws.append([f"M{i + 1:04d}", f"丸八{food}", "1個", food])
+
+    wb.save(path)
+    return path
+
+
+def make_hokubu_template(path: str | Path) -> Path:
+    """北部市場発注書テンプレート（特養・ユーハウスの2シート）を作る。"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+
+    for sheet_name, delivery_cell, headers in (
+        (TOKUYOU_SHEET, TOKUYOU_DELIVERY_CELL, ["使用日", "品名", "", "入所者", "職員", "合計"]),
+        (YUHOUSE_SHEET, YUHOUSE_DELIVERY_CELL, ["使用日", "品名", "", "数量"]),
+    ):
+        ws = wb.create_sheet(sheet_name)
+        ws["A1"] = "北部市場販売 御中　発注書"
+        ws[delivery_cell] = "○月○日納品分"
+        for col, label in enumerate(headers, start=1):
+            ws.cell(DETAIL_START_ROW - 1, col).value = label or None
+        for r in range(DETAIL_START_ROW, DETAIL_END_ROW + 1):
+            ws.row_dimensions[r].height = 24
+        ws.column_dimensions["B"].width = 36
+
+    wb.save(path)
+    return path
+
+
+def make_fixture_set(
+    out_dir: str | Path,
+    rows: int,
+    vendor_count: int = 12,
+    days: int = 14,
+    facilities: Sequence[tuple[str, str]] = DEFAULT_FACILITIES,
+    seed: int = 0,
+) -> FixtureSet:
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    return FixtureSet(
+        rows=rows,
+        raw_kenshu=make_raw_kenshu_workbook(
+            out_dir / f"検収記録簿_原本_{rows}.xlsx",
+            rows=rows,
+            vendor_count=vendor_count,
+            days=days,
+            facilities=facilities,
+            seed=seed,
+        ),
+        maruhachi_template=make_maruhachi_template(out_dir / "丸八発注書テンプレ.xlsm"),
+        maruhachi_tag=make_maruhachi_tag(out_dir / "丸八コード一覧.xlsm"),
+        hokubu_template=make_hokubu_template(out_dir / "北部市場発注書テンプレート.xlsm"),
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="ベンチマーク用の疑似検収記録簿を作成する")
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--vendors", type=int, default=12)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fixtures = make_fixture_set(
+        args.out_dir,
+        rows=args.rows,
+        vendor_count=args.vendors,
+        days=args.days,
+        seed=args.seed,
+    )
+    print(fixtures)
@@ -0,0 +1,327 @@
+"""各作成機能（①～⑤・業者別発注書）の処理時間を行数ごとに計測する。
+
+例:
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 100000
+    python benchmarks/run_benchmarks.py --sizes 1000 --compare benchmarks/results/前回.json
+    IWATO_XLSX_COMPRESSION=store python benchmarks/run_benchmarks.py --compare benchmarks/results/default.json
+
+結果は JSON で保存し、--compare で前回の結果と比較できる（時間とファイルサイズの比）。
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import openpyxl  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from benchmarks.fixtures import make_fixture_set  # noqa: E402
+from create_inspection_forms import (  # noqa: E402
+    JOURNAL_LAYOUT_SINGLE,
+    create_order_workbook,
+    create_vendor_journal_workbook,
+    format_inspection_workbook,
+    iter_vendor_sheets,
+    prepare_vendor_journal_frame,
+    write_vendor_sheet,
+)
+from create_order_form_hokubu import generate_hokubu_order_forms_both_facilities  # noqa: E402
+from create_order_form_maruhachi import generate_maruhachi_order_forms_both_facilities  # noqa: E402
+from create_order_form_vendor_sheets import create_orders_from_vendor_sheets  # noqa: E402
+from incremental_journal import render_vendor_journal  # noqa: E402
+from inspection_batch import format_inspection_batch  # noqa: E402
+from kenshu_frame import enable_copy_on_write  # noqa: E402
+from kenshu_diff import create_delta_order_workbook  # noqa: E402
+from parallel_sheets import SHEET_WORKERS, render_sheets  # noqa: E402
+from supplier_templates import LAYOUT_SINGLE as HOKUBU_LAYOUT_SINGLE  # noqa: E402
+from xlsx_output import COMPRESSION, save_workbook  # noqa: E402
+
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# 一括整形で同時に渡すファイル数
+BATCH_FILES = 4
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def _size_of(result) -> int:
+    """作成結果（バイト列またはパス）の合計サイズ。"""
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    if isinstance(result, Path):
+        return result.stat().st_size
+    if isinstance(result, (tuple, list)):
+        return sum(_size_of(r) for r in result)
+    return 0
+
+
+def _save_only(path: Path):
+    """読み込み済みのブックを保存するだけの計測（読み込みは setup で1回だけ）。"""
+    books = []
+
+    def setup():
+        if not books:
+            books.append(openpyxl.load_workbook(path))
+
+    def save() -> bytes:
+        buffer = io.BytesIO()
+        save_workbook(books[0], buffer)
+        return buffer.getvalue()
+
+    save.setup = setup
+    return save
+
+
+def build_cases(fixtures, work_dir: Path):
+    """計測する関数と引数の一覧を作る（②以降は①の出力を入力にする）。"""
+    processed_bytes, _ = format_inspection_workbook(fixtures.raw_kenshu)
+    processed = work_dir / "検収簿_加工済.xlsx"
+    processed.write_bytes(processed_bytes)
+
+    journal_bytes, _ = create_vendor_journal_workbook(processed)
+    journal = work_dir / "業者別仕訳表.xlsx"
+    journal.write_bytes(journal_bytes)
+
+    # 差分作成: 前回の出力から1行だけ数量を変えたもの（1社分だけ作り直す）
+    journal_df = prepare_vendor_journal_frame(pd.read_excel(processed))
+    previous_journal, journal_manifest, _ = render_vendor_journal(journal_df)
+    changed_df = journal_df.copy()
+    changed_df.loc[0, "総合計"] += 1
+    journal_sheets = list(iter_vendor_sheets(journal_df))
+
+    # 訂正版: 先頭の行の数量だけを変えたもの（差分の注文書は1社分）
+    corrected_df = pd.read_excel(processed)
+    corrected_df.loc[0, "特養入所者"] = corrected_df["特養入所者"].fillna(0).iloc[0] + 1
+    corrected = work_dir / "検収簿_加工済_訂正.xlsx"
+    corrected_df.to_excel(corrected, index=False)
+
+    raw_bytes = Path(fixtures.raw_kenshu).read_bytes()
+    batch_files = [(f"原本_{i}.xlsx", raw_bytes) for i in range(BATCH_FILES)]
+
+    out_dir = work_dir / "out"
+
+    return {
+        "① format_inspection_workbook": lambda: format_inspection_workbook(
+            fixtures.raw_kenshu, ingest="pandas"
+        ),
+        "① format_inspection_workbook（stream）": lambda: format_inspection_workbook(
+            fixtures.raw_kenshu, ingest="stream"
+        ),
+        f"① format_inspection_batch（{BATCH_FILES}件）": lambda: format_inspection_batch(
+            batch_files
+        ),
+        "② create_vendor_journal_workbook": lambda: create_vendor_journal_workbook(processed),
+        # 上の ② との差が、シートを複数のプロセスで作成した効果
+        "② render_sheets（1プロセス）": lambda: render_sheets(
+            write_vendor_sheet, journal_sheets, max_workers=1
+        ),
+        "② create_vendor_journal_workbook（1シート）": lambda: create_vendor_journal_workbook(
+            processed, JOURNAL_LAYOUT_SINGLE
+        ),
+        "② render_vendor_journal（差分・1社変更）": lambda: render_vendor_journal(
+            changed_df, (previous_journal, journal_manifest)
+        ),
+        "③ create_order_workbook（特養）": lambda: create_order_workbook(
+            processed, "特養（介護老人福祉施設いわと）"
+        ),
+        "③ create_order_workbook（ユーハウス）": lambda: create_order_workbook(
+            processed, "ユーハウスいわと"
+        ),
+        "③ create_delta_order_workbook（訂正版との差分）": lambda: create_delta_order_workbook(
+            processed, corrected, "特養（介護老人福祉施設いわと）"
+        ),
+        "④ generate_maruhachi_order_forms_both_facilities": lambda: (
+            generate_maruhachi_order_forms_both_facilities(
+                kenshu_xlsx_path=processed,
+                template_xlsm_path=fixtures.maruhachi_template,
+                tag_xlsm_path=fixtures.maruhachi_tag,
+                out_dir=out_dir,
+            )
+        ),
+        "⑤ generate_hokubu_order_forms_both_facilities": lambda: (
+            generate_hokubu_order_forms_both_facilities(
+                kenshu_xlsx_path=processed,
+                template_xlsm_path=fixtures.hokubu_template,
+                out_dir=out_dir,
+            )
+        ),
+        "⑤ generate_hokubu_order_forms_both_facilities（1シート）": lambda: (
+            generate_hokubu_order_forms_both_facilities(
+                kenshu_xlsx_path=processed,
+                template_xlsm_path=fixtures.hokubu_template,
+                out_dir=out_dir,
+                layout=HOKUBU_LAYOUT_SINGLE,
+            )
+        ),
+        "create_orders_from_vendor_sheets": lambda: create_orders_from_vendor_sheets(
+            io.BytesIO(journal.read_bytes()), "いわと"
+        ),
+        # 圧縮の設定（IWATO_XLSX_COMPRESSION）ごとの比較用
+        "save_workbook（検収簿_加工済・保存のみ）": _save_only(processed),
+    }
+
+
+def measure(fn, repeat: int, trace_memory: bool) -> dict:
+    timings = []
+    output_bytes = 0
+
+    if hasattr(fn, "setup"):
+        fn.setup()
+
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+        output_bytes = _size_of(result)
+        del result
+
+    record = {
+        "seconds": round(min(timings), 4),
+        "seconds_all": [round(t, 4) for t in timings],
+        "output_bytes": output_bytes,
+    }
+
+    # tracemalloc は処理を遅くするため、時間計測とは別に1回だけ測る
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        record["peak_mb"] = round(peak / 1024 / 1024, 1)
+
+    return record
+
+
+def run(
+    sizes,
+    repeat: int = 1,
+    trace_memory: bool = False,
+    only: list[str] | None = None,
+    vendors: int = 12,
+    days: int = 14,
+) -> dict:
+    results = []
+
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as td:
+            td = Path(td)
+
+            t0 = time.perf_counter()
+            fixtures = make_fixture_set(td / "fixtures", rows=rows, vendor_count=vendors, days=days)
+            cases = build_cases(fixtures, td)
+            print(f"[{rows} 行] 疑似データ作成 {time.perf_counter() - t0:.1f} 秒", file=sys.stderr)
+
+            for name, fn in cases.items():
+                if only and not any(key in name for key in only):
+                    continue
+
+                record = measure(fn, repeat, trace_memory)
+                record.update({"function": name, "rows": rows})
+                results.append(record)
+
+                peak = f"  peak {record['peak_mb']} MB" if "peak_mb" in record else ""
+                print(f"[{rows} 行] {name}: {record['seconds']:.3f} 秒{peak}", file=sys.stderr)
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "openpyxl": openpyxl.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sheet_workers": SHEET_WORKERS,
+            "xlsx_compression": COMPRESSION,
+            "repeat": repeat,
+            "vendors": vendors,
+            "days": days,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict) -> str:
+    """前回の結果との比較表（比率 < 1 なら速くなった・小さくなった）。"""
+    base = {(r["function"], r["rows"]): r for r in baseline["results"]}
+    lines = [f"{'関数':<52} {'行数':>7} {'前回':>9} {'今回':>9} {'比率':>6} {'サイズ比':>8}"]
+
+    for r in current["results"]:
+        b = base.get((r["function"], r["rows"]))
+        if b is None:
+            continue
+        ratio = r["seconds"] / b["seconds"] if b["seconds"] else float("nan")
+        size_ratio = r["output_bytes"] / b["output_bytes"] if b["output_bytes"] else float("nan")
+        lines.append(
+            f"{r['function']:<52} {r['rows']:>7} {b['seconds']:>9.3f} {r['seconds']:>9.3f} {ratio:>6.2f} {size_ratio:>8.2f}"
+        )
+
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="発注・検収サポートシステムのベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--memory", action="store_true", help="tracemalloc でピークメモリも測る")
+    parser.add_argument("--only", nargs="+", help="関数名の一部で絞り込む（例: ① ③）")
+    parser.add_argument("--vendors", type=int, default=12)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--out", type=Path, help="結果 JSON の保存先")
+    parser.add_argument("--compare", type=Path, help="比較する前回の結果 JSON")
+    args = parser.parse_args(argv)
+
+    # アプリと同じく、作成処理は copy-on-write で動かす
+    enable_copy_on_write()
+
+    report = run(
+        args.sizes,
+        repeat=args.repeat,
+        trace_memory=args.memory,
+        only=args.only,
+        vendors=args.vendors,
+        days=args.days,
+    )
+
+    out = args.out or RESULTS_DIR / f"bench_{datetime.now():%Y%m%d_%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"結果を保存しました: {out}", file=sys.stderr)
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        print(compare(report, baseline))
+
+
+if __name__ == "__main__":
+    main()
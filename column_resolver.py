@@ -0,0 +1,119 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Optional
+
+
+# ------------------------------------------------------------
+# 見出しから列を探すルール
+# ルールは正規表現（先読み）に一度だけ変換し、見出しの並び
+# （タプル）ごとに結果を覚えておく。同じ出力形式のファイルが
+# 続くときは、列の走査をせずに結果を返す。
+# ------------------------------------------------------------
+CACHE_SIZE = 128
+
+
+@dataclass(frozen=True)
+class ColumnRule:
+    """見出しが all_of をすべて含み、any_of のどれかを含み、none_of を含まない列。"""
+
+    target: str
+    all_of: tuple[str, ...] = ()
+    any_of: tuple[str, ...] = ()
+    none_of: tuple[str, ...] = ()
+
+
+@lru_cache(maxsize=None)
+def _compile(rule: ColumnRule) -> re.Pattern:
+    parts = [f"(?=.*{re.escape(k)})" for k in rule.all_of]
+
+    if rule.any_of:
+        parts.append("(?=.*(?:" + "|".join(re.escape(k) for k in rule.any_of) + "))")
+
+    parts.extend(f"(?!.*{re.escape(k)})" for k in rule.none_of)
+
+    return re.compile("^" + "".join(parts), re.DOTALL)
+
+
+class ColumnResolver:
+    """ルールの順に、まだ使われていない最初の一致列を割り当てる。"""
+
+    def __init__(self, rules: Iterable[ColumnRule]):
+        self.rules = tuple(rules)
+        self._patterns = tuple((rule.target, _compile(rule)) for rule in self.rules)
+        self._resolve_cached = lru_cache(maxsize=CACHE_SIZE)(self._resolve)
+
+    def _resolve(self, headers: tuple[str, ...]) -> tuple[tuple[str, int], ...]:
+        used = set()
+        found = []
+
+        for target, pattern in self._patterns:
+            for position, header in enumerate(headers):
+                if position not in used and pattern.match(header):
+                    used.add(position)
+                    found.append((target, position))
+                    break
+
+        return tuple(found)
+
+    def resolve(self, columns) -> dict:
+        """{統一列名: 元の列} を返す（見つからない列は含まない）。"""
+        columns = list(columns)
+        headers = tuple(str(c) for c in columns)
+
+        return {
+            target: columns[position]
+            for target, position in self._resolve_cached(headers)
+        }
+
+    def rename_map(self, columns) -> dict:
+        """DataFrame.rename(columns=...) に渡す {元の列: 統一列名}。"""
+        return {
+            source: target
+            for target, source in self.resolve(columns).items()
+        }
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _find_keywords(headers: tuple[str, ...], keywords: tuple[str, ...]) -> Optional[str]:
+    pattern = _compile(ColumnRule("", all_of=keywords))
+
+    for header in headers:
+        if pattern.match(header):
+            return header
+
+    return None
+
+
+def find_column(columns, keywords: Iterable[str]) -> Optional[str]:
+    """keywords をすべて含む最初の列名（文字列）。見つからなければ None。"""
+    return _find_keywords(tuple(str(c) for c in columns), tuple(keywords))
+
+
+# ------------------------------------------------------------
+# 施設別の数量列
+# 原本の2段見出しは「介護老人福祉施設いわと_入所者」
+# 「ケアハウスユーハウスいわと_入居者」のようにつながる。
+# どちらの施設名にも「いわと」が入るため、特養はユーハウス側の
+# 名前を含まない列に限る。
+# ------------------------------------------------------------
+FACILITY_COLUMNS = ColumnResolver(
+    (
+        ColumnRule(
+            "特養入所者",
+            all_of=("いわと", "入所"),
+            none_of=("職員", "ケアハウス", "ユー"),
+        ),
+        ColumnRule(
+            "特養職員",
+            all_of=("いわと", "職員"),
+            none_of=("ケアハウス", "ユー"),
+        ),
+        ColumnRule(
+            "ユーハウス",
+            all_of=("入",),
+            any_of=("ケアハウス", "ユーハウス", "ユー"),
+            none_of=("職員",),
+        ),
+    )
+)
@@ -0,0 +1,1317 @@
+import io
+import re
+from datetime import datetime
+
+import pandas as pd
+from openpyxl.styles import Font, Alignment, Border, Side
+from openpyxl.worksheet.page import PageMargins
+from openpyxl.worksheet.pagebreak import Break
+from openpyxl.utils import get_column_letter
+
+from column_resolver import FACILITY_COLUMNS
+from instrumentation import stage, timed_exit, traced
+from kenshu_frame import compact_kenshu_frame, map_values, text_values
+from kenshu_history import record_processed_kenshu
+from kenshu_reader import read_raw_kenshu
+from parallel_sheets import render_sheets
+from xlsx_output import excel_writer
+
+
+# ------------------------------------------------------------
+# 共通ユーティリティ
+# ------------------------------------------------------------
+def parse_mmdd(value: str):
+    """文字列 '12/8月' などから月日だけ抜き出して datetime に変換"""
+    if value is None:
+        return None
+    s = str(value)
+    m = re.search(r"\d+/\d+", s)
+    if not m:
+        return None
+    try:
+        return datetime.strptime(m.group(), "%m/%d").replace(year=2000)
+    except Exception:
+        return None
+
+
+# ------------------------------------------------------------
+# ①・② 共通 Excel印刷書式
+# A3縦 / 罫線 / 納品日区切り線 / 行高26 / 文字16
+# page_starts の行の前では改ページし、納品日の区切り線も引き直す
+# （② を1シートにまとめるとき、仕入先ごとのシートと同じ印刷にする）。
+# ------------------------------------------------------------
+@traced()
+def apply_inspection_print_style(ws, page_starts=()):
+    # 基本フォント
+    body_font = Font(
+        name="ＭＳ ゴシック",
+        size=16
+    )
+
+    header_font = Font(
+        name="ＭＳ ゴシック",
+        size=16,
+        bold=True
+    )
+
+    # 罫線
+    thin = Side(
+        style="thin",
+        color="000000"
+    )
+
+    medium = Side(
+        style="medium",
+        color="000000"
+    )
+
+    thin_border = Border(
+        left=thin,
+        right=thin,
+        top=thin,
+        bottom=thin
+    )
+
+    # A3縦
+    ws.page_setup.paperSize = ws.PAPERSIZE_A3
+    ws.page_setup.orientation = ws.ORIENTATION_PORTRAIT
+
+    ws.sheet_properties.pageSetUpPr.fitToPage = True
+    ws.page_setup.fitToWidth = 1
+    ws.page_setup.fitToHeight = 0
+
+    ws.print_options.horizontalCentered = True
+
+    ws.page_margins = PageMargins(
+        left=0.25,
+        right=0.25,
+        top=0.35,
+        bottom=0.35,
+        header=0.15,
+        footer=0.15
+    )
+
+    # 最終行・最終列（ws.max_row / ws.max_column は呼ぶたびに
+    # 全セルを走査するため、ループの外で1回だけ求める）
+    max_row = ws.max_row
+    max_col = ws.max_column
+    page_starts = frozenset(page_starts)
+
+    # 全セル
+    for row in range(1, max_row + 1):
+        ws.row_dimensions[row].height = 26
+
+        for col in range(1, max_col + 1):
+            cell = ws.cell(
+                row=row,
+                column=col
+            )
+
+            if row == 1:
+                cell.font = header_font
+                cell.alignment = Alignment(
+                    horizontal="center",
+                    vertical="center",
+                    wrap_text=True
+                )
+            else:
+                cell.font = body_font
+                cell.alignment = Alignment(
+                    vertical="center",
+                    wrap_text=False
+                )
+
+            cell.border = thin_border
+
+    # 見出し名と列番号
+    header_map = {}
+
+    for col in range(1, max_col + 1):
+        value = ws.cell(
+            row=1,
+            column=col
+        ).value
+
+        if value is not None:
+            header_map[str(value).strip()] = col
+
+    # 納品日が変わったら上に太線
+    delivery_col = header_map.get("納品日")
+
+    if delivery_col is not None:
+        previous_value = None
+
+        for row in range(2, max_row + 1):
+            current_value = ws.cell(
+                row=row,
+                column=delivery_col
+            ).value
+
+            current_text = (
+                ""
+                if current_value is None
+                else str(current_value).strip()
+            )
+
+            if row == 2 or row in page_starts:
+                previous_value = current_text
+                continue
+
+            if current_text != previous_value:
+                for col in range(1, max_col + 1):
+                    cell = ws.cell(
+                        row=row,
+                        column=col
+                    )
+
+                    cell.border = Border(
+                        left=thin,
+                        right=thin,
+                        top=medium,
+                        bottom=thin
+                    )
+
+            previous_value = current_text
+
+    # 列幅
+    width_map = {
+        "納品日": 15,
+        "使用日": 15,
+        "朝昼夕": 11,
+        "仕入先": 24,
+        "食品名": 38,
+        "換算値": 13,
+        "総合計": 13,
+        "単位": 11,
+        "特養入所者": 15,
+        "特養職員": 15,
+        "ユーハウス": 15,
+        "コメント": 28,
+    }
+
+    for header, width in width_map.items():
+        col_num = header_map.get(header)
+
+        if col_num is not None:
+            letter = get_column_letter(col_num)
+            ws.column_dimensions[letter].width = width
+
+    # 食品名は左揃え
+    food_col = header_map.get("食品名")
+
+    if food_col is not None:
+        for row in range(2, max_row + 1):
+            ws.cell(
+                row=row,
+                column=food_col
+            ).alignment = Alignment(
+                horizontal="left",
+                vertical="center",
+                wrap_text=False,
+                shrink_to_fit=True
+            )
+
+    # 印刷範囲
+    ws.print_area = (
+        f"A1:"
+        f"{get_column_letter(max_col)}"
+        f"{max_row}"
+    )
+
+    # 各ページに見出し行を表示
+    ws.print_title_rows = "1:1"
+
+    # 改ページ（見出し行は印刷タイトルとして各ページの先頭に付く）
+    for row in sorted(page_starts):
+        ws.row_breaks.append(
+            Break(id=row - 1)
+        )
+
+def detect_min_usage_date_token(df, col="使用日"):
+    """使用日の最も古い日付を MMDD 形式 '1208' のように返す"""
+    if col not in df.columns:
+        return ""
+
+    dt_list = [
+        parse_mmdd(v)
+        for v in df[col].unique()
+    ]
+
+    dt_list = [
+        d
+        for d in dt_list
+        if d is not None
+    ]
+
+    if not dt_list:
+        return ""
+
+    return min(dt_list).strftime("%m%d")
+
+# ------------------------------------------------------------
+# ① 検収簿整形ロジック（修正版：不要列を削除）
+# ------------------------------------------------------------
+def _is_blank(value):
+    """Excelの空白セル（NaN、None、空文字、空白だけの文字列）を判定する。"""
+    return pd.isna(value) or (isinstance(value, str) and value.strip() == "")
+
+
+@traced()
+def apply_ek_blank_rows_and_f_zero(df):
+    """VBA「EK空行削除_後にF空白へ0」と同じデータ整形を行う。
+
+    元ファイルの見出し行は pandas が読み取る際に除外されているため、
+    ここではデータ行だけを対象にする。
+    """
+    if df.shape[1] >= 11:
+        # ExcelのE～K列（0始まりでは4～10）がすべて空白の行を削除
+        ek_all_blank = df.iloc[:, 4:11].apply(
+            lambda row: all(_is_blank(value) for value in row), axis=1
+        )
+        df = df.loc[~ek_all_blank]
+
+    if df.shape[1] >= 6:
+        # ExcelのF列（0始まりでは5）の空白を0で埋める
+        f_col = df.columns[5]
+        f_blank = df[f_col].map(_is_blank)
+        df.loc[f_blank, f_col] = 0
+
+    return df
+
+
+def format_inspection_workbook(uploaded_file, ingest=None):
+    """検収記録簿（原本）を整形する。ingest は kenshu_reader.read_raw_kenshu を参照。"""
+    df = read_raw_kenshu(uploaded_file, ingest=ingest)
+
+    # VBA「EK空行削除_後にF空白へ0」を自動適用
+    df = apply_ek_blank_rows_and_f_zero(df)
+
+    # ------------------------------------------------------------
+    # MultiIndex → フラット化
+    # ------------------------------------------------------------
+    flat_cols = []
+
+    for top, sub in df.columns:
+        top = "" if str(top).startswith("Unnamed") else str(top)
+        sub = "" if str(sub).startswith("Unnamed") else str(sub)
+
+        if top == "":
+            flat_cols.append(sub)
+
+        elif sub == "":
+            flat_cols.append(top)
+
+        else:
+            flat_cols.append(f"{top}_{sub}")
+
+    df.columns = flat_cols
+
+    # ------------------------------------------------------------
+    # 換算値の空白を0
+    # ------------------------------------------------------------
+    if "換算値" in df.columns:
+        conversion_blank = df["換算値"].map(_is_blank)
+        df.loc[conversion_blank, "換算値"] = 0
+
+    # ------------------------------------------------------------
+    # 欠損補完
+    # ------------------------------------------------------------
+    for col in ["納品日", "使用日", "朝昼夕", "仕入先"]:
+        if col in df.columns:
+            df[col] = df[col].ffill()
+
+    # ------------------------------------------------------------
+    # 朝昼夕の並び順
+    # ------------------------------------------------------------
+    order_map = {
+        "朝食": 1,
+        "昼食": 2,
+        "夕食": 3,
+    }
+
+    df["食事順"] = (
+        df["朝昼夕"]
+        .map(order_map)
+        .fillna(0)
+    )
+
+    # ------------------------------------------------------------
+    # ソート
+    # ------------------------------------------------------------
+    df = df.sort_values(
+        ["使用日", "食事順", "食品名"]
+    )
+
+    # ------------------------------------------------------------
+    # 特養・ユーハウスの元列を検索
+    # ------------------------------------------------------------
+    facility_cols = FACILITY_COLUMNS.resolve(df.columns)
+
+    # ------------------------------------------------------------
+    # 必要列
+    # ------------------------------------------------------------
+    needed_cols = [
+        "納品日",
+        "使用日",
+        "朝昼夕",
+        "仕入先",
+        "食品名",
+        "換算値",
+        "総合計",
+        "単位",
+    ]
+
+    needed_cols.extend(facility_cols.values())
+
+    # 実際に存在する列だけ残す
+    needed_cols = [
+        c for c in needed_cols
+        if c in df.columns
+    ]
+
+    df_out = df[needed_cols]
+
+    # ------------------------------------------------------------
+    # ★列名を統一
+    # ------------------------------------------------------------
+    rename_map = {
+        source: target
+        for target, source in facility_cols.items()
+    }
+
+    df_out = df_out.rename(
+        columns=rename_map
+    )
+
+    # ------------------------------------------------------------
+    # 必須の数量列が取得できたか確認
+    # ------------------------------------------------------------
+    missing_facility_cols = []
+
+    if "特養入所者" not in df_out.columns:
+        missing_facility_cols.append("特養入所者")
+
+    if "特養職員" not in df_out.columns:
+        missing_facility_cols.append("特養職員")
+
+    if "ユーハウス" not in df_out.columns:
+        missing_facility_cols.append("ユーハウス")
+
+    if missing_facility_cols:
+        raise ValueError(
+            "検収簿から次の数量列を取得できませんでした："
+            + "、".join(missing_facility_cols)
+            + "。元の検収記録簿の見出しを確認してください。"
+        )
+
+    # ------------------------------------------------------------
+    # 換算値を再確認
+    # ------------------------------------------------------------
+    if "換算値" in df_out.columns:
+        conversion_blank = (
+            df_out["換算値"]
+            .map(_is_blank)
+        )
+
+        df_out.loc[
+            conversion_blank,
+            "換算値"
+        ] = 0
+
+    # ------------------------------------------------------------
+    # Excel出力
+    # ------------------------------------------------------------
+    buffer = io.BytesIO()
+
+    with timed_exit(
+        "wb.save",
+        excel_writer(
+            buffer
+        ),
+    ) as writer:
+
+        with stage("to_excel"):
+            df_out.to_excel(
+                writer,
+                index=False,
+                sheet_name="検収簿"
+            )
+
+        ws = writer.book["検収簿"]
+
+        apply_inspection_print_style(ws)
+
+    buffer.seek(0)
+
+    token = detect_min_usage_date_token(
+        df_out,
+        "使用日"
+    )
+
+    fname = (
+        f"検収簿_加工済_{token}.xlsx"
+        if token
+        else "検収簿_加工済.xlsx"
+    )
+
+    # ------------------------------------------------------------
+    # 履歴へ保存（IWATO_HISTORY_DB を指定したときだけ）
+    # ------------------------------------------------------------
+    record_processed_kenshu(
+        df_out,
+        getattr(uploaded_file, "name", None) or fname
+    )
+
+    return buffer.read(), fname
+
+# ------------------------------------------------------------
+# 業者別仕訳表 作成ロジック
+# ------------------------------------------------------------
+def _safe_sheet_name(value, used_names):
+    """仕入先名をExcelで使用可能な一意のシート名へ変換する。"""
+    name = str(value).strip() if not pd.isna(value) else "仕入先未設定"
+    name = re.sub(r'[\\/*?:\[\]]', '＿', name)
+    name = name[:31] or "仕入先未設定"
+
+    base = name
+    index = 2
+    while name in used_names:
+        suffix = f"_{index}"
+        name = f"{base[:31 - len(suffix)]}{suffix}"
+        index += 1
+
+    used_names.add(name)
+    return name
+
+
+# ② の出力形式
+# sheets: 仕入先ごとのシート
+# single: 1シートにまとめ、仕入先ごとに改ページ（シートが多いときに軽い）
+JOURNAL_LAYOUT_SHEETS = "sheets"
+JOURNAL_LAYOUT_SINGLE = "single"
+JOURNAL_SINGLE_SHEET_NAME = "業者別仕訳表"
+
+
+def create_vendor_journal_workbook(uploaded_file, layout=JOURNAL_LAYOUT_SHEETS):
+    """加工済み検収簿から、仕入先ごとの仕訳表を作成する。"""
+
+    # ------------------------------------------------------------
+    # Excel読み込み
+    # ------------------------------------------------------------
+    with stage("pd.read_excel"):
+        df = pd.read_excel(uploaded_file)
+
+    return build_vendor_journal_workbook(df, layout)
+
+
+def build_vendor_journal_workbook(df, layout=JOURNAL_LAYOUT_SHEETS):
+    """読み込み済みの加工済み検収簿（DataFrame）から仕訳表を作成する。"""
+    df = prepare_vendor_journal_frame(df)
+
+    if layout == JOURNAL_LAYOUT_SINGLE:
+        return (
+            write_single_sheet_journal(list(iter_vendor_sheets(df))),
+            vendor_journal_file_name(df),
+        )
+
+    # ------------------------------------------------------------
+    # Excel出力（仕入先が多いときは複数のプロセスで作成）
+    # ------------------------------------------------------------
+    data = render_sheets(
+        write_vendor_sheet,
+        list(iter_vendor_sheets(df))
+    )
+
+    return data, vendor_journal_file_name(df)
+
+
+def prepare_vendor_journal_frame(df):
+    """仕訳表の列名・列順・仕入先をそろえた DataFrame を返す。"""
+    if "仕入先" not in df.columns:
+        raise ValueError(
+            "『仕入先』列が見つかりません。"
+            "検収簿（加工済）を選択してください。"
+        )
+
+    # ------------------------------------------------------------
+    # 列名を統一
+    # ------------------------------------------------------------
+    df = df.rename(
+        columns=FACILITY_COLUMNS.rename_map(df.columns)
+    )
+
+    with stage("compact_kenshu_frame"):
+        df = compact_kenshu_frame(df)
+
+    # ------------------------------------------------------------
+    # 必須列チェック
+    # ------------------------------------------------------------
+    required_headers = [
+        "単位",
+        "特養入所者",
+        "特養職員",
+        "ユーハウス",
+    ]
+
+    missing_headers = [
+        name
+        for name in required_headers
+        if name not in df.columns
+    ]
+
+    if missing_headers:
+        raise ValueError(
+            "必要な列が見つかりません: "
+            + "、".join(missing_headers)
+            + "。検収簿（加工済）の見出しを確認してください。"
+        )
+
+    # ------------------------------------------------------------
+    # コメント列を最後へ
+    # ------------------------------------------------------------
+    if "コメント" in df.columns:
+        comment_values = df.pop(
+            "コメント"
+        )
+        df["コメント"] = (
+            comment_values
+        )
+    else:
+        df["コメント"] = ""
+
+    # ------------------------------------------------------------
+    # 仕入先の空欄処理
+    # ------------------------------------------------------------
+    df["仕入先"] = text_values(
+        df["仕入先"],
+        fill="仕入先未設定",
+        blank="仕入先未設定",
+    )
+
+    return df
+
+
+def iter_vendor_sheets(df):
+    """(シート名, 仕入先の行) を仕入先名の順に返す。"""
+    used_names = set()
+
+    for vendor, vendor_df in df.groupby(
+        "仕入先",
+        sort=True,
+        observed=True
+    ):
+        sheet_name = _safe_sheet_name(
+            vendor,
+            used_names
+        )
+
+        yield sheet_name, vendor_df.reset_index(drop=True)
+
+
+def write_vendor_sheet(writer, sheet_name, vendor_df):
+    """仕入先1社分のシートを書き込み、①・② 共通の印刷書式を適用する。"""
+    with stage("to_excel"):
+        vendor_df.to_excel(
+            writer,
+            sheet_name=sheet_name,
+            index=False
+        )
+
+    apply_inspection_print_style(
+        writer.book[sheet_name]
+    )
+
+
+def write_single_sheet_journal(sheets):
+    """仕入先ごとの行を1シートに続けて書き、仕入先ごとに改ページする。
+
+    見出し行は1行目だけに書き、印刷タイトルとして各ページの先頭に
+    付ける。書式は1回だけ適用する。
+    """
+    body = pd.concat(
+        [vendor_df for _sheet_name, vendor_df in sheets],
+        ignore_index=True
+    )
+
+    # 各仕入先の先頭行（1行目は見出し）
+    page_starts = []
+    row = 2
+
+    for _sheet_name, vendor_df in sheets[:-1]:
+        row += len(vendor_df)
+        page_starts.append(row)
+
+    buffer = io.BytesIO()
+
+    with timed_exit("wb.save", excel_writer(buffer)) as writer:
+        with stage("to_excel"):
+            body.to_excel(
+                writer,
+                sheet_name=JOURNAL_SINGLE_SHEET_NAME,
+                index=False
+            )
+
+        apply_inspection_print_style(
+            writer.book[JOURNAL_SINGLE_SHEET_NAME],
+            page_starts=page_starts
+        )
+
+    return buffer.getvalue()
+
+
+def vendor_journal_file_name(df):
+    token = (
+        detect_min_usage_date_token(
+            df,
+            "使用日"
+        )
+    )
+
+    return (
+        f"業者別仕訳表_{token}.xlsx"
+        if token
+        else "業者別仕訳表.xlsx"
+    )
+
+
+# ------------------------------------------------------------
+# 注文書 書式設定（いわと／ユーハウス共通）
+# ------------------------------------------------------------
+@traced()
+def apply_order_style(ws, is_tokuyou=False):
+    font_body = Font(name="ＭＳ ゴシック", size=18)
+    border = Border(
+        left=Side("thin"),
+        right=Side("thin"),
+        top=Side("thin"),
+        bottom=Side("thin")
+    )
+
+    header_row = 6
+
+    # --- 6行目：ヘッダー行 ---
+    for cell in ws[header_row]:
+        cell.font = Font(name="ＭＳ ゴシック", size=12, bold=True)
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+        cell.border = border
+
+    # --- 7行目以降：データ行 ---
+    for row in ws.iter_rows(min_row=header_row + 1):
+        for c in row:
+            c.font = font_body
+            c.border = border
+            c.alignment = Alignment(
+                vertical="center",
+                wrap_text=False,      # 折り返しなし
+            )
+
+    # --- 行高 ---
+    for i in range(1, ws.max_row + 1):
+        ws.row_dimensions[i].height = 30
+
+    # ------------------------------------------------------------
+    # 列幅設定（注文書仕様）
+    # ------------------------------------------------------------
+
+    # A列：使用日
+    ws.column_dimensions["A"].width = 15.18
+
+    # B列：食品名（広く）
+    ws.column_dimensions["B"].width = 60.09
+
+    # D〜H列：7.73 に変更（数量・単位・確認欄）
+    for col in ["D", "E", "F", "G", "H"]:
+        ws.column_dimensions[col].width = 7.73
+
+    # C・I・J・K・L・M は 15.18
+    for col in ["C", "I", "J", "K", "L", "M"]:
+        ws.column_dimensions[col].width = 15.18
+
+    # 特養用マクロの指定
+    if is_tokuyou:
+        for col in ["I", "L", "M"]:
+            ws.column_dimensions[col].width = 7
+
+        # C～E列の外枠を太線にする（内側の罫線は維持）
+        thick = Side(style="thick")
+        start_row = 6
+        end_row = ws.max_row
+        if end_row >= start_row:
+            for row in range(start_row, end_row + 1):
+                ws.cell(row, 3).border = Border(
+                    left=thick,
+                    right=ws.cell(row, 3).border.right,
+                    top=thick if row == start_row else ws.cell(row, 3).border.top,
+                    bottom=thick if row == end_row else ws.cell(row, 3).border.bottom,
+                )
+                ws.cell(row, 5).border = Border(
+                    left=ws.cell(row, 5).border.left,
+                    right=thick,
+                    top=thick if row == start_row else ws.cell(row, 5).border.top,
+                    bottom=thick if row == end_row else ws.cell(row, 5).border.bottom,
+                )
+            for col in range(3, 6):
+                ws.cell(start_row, col).border = Border(
+                    left=ws.cell(start_row, col).border.left,
+                    right=ws.cell(start_row, col).border.right,
+                    top=thick,
+                    bottom=ws.cell(start_row, col).border.bottom,
+                )
+                ws.cell(end_row, col).border = Border(
+                    left=ws.cell(end_row, col).border.left,
+                    right=ws.cell(end_row, col).border.right,
+                    top=ws.cell(end_row, col).border.top,
+                    bottom=thick,
+                )
+
+    # ------------------------------------------------------------
+    # B列（食品名）を縮小して全体表示
+    # ------------------------------------------------------------
+    for row in ws.iter_rows(min_row=7, max_row=ws.max_row, min_col=2, max_col=2):
+        for cell in row:
+            cell.alignment = Alignment(
+                horizontal="left",
+                vertical="center",
+                wrap_text=False,        # 折り返しなし
+                shrink_to_fit=True      # 縮小して全体を表示
+            )
+
+    # ------------------------------------------------------------
+    # 印刷設定
+    # ------------------------------------------------------------
+    ws.page_setup.orientation = "landscape"
+    ws.page_setup.paperSize = ws.PAPERSIZE_A4
+    ws.page_margins = PageMargins(left=0.3, right=0.3, top=0.5, bottom=0.5)
+
+    # 印刷範囲（A〜M列）
+    ws.print_area = f"A1:M{ws.max_row}"
+
+
+
+# ------------------------------------------------------------
+# ヘッダー（いわと）
+# ------------------------------------------------------------
+def create_header_iwato(ws, supplier):
+    ws.merge_cells("A3:B3")
+    ws["A3"] = f"{supplier} 御中"
+    ws["A3"].font = Font(name="ＭＳ ゴシック", size=28, bold=True)
+
+    ws["B1"] = "注文書（介護老人福祉施設いわと）"
+    ws["B1"].alignment = Alignment(horizontal="center")
+    ws["B1"].font = Font(name="ＭＳ ゴシック", size=26, bold=True)
+
+    ws["K3"] = "(有) ハートミール"
+    ws["K3"].alignment = Alignment(horizontal="right")
+    ws["K3"].font = Font(name="ＭＳ ゴシック", size=24, bold=True)
+
+
+
+# ------------------------------------------------------------
+# ヘッダー（ユーハウス）
+# ------------------------------------------------------------
+def create_header_yuhouse(ws, supplier):
+    ws.merge_cells("A3:B3")
+    ws["A3"] = f"{supplier} 御中"
+    ws["A3"].font = Font(name="ＭＳ ゴシック", size=28, bold=True)
+
+    ws["B1"] = "注文書（ユーハウスいわと）"
+    ws["B1"].alignment = Alignment(horizontal="center")
+    ws["B1"].font = Font(name="ＭＳ ゴシック", size=26, bold=True)
+
+    ws["K3"] = "(有) ハートミール"
+    ws["K3"].alignment = Alignment(horizontal="right")
+    ws["K3"].font = Font(name="ＭＳ ゴシック", size=24, bold=True)
+
+
+# ------------------------------------------------------------
+# ③ 注文書作成
+# 特養 / ユーハウス
+# ------------------------------------------------------------
+def create_order_workbook(uploaded_file, order_type):
+
+    with stage("pd.read_excel"):
+        df = pd.read_excel(uploaded_file)
+
+    return build_order_workbook(df, order_type)
+
+
+def build_order_workbook(df, order_type, keep_zero=False):
+    """読み込み済みの加工済み検収簿（DataFrame）から注文書を作成する。
+
+    keep_zero=True なら、数量がすべて0の行も 0 と書いて残す（差分の注文書の取消）。
+    """
+    with stage("compact_kenshu_frame"):
+        df = compact_kenshu_frame(df)
+
+    # ------------------------------------------------------------
+    # 基本必須列チェック
+    # ------------------------------------------------------------
+    required_cols = [
+        "使用日",
+        "仕入先",
+        "食品名",
+        "単位",
+    ]
+
+    missing_cols = [
+        c for c in required_cols
+        if c not in df.columns
+    ]
+
+    if missing_cols:
+        raise ValueError(
+            "必要な列が見つかりません："
+            + "、".join(missing_cols)
+            + "。①検収簿整形で作成した"
+              "加工済み検収簿を使用してください。"
+        )
+
+    # ------------------------------------------------------------
+    # 欠損補完
+    # ------------------------------------------------------------
+    for c in [
+        "使用日",
+        "仕入先",
+        "食品名",
+        "単位",
+    ]:
+        df[c] = df[c].ffill()
+
+    df["使用日"] = text_values(
+        df["使用日"],
+        fill="nan",
+        strip=False,
+    )
+
+    # ------------------------------------------------------------
+    # 特養
+    # ------------------------------------------------------------
+    if "特養" in order_type:
+
+        raw_qty = "特養入所者"
+        raw_staff = "特養職員"
+
+        missing_tokuyou = []
+
+        if raw_qty not in df.columns:
+            missing_tokuyou.append(
+                "特養入所者"
+            )
+
+        if raw_staff not in df.columns:
+            missing_tokuyou.append(
+                "特養職員"
+            )
+
+        if missing_tokuyou:
+            raise ValueError(
+                "特養の数量列が見つかりません："
+                + "、".join(missing_tokuyou)
+                + "。①検収簿整形で作成した"
+                  "最新の加工済み検収簿を使用してください。"
+            )
+
+        df[raw_qty] = pd.to_numeric(
+            df[raw_qty],
+            errors="coerce"
+        ).fillna(0)
+
+        df[raw_staff] = pd.to_numeric(
+            df[raw_staff],
+            errors="coerce"
+        ).fillna(0)
+
+    # ------------------------------------------------------------
+    # ユーハウス
+    # ------------------------------------------------------------
+    else:
+
+        raw_qty = "ユーハウス"
+        raw_staff = None
+
+        if raw_qty not in df.columns:
+            raise ValueError(
+                "『ユーハウス』列が見つかりません。"
+                "①検収簿整形で作成した"
+                "最新の加工済み検収簿を使用してください。"
+            )
+
+        df[raw_qty] = pd.to_numeric(
+            df[raw_qty],
+            errors="coerce"
+        ).fillna(0)
+
+    # ------------------------------------------------------------
+    # 検収用空欄
+    # ------------------------------------------------------------
+    inspection_cols = [
+        "鮮度",
+        "品温",
+        "異物",
+        "包装",
+        "期限",
+        "備考欄",
+        "検収者",
+    ]
+
+    for c in inspection_cols:
+        if c not in df.columns:
+            df[c] = ""
+
+    # 納品日は空欄
+    df["納品日"] = ""
+
+    # ------------------------------------------------------------
+    # 仕入先整理
+    # ------------------------------------------------------------
+    df["仕入先"] = text_values(
+        df["仕入先"]
+    )
+
+    # 仕入先空欄は除外
+    df = df[
+        df["仕入先"] != ""
+    ]
+
+    if df.empty:
+        raise ValueError(
+            "仕入先が見つかりません。"
+        )
+
+    # ------------------------------------------------------------
+    # Excel出力（仕入先が多いときは複数のプロセスで作成）
+    # ------------------------------------------------------------
+    sheets = list(
+        iter_order_sheets(
+            df,
+            order_type,
+            keep_zero
+        )
+    )
+
+    # ------------------------------------------------------------
+    # 数量ありのシートが0件
+    # ------------------------------------------------------------
+    if not sheets:
+        raise ValueError(
+            "注文数量が入力されている"
+            "データが見つかりませんでした。"
+        )
+
+    data = render_sheets(
+        write_order_sheet,
+        sheets
+    )
+
+    return data, order_file_name(
+        df,
+        order_type
+    )
+
+
+def iter_order_sheets(df, order_type, keep_zero=False):
+    """(シート名, 注文書の行, 仕入先, 注文書の種類) を仕入先の出現順に返す。
+
+    数量が1件も無い仕入先は飛ばす（keep_zero=True なら数量0の行も残す）。
+    """
+    suppliers = (
+        df["仕入先"]
+        .drop_duplicates()
+        .tolist()
+    )
+
+    used_sheet_names = set()
+
+    for supplier in suppliers:
+
+        sub = df[
+            df["仕入先"] == supplier
+        ]
+
+        # ------------------------------------------------------
+        # 使用日で並び替え
+        # ------------------------------------------------------
+        sub["使用日_dt"] = map_values(
+            sub["使用日"],
+            parse_mmdd
+        )
+
+        sub = sub.sort_values(
+            [
+                "使用日_dt",
+                "食品名",
+            ],
+            na_position="last",
+        )
+
+        # ------------------------------------------------------
+        # 特養
+        # ------------------------------------------------------
+        if "特養" in order_type:
+
+            # 加工済み検収簿では
+            # 「特養入所者」「特養職員」を使用
+            sub = sub.rename(
+                columns={
+                    "特養入所者": "入所者",
+                    "特養職員": "職員",
+                }
+            )
+
+            qty_label = "入所者"
+            staff_label = "職員"
+
+            qty_values = pd.to_numeric(
+                sub[qty_label],
+                errors="coerce"
+            ).fillna(0)
+
+            staff_values = pd.to_numeric(
+                sub[staff_label],
+                errors="coerce"
+            ).fillna(0)
+
+            # --------------------------------------------------
+            # 入所者または職員の
+            # どちらかに数量があれば残す
+            # --------------------------------------------------
+            ordered = (
+                (qty_values != 0)
+                |
+                (staff_values != 0)
+            )
+
+            if not keep_zero:
+                sub = sub.loc[ordered]
+                ordered = ordered.loc[sub.index]
+
+            if sub.empty:
+                continue
+
+            # 再計算
+            qty_values = pd.to_numeric(
+                sub[qty_label],
+                errors="coerce"
+            ).fillna(0)
+
+            staff_values = pd.to_numeric(
+                sub[staff_label],
+                errors="coerce"
+            ).fillna(0)
+
+            # 0は注文書では空欄（数量がすべて0の行は 0 のまま）
+            sub[qty_label] = (
+                sub[qty_label]
+                .astype(object)
+            )
+
+            sub[staff_label] = (
+                sub[staff_label]
+                .astype(object)
+            )
+
+            sub.loc[
+                (qty_values == 0) & ordered,
+                qty_label
+            ] = ""
+
+            sub.loc[
+                (staff_values == 0) & ordered,
+                staff_label
+            ] = ""
+
+        # ------------------------------------------------------
+        # ユーハウス
+        # ------------------------------------------------------
+        else:
+
+            # 加工済み検収簿の
+            # 「ユーハウス」を使用
+            sub = sub.rename(
+                columns={
+                    "ユーハウス":
+                    "ユーハウス入居者"
+                }
+            )
+
+            qty_label = (
+                "ユーハウス入居者"
+            )
+
+            staff_label = None
+
+            qty_values = pd.to_numeric(
+                sub[qty_label],
+                errors="coerce"
+            ).fillna(0)
+
+            # 数量0は除外
+            if not keep_zero:
+                sub = sub.loc[
+                    qty_values != 0
+                ]
+
+            if sub.empty:
+                continue
+
+        # ------------------------------------------------------
+        # 出力列
+        # ------------------------------------------------------
+        col_order = [
+            "使用日",
+            "食品名",
+            qty_label,
+            "単位",
+        ]
+
+        if staff_label:
+            col_order.append(
+                staff_label
+            )
+
+        col_order += [
+            "鮮度",
+            "品温",
+            "異物",
+            "包装",
+            "期限",
+            "備考欄",
+            "納品日",
+            "検収者",
+        ]
+
+        for c in col_order:
+            if c not in sub.columns:
+                sub[c] = ""
+
+        sub = sub[
+            col_order
+        ]
+
+        # ------------------------------------------------------
+        # 同じ使用日は最初だけ表示
+        # ------------------------------------------------------
+        sub["使用日"] = (
+            sub["使用日"]
+            .astype(object)
+            .mask(
+                sub["使用日"]
+                .duplicated(),
+                ""
+            )
+        )
+
+        # ------------------------------------------------------
+        # Excelシート名
+        # ------------------------------------------------------
+        sheet_name = re.sub(
+            r'[\\/*?:\[\]]',
+            '＿',
+            str(supplier)
+        )
+
+        sheet_name = (
+            sheet_name[:31]
+            or "仕入先"
+        )
+
+        base_sheet_name = (
+            sheet_name
+        )
+
+        index = 2
+
+        while (
+            sheet_name
+            in used_sheet_names
+        ):
+            suffix = f"_{index}"
+
+            sheet_name = (
+                base_sheet_name[
+                    :31 - len(suffix)
+                ]
+                + suffix
+            )
+
+            index += 1
+
+        used_sheet_names.add(
+            sheet_name
+        )
+
+        yield sheet_name, sub, supplier, order_type
+
+
+def write_order_sheet(writer, sheet_name, sub, supplier, order_type):
+    """仕入先1社分の注文書シートを書き込み、書式とヘッダーを設定する。"""
+    # ----------------------------------------------------------
+    # Excelへ書き込み
+    # ----------------------------------------------------------
+    with stage("to_excel"):
+        sub.to_excel(
+            writer,
+            sheet_name=sheet_name,
+            index=False,
+            startrow=5,
+        )
+
+    ws = writer.book[
+        sheet_name
+    ]
+
+    apply_order_style(
+        ws,
+        is_tokuyou=(
+            "特養"
+            in order_type
+        ),
+    )
+
+    # ----------------------------------------------------------
+    # ヘッダー
+    # ----------------------------------------------------------
+    if "特養" in order_type:
+
+        create_header_iwato(
+            ws,
+            supplier
+        )
+
+    else:
+
+        create_header_yuhouse(
+            ws,
+            supplier
+        )
+
+        ws["C6"] = (
+            "ユーハウス入居者"
+        )
+
+
+def order_file_name(df, order_type):
+    token = detect_min_usage_date_token(
+        df,
+        "使用日"
+    )
+
+    if "特養" in order_type:
+        base_name = (
+            "注文書_いわと"
+        )
+    else:
+        base_name = (
+            "注文書_ユーハウス"
+        )
+
+    if token:
+        fname = (
+            f"{base_name}_{token}.xlsx"
+        )
+    else:
+        fname = (
+            f"{base_name}.xlsx"
+        )
+
+    return fname
@@ -1,245 +1,41 @@
-import re
-from copy import copy
 from pathlib import Path
-from typing import Dict, Tuple, List
+from typing import Tuple
 
-import openpyxl
-import pandas as pd
-from openpyxl.worksheet.worksheet import Worksheet
+from supplier_templates import (
+    LAYOUT_SHEETS,
+    fill_template_orders,
+    fill_template_orders_both_facilities,
+    load_definition,
+)
 
 
-def find_col_by_keywords(df: pd.DataFrame, keywords: list[str]) -> str:
-    cols = [str(c) for c in df.columns]
-    for c in cols:
-        if all(k in c for k in keywords):
-            return c
-    raise KeyError(
-        f"列が見つかりません: keywords={keywords}\n利用可能な列:\n" + "\n".join(cols)
-    )
-
+# ------------------------------------------------------------
+# 丸八ヒロタ発注書
+# 絞り込み・まとめ方・テンプレートへの書き込み位置は
+# suppliers/maruhachi.json に定義し、作成は supplier_templates が行う。
+# ------------------------------------------------------------
+DEFINITION = load_definition("maruhachi")
 
-INVALID_SHEET_CHARS = r'[:\\/*?\[\]]'
 
-HEADER_CELL_FACILITY = "I2"
-TOKUYOU_LABEL = "特養いわと"
-YUHOUSE_LABEL = "ユーハウスいわと"
+_TOKUYOU = DEFINITION.facility("tokuyou")
+_YUHOUSE = DEFINITION.facility("yuhouse")
+_TAG = DEFINITION.lookup("tag")
 
-COL_SUPPLIER = "仕入先"
-COL_USE_DATE = "使用日"
-COL_FOOD_NAME = "食品名"
-COL_SPEC = "換算値"
+HEADER_CELL_FACILITY = _TOKUYOU.cells[0][0]
+TOKUYOU_LABEL = _TOKUYOU.cells[0][1]
+YUHOUSE_LABEL = _YUHOUSE.cells[0][1]
 
-SUPPLIER_NAME = "丸八ヒロタ"
+SUPPLIER_NAME = DEFINITION.supplier
 
 # テンプレの実シート名
-TEMPLATE_SHEET_NAME_TOKUYOU = "丸八ヒロタ発注書(介護老人福祉施設いわと）"
-TEMPLATE_SHEET_NAME_YUHOUSE = "丸八ヒロタ発注書(ユーハウス）"
-
-TAG_SHEET_NAME = "タグ"
-
-FIXED_FIRST_ROW = 6
-APPEND_START_ROW = 22
-APPEND_MAX_ROWS = 7
-
-COL_OUT_USE_DATE = 1
-COL_OUT_CODE = 2
-COL_OUT_NAME_2 = 4
-COL_OUT_SPEC = 5
-COL_OUT_RESIDENT = 6
-COL_OUT_STAFF = 7
-
-
-def sanitize_sheet_title(title: str, existing: set[str]) -> str:
-    t = str(title)
-    t = re.sub(INVALID_SHEET_CHARS, "-", t)
-    t = t.strip()
-
-    if t.startswith("'"):
-        t = t[1:]
-    if t.endswith("'"):
-        t = t[:-1]
-    if not t:
-        t = "Sheet"
-
-    t = t[:31]
-
-    base = t
-    i = 2
-    while t in existing:
-        suffix = f"_{i}"
-        t = base[: 31 - len(suffix)] + suffix
-        i += 1
-    return t
-
-
-def _norm(s: object) -> str:
-    if s is None:
-        return ""
-    t = str(s)
-    t = t.replace("\u3000", " ")
-    t = re.sub(r"\s+", " ", t)
-    return t.strip()
-
-
-def load_tag_mapping(tag_xlsm_path: str | Path) -> Dict[str, Tuple[str, str, str]]:
-    wb = openpyxl.load_workbook(Path(tag_xlsm_path), data_only=True, keep_vba=True)
-    ws = wb[TAG_SHEET_NAME]
-
-    mapping: Dict[str, Tuple[str, str, str]] = {}
-    for r in range(2, ws.max_row + 1):
-        code = ws.cell(r, 1).value
-        maru_name = ws.cell(r, 2).value
-        spec = ws.cell(r, 3).value
-        heart_name = ws.cell(r, 4).value
-
-        k = _norm(heart_name)
-        if not k or code is None:
-            continue
-
-        mapping[k] = (str(code), str(maru_name or ""), str(spec or ""))
-
-    return mapping
-
-
-def _read_kenshu(kenshu_xlsx_path: str | Path) -> pd.DataFrame:
-    df = pd.read_excel(Path(kenshu_xlsx_path))
-
-    required_cols = [
-        COL_SUPPLIER,
-        COL_USE_DATE,
-        COL_FOOD_NAME,
-        COL_SPEC,
-    ]
-
-    missing_cols = [
-        c for c in required_cols
-        if c not in df.columns
-    ]
-
-    if missing_cols:
-        raise KeyError(
-            "加工済み検収簿に必要な列が見つかりません："
-            + "、".join(missing_cols)
-        )
-
-    df[COL_SUPPLIER] = (
-        df[COL_SUPPLIER]
-        .fillna("")
-        .astype(str)
-        .str.strip()
-    )
-
-    df = df[
-        df[COL_SUPPLIER] == SUPPLIER_NAME
-    ].copy()
-
-    df = df[
-        df[COL_USE_DATE].notna()
-    ].copy()
-
-    if df.empty:
-        raise ValueError(
-            "丸八ヒロタのデータが見つかりません。"
-        )
-
-    return df
-
-def _build_fixed_row_index(ws: Worksheet) -> Dict[str, int]:
-    idx: Dict[str, int] = {}
-    r = FIXED_FIRST_ROW
-    while r < APPEND_START_ROW:
-        code = ws.cell(r, COL_OUT_CODE).value
-        if code is None or str(code).strip() == "":
-            break
-        idx[str(code).strip()] = r
-        r += 1
-    return idx
-
-
-def _clear_sheet_quantities(ws: Worksheet) -> None:
-    r = FIXED_FIRST_ROW
-    while r < APPEND_START_ROW:
-        code = ws.cell(r, COL_OUT_CODE).value
-        if code is None or str(code).strip() == "":
-            break
-        ws.cell(r, COL_OUT_USE_DATE).value = None
-        ws.cell(r, COL_OUT_RESIDENT).value = None
-        ws.cell(r, COL_OUT_STAFF).value = None
-        r += 1
-
-    for rr in range(APPEND_START_ROW, APPEND_START_ROW + APPEND_MAX_ROWS):
-        ws.cell(rr, COL_OUT_USE_DATE).value = None
-        ws.cell(rr, COL_OUT_CODE).value = None
-        ws.cell(rr, COL_OUT_NAME_2).value = None
-        ws.cell(rr, COL_OUT_SPEC).value = None
-        ws.cell(rr, COL_OUT_RESIDENT).value = None
-        ws.cell(rr, COL_OUT_STAFF).value = None
-
-
-def _write_append_row(
-    ws: Worksheet,
-    rr: int,
-    use_date: object,
-    food_name: str,
-    spec: str,
-    qty_resident: float,
-    qty_staff: float,
-) -> None:
-    ws.cell(rr, COL_OUT_USE_DATE).value = use_date
-    ws.cell(rr, COL_OUT_NAME_2).value = food_name
-    ws.cell(rr, COL_OUT_SPEC).value = spec
-    ws.cell(rr, COL_OUT_RESIDENT).value = qty_resident if qty_resident != 0 else None
-    ws.cell(rr, COL_OUT_STAFF).value = qty_staff if qty_staff != 0 else None
-
-
-def _copy_sheet_layout(base_ws, ws2) -> None:
-    ws2.sheet_format = copy(base_ws.sheet_format)
-    ws2.sheet_properties = copy(base_ws.sheet_properties)
-    ws2.print_options = copy(base_ws.print_options)
-    ws2.page_margins = copy(base_ws.page_margins)
-    ws2.page_setup = copy(base_ws.page_setup)
-
-    ws2.print_area = base_ws.print_area
-    ws2.print_title_rows = base_ws.print_title_rows
-    ws2.print_title_cols = base_ws.print_title_cols
-
-    for key, dim in base_ws.row_dimensions.items():
-        ws2.row_dimensions[key].height = dim.height
-        ws2.row_dimensions[key].hidden = dim.hidden
-        ws2.row_dimensions[key].outlineLevel = dim.outlineLevel
-
-    for key, dim in base_ws.column_dimensions.items():
-        ws2.column_dimensions[key].width = dim.width
-        ws2.column_dimensions[key].hidden = dim.hidden
-        ws2.column_dimensions[key].bestFit = dim.bestFit
-        ws2.column_dimensions[key].outline_level = dim.outline_level
-
-    # odd header / footer only
-    ws2.oddHeader.left.text = base_ws.oddHeader.left.text
-    ws2.oddHeader.center.text = base_ws.oddHeader.center.text
-    ws2.oddHeader.right.text = base_ws.oddHeader.right.text
-
-    ws2.oddFooter.left.text = base_ws.oddFooter.left.text
-    ws2.oddFooter.center.text = base_ws.oddFooter.center.text
-    ws2.oddFooter.right.text = base_ws.oddFooter.right.text
+TEMPLATE_SHEET_NAME_TOKUYOU = _TOKUYOU.sheet
+TEMPLATE_SHEET_NAME_YUHOUSE = _YUHOUSE.sheet
 
+TAG_SHEET_NAME = _TAG.sheet
 
-def _copy_base_sheet(wb, base_ws, title, facility_mode: str):
-    ws2 = wb.copy_worksheet(base_ws)
-
-    existing = set(wb.sheetnames)
-    safe_title = sanitize_sheet_title(title, existing)
-    ws2.title = safe_title
-
-    _copy_sheet_layout(base_ws, ws2)
-    _clear_sheet_quantities(ws2)
-
-    if facility_mode == "yuhouse":
-        ws2[HEADER_CELL_FACILITY] = YUHOUSE_LABEL
-    else:
-        ws2[HEADER_CELL_FACILITY] = TOKUYOU_LABEL
-
-    return ws2
+FIXED_FIRST_ROW = DEFINITION.fixed_rows.first_row
+APPEND_START_ROW = DEFINITION.detail_first_row
+APPEND_MAX_ROWS = DEFINITION.detail_rows
 
 
 def generate_maruhachi_order_workbook(
@@ -248,140 +44,17 @@ def generate_maruhachi_order_workbook(
     tag_xlsm_path: str | Path,
     facility_mode: str,
     out_path: str | Path,
+    layout: str = LAYOUT_SHEETS,
 ) -> Path:
-    if facility_mode not in ("tokuyou", "yuhouse"):
-        raise ValueError("facility_mode must be 'tokuyou' or 'yuhouse'")
-
-    kenshu_xlsx_path = Path(kenshu_xlsx_path)
-    template_xlsm_path = Path(template_xlsm_path)
-    tag_xlsm_path = Path(tag_xlsm_path)
-    out_path = Path(out_path)
-
-    df = _read_kenshu(kenshu_xlsx_path)
-
-    # ------------------------------------------------------------
-    # ①検収簿整形後の統一列名を使用
-    # ------------------------------------------------------------
-    if facility_mode == "tokuyou":
-        col_res = "特養入所者"
-        col_staff = "特養職員"
-
-        missing_cols = []
-
-        if col_res not in df.columns:
-            missing_cols.append(col_res)
-
-        if col_staff not in df.columns:
-            missing_cols.append(col_staff)
-
-        if missing_cols:
-            raise KeyError(
-                "丸八発注書作成に必要な列が見つかりません："
-                + "、".join(missing_cols)
-                + "。①検収簿整形で作成した最新の加工済み検収簿を使用してください。"
-            )
-
-    else:
-        col_res = "ユーハウス"
-        col_staff = None
-
-        if col_res not in df.columns:
-            raise KeyError(
-                "『ユーハウス』列が見つかりません。"
-                "①検収簿整形で作成した最新の加工済み検収簿を使用してください。"
-            )
-
-    tag_map = load_tag_mapping(tag_xlsm_path)
-
-    wb = openpyxl.load_workbook(template_xlsm_path, keep_vba=True)
-
-    if facility_mode == "tokuyou":
-        base_ws = wb[TEMPLATE_SHEET_NAME_TOKUYOU]
-    else:
-        base_ws = wb[TEMPLATE_SHEET_NAME_YUHOUSE]
-
-    fixed_row_index = _build_fixed_row_index(base_ws)
-    _clear_sheet_quantities(base_ws)
-
-    use_dates = sorted(df[COL_USE_DATE].dropna().astype(str).unique().tolist())
-
-    for use_date in use_dates:
-        ddf = df[df[COL_USE_DATE].astype(str) == use_date].copy()
-        ddf[col_res] = pd.to_numeric(ddf[col_res], errors="coerce").fillna(0)
-
-        if col_staff is not None:
-            ddf[col_staff] = pd.to_numeric(ddf[col_staff], errors="coerce").fillna(0)
-            col_staff_tmp = col_staff
-        else:
-            ddf["_staff"] = 0
-            col_staff_tmp = "_staff"
-
-        grouped = (
-            ddf.groupby([COL_FOOD_NAME, COL_SPEC], dropna=False)[[col_res, col_staff_tmp]]
-            .sum()
-            .reset_index()
-        )
-
-        sheet_title = str(use_date)
-        ws = _copy_base_sheet(wb, base_ws, sheet_title, facility_mode)
-
-        append_items: List[Tuple[str, str, float, float]] = []
-
-        for _, row in grouped.iterrows():
-            food_name = _norm(row[COL_FOOD_NAME])
-            spec = str(row[COL_SPEC] or "")
-            qty_res = float(row[col_res] or 0)
-            qty_staff = float(row[col_staff_tmp] or 0)
-
-            if qty_res == 0 and qty_staff == 0:
-                continue
-
-            tag_key = _norm(food_name)
-            if tag_key in tag_map:
-                code, _, _ = tag_map[tag_key]
-                if code in fixed_row_index:
-                    rr = fixed_row_index[code]
-                    ws.cell(rr, COL_OUT_USE_DATE).value = use_date
-                    ws.cell(rr, COL_OUT_RESIDENT).value = qty_res if qty_res != 0 else None
-                    ws.cell(rr, COL_OUT_STAFF).value = qty_staff if qty_staff != 0 else None
-                else:
-                    append_items.append((food_name, spec, qty_res, qty_staff))
-            else:
-                append_items.append((food_name, spec, qty_res, qty_staff))
-
-        if append_items:
-            page = 1
-            pos = 0
-            while pos < len(append_items):
-                if page == 1:
-                    cur_ws = ws
-                else:
-                    cur_ws = _copy_base_sheet(
-                        wb,
-                        base_ws,
-                        f"{use_date}_{page}ページ目",
-                        facility_mode,
-                    )
-
-                for rr in range(APPEND_START_ROW, APPEND_START_ROW + APPEND_MAX_ROWS):
-                    if pos >= len(append_items):
-                        break
-
-                    f, sp, qr, qs = append_items[pos]
-                    _write_append_row(cur_ws, rr, use_date, f, sp, qr, qs)
-                    pos += 1
-
-                page += 1
-
-    # テンプレシートは削除せず非表示
-    if TEMPLATE_SHEET_NAME_TOKUYOU in wb.sheetnames:
-        wb[TEMPLATE_SHEET_NAME_TOKUYOU].sheet_state = "hidden"
-    if TEMPLATE_SHEET_NAME_YUHOUSE in wb.sheetnames:
-        wb[TEMPLATE_SHEET_NAME_YUHOUSE].sheet_state = "hidden"
-
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    wb.save(out_path)
-    return out_path
+    return fill_template_orders(
+        DEFINITION,
+        kenshu_xlsx_path=kenshu_xlsx_path,
+        template_xlsm_path=template_xlsm_path,
+        facility_mode=facility_mode,
+        out_path=out_path,
+        lookup_paths={_TAG.name: tag_xlsm_path},
+        layout=layout,
+    )
 
 
 def generate_maruhachi_order_forms_both_facilities(
@@ -389,27 +62,15 @@ def generate_maruhachi_order_forms_both_facilities(
     template_xlsm_path: str | Path,
     tag_xlsm_path: str | Path,
     out_dir: str | Path,
-    out_prefix: str = "丸八発注書",
+    out_prefix: str = DEFINITION.out_prefix,
+    layout: str = LAYOUT_SHEETS,
 ) -> Tuple[Path, Path]:
-    out_dir = Path(out_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    tokuyou_path = out_dir / f"{out_prefix}_特養.xlsm"
-    yuhouse_path = out_dir / f"{out_prefix}_ユーハウス.xlsm"
-
-    p1 = generate_maruhachi_order_workbook(
+    return fill_template_orders_both_facilities(
+        DEFINITION,
         kenshu_xlsx_path=kenshu_xlsx_path,
         template_xlsm_path=template_xlsm_path,
-        tag_xlsm_path=tag_xlsm_path,
-        facility_mode="tokuyou",
-        out_path=tokuyou_path,
+        out_dir=out_dir,
+        out_prefix=out_prefix,
+        lookup_paths={_TAG.name: tag_xlsm_path},
+        layout=layout,
     )
-    p2 = generate_maruhachi_order_workbook(
-        kenshu_xlsx_path=kenshu_xlsx_path,
-        template_xlsm_path=template_xlsm_path,
-        tag_xlsm_path=tag_xlsm_path,
-        facility_mode="yuhouse",
-        out_path=yuhouse_path,
-    )
-
-    return p1, p2
@@ -0,0 +1,370 @@
+import io
+import re
+from datetime import datetime
+
+import pandas as pd
+from openpyxl.styles import Font, Alignment, Border, Side
+from openpyxl.worksheet.page import PageMargins
+
+from instrumentation import stage, timed_exit, traced
+from xlsx_output import excel_writer
+
+
+# ------------------------------------------------------------
+# 共通処理
+# ------------------------------------------------------------
+def parse_mmdd(value):
+    if value is None or pd.isna(value):
+        return None
+
+    match = re.search(r"\d+/\d+", str(value))
+    if not match:
+        return None
+
+    try:
+        return datetime.strptime(match.group(), "%m/%d").replace(year=2000)
+    except ValueError:
+        return None
+
+
+def detect_min_usage_date_token(values):
+    dates = [parse_mmdd(value) for value in values]
+    dates = [value for value in dates if value is not None]
+
+    if not dates:
+        return ""
+
+    return min(dates).strftime("%m%d")
+
+
+def safe_sheet_name(value, used_names):
+    name = str(value).strip() or "仕入先未設定"
+    name = re.sub(r'[\\/*?:\[\]]', "＿", name)
+    name = name[:31] or "仕入先未設定"
+
+    base = name
+    number = 2
+
+    while name in used_names:
+        suffix = f"_{number}"
+        name = f"{base[:31 - len(suffix)]}{suffix}"
+        number += 1
+
+    used_names.add(name)
+    return name
+
+
+@traced()
+def apply_order_style(ws, is_tokuyou=False):
+    font_body = Font(name="ＭＳ ゴシック", size=18)
+    border = Border(
+        left=Side(style="thin"),
+        right=Side(style="thin"),
+        top=Side(style="thin"),
+        bottom=Side(style="thin"),
+    )
+    header_row = 6
+
+    # 6行目：ヘッダー行
+    for cell in ws[header_row]:
+        cell.font = Font(name="ＭＳ ゴシック", size=12, bold=True)
+        cell.alignment = Alignment(
+            horizontal="center",
+            vertical="center",
+            wrap_text=False,
+        )
+        cell.border = border
+
+    # 7行目以降：データ行
+    for row in ws.iter_rows(min_row=header_row + 1):
+        for cell in row:
+            cell.font = font_body
+            cell.alignment = Alignment(
+                vertical="center",
+                wrap_text=False,
+            )
+            cell.border = border
+
+    for row_number in range(1, ws.max_row + 1):
+        ws.row_dimensions[row_number].height = 30
+
+    # 列幅設定
+    ws.column_dimensions["A"].width = 15.18
+    ws.column_dimensions["B"].width = 60.09
+
+    for column in ["D", "E", "F", "G", "H"]:
+        ws.column_dimensions[column].width = 7.73
+
+    for column in ["C", "I", "J", "K", "L", "M"]:
+        ws.column_dimensions[column].width = 15.18
+
+    # いわと（特養）専用設定
+    if is_tokuyou:
+        for column in ["I", "L", "M"]:
+            ws.column_dimensions[column].width = 7
+
+        # C～E列の外枠を太線にする（内側の罫線は維持）
+        thick = Side(style="thick")
+        start_row = header_row
+        end_row = ws.max_row
+
+        if end_row >= start_row:
+            for row_number in range(start_row, end_row + 1):
+                left_cell = ws.cell(row_number, 3)
+                right_cell = ws.cell(row_number, 5)
+
+                left_cell.border = Border(
+                    left=thick,
+                    right=left_cell.border.right,
+                    top=thick if row_number == start_row else left_cell.border.top,
+                    bottom=thick if row_number == end_row else left_cell.border.bottom,
+                )
+                right_cell.border = Border(
+                    left=right_cell.border.left,
+                    right=thick,
+                    top=thick if row_number == start_row else right_cell.border.top,
+                    bottom=thick if row_number == end_row else right_cell.border.bottom,
+                )
+
+            for column_number in range(3, 6):
+                top_cell = ws.cell(start_row, column_number)
+                bottom_cell = ws.cell(end_row, column_number)
+                top_cell.border = Border(
+                    left=top_cell.border.left,
+                    right=top_cell.border.right,
+                    top=thick,
+                    bottom=top_cell.border.bottom,
+                )
+                bottom_cell.border = Border(
+                    left=bottom_cell.border.left,
+                    right=bottom_cell.border.right,
+                    top=bottom_cell.border.top,
+                    bottom=thick,
+                )
+
+    # B列（食品名）を縮小して全体表示
+    for row in ws.iter_rows(
+        min_row=header_row + 1,
+        max_row=ws.max_row,
+        min_col=2,
+        max_col=2,
+    ):
+        for cell in row:
+            cell.alignment = Alignment(
+                horizontal="left",
+                vertical="center",
+                wrap_text=False,
+                shrink_to_fit=True,
+            )
+
+    ws.page_setup.orientation = "landscape"
+    ws.page_setup.paperSize = ws.PAPERSIZE_A4
+    ws.sheet_properties.pageSetUpPr.fitToPage = True
+    ws.page_setup.fitToWidth = 1
+    ws.page_setup.fitToHeight = 0
+    ws.page_margins = PageMargins(
+        left=0.3,
+        right=0.3,
+        top=0.5,
+        bottom=0.5,
+        header=0.2,
+        footer=0.2,
+    )
+    ws.freeze_panes = "A7"
+    ws.print_area = f"A1:M{ws.max_row}"
+
+
+def create_header_iwato(ws, supplier):
+    ws.merge_cells("A3:B3")
+    ws["A3"] = f"{supplier} 御中"
+    ws["A3"].font = Font(name="ＭＳ ゴシック", size=28, bold=True)
+
+    ws["B1"] = "注文書（介護老人福祉施設いわと）"
+    ws["B1"].font = Font(name="ＭＳ ゴシック", size=26, bold=True)
+    ws["B1"].alignment = Alignment(horizontal="center")
+
+    ws["K3"] = "(有) ハートミール"
+    ws["K3"].font = Font(name="ＭＳ ゴシック", size=24, bold=True)
+    ws["K3"].alignment = Alignment(horizontal="right")
+
+
+def create_header_yuhouse(ws, supplier):
+    ws.merge_cells("A3:B3")
+    ws["A3"] = f"{supplier} 御中"
+    ws["A3"].font = Font(name="ＭＳ ゴシック", size=28, bold=True)
+
+    ws["B1"] = "注文書（ユーハウスいわと）"
+    ws["B1"].font = Font(name="ＭＳ ゴシック", size=26, bold=True)
+    ws["B1"].alignment = Alignment(horizontal="center")
+
+    ws["K3"] = "(有) ハートミール"
+    ws["K3"].font = Font(name="ＭＳ ゴシック", size=24, bold=True)
+    ws["K3"].alignment = Alignment(horizontal="right")
+
+
+def _supplier_blocks(df, source_sheet):
+    """シートの行を (仕入先, 行) に分ける。
+
+    仕入先ごとのシートなら1組だけ返す。② を1シートにまとめた仕訳表
+    （仕入先ごとに改ページ）では、仕入先が変わるところで分ける。
+    """
+    if "仕入先" not in df.columns:
+        yield source_sheet, df
+        return
+
+    names = df["仕入先"].astype(str).str.strip().where(df["仕入先"].notna(), "")
+    values = names[names != ""]
+
+    if values.nunique() <= 1:
+        yield (values.iloc[0] if not values.empty else source_sheet), df
+        return
+
+    names = names.mask(names == "").ffill().fillna(source_sheet)
+
+    for supplier, supplier_df in df.groupby(names, sort=False):
+        yield supplier, supplier_df
+
+
+def _order_rows(df):
+    """発注数量のある行を注文書の列にそろえ、(行, 使用日) を返す（なければ None）。"""
+    df["発注数量"] = pd.to_numeric(
+        df["総合計"],
+        errors="coerce",
+    ).fillna(0)
+
+    df = df.loc[df["発注数量"] != 0]
+
+    if df.empty:
+        return None
+
+    df["使用日_dt"] = df["使用日"].apply(parse_mmdd)
+    df = df.sort_values(
+        ["使用日_dt", "食品名"],
+        na_position="last",
+    )
+
+    df["備考欄"] = (
+        df["コメント"].fillna("")
+        if "コメント" in df.columns
+        else ""
+    )
+
+    for column in [
+        "鮮度",
+        "品温",
+        "異物",
+        "包装",
+        "期限",
+        "納品日",
+        "検収者",
+    ]:
+        df[column] = ""
+
+    columns = [
+        "使用日",
+        "食品名",
+        "発注数量",
+        "単位",
+        "鮮度",
+        "品温",
+        "異物",
+        "包装",
+        "期限",
+        "備考欄",
+        "納品日",
+        "検収者",
+    ]
+
+    order_df = df[columns]
+    order_df["使用日"] = order_df["使用日"].mask(
+        order_df["使用日"].duplicated(),
+        "",
+    )
+
+    return order_df, df["使用日"].dropna().tolist()
+
+
+def create_orders_from_vendor_sheets(uploaded_file, order_type):
+    with stage("pd.ExcelFile"):
+        excel_file = pd.ExcelFile(uploaded_file)
+
+    if not excel_file.sheet_names:
+        raise ValueError("Excelファイルにシートがありません。")
+
+    required_columns = ["使用日", "食品名", "総合計", "単位"]
+    output_data = []
+    all_usage_dates = []
+
+    for source_sheet in excel_file.sheet_names:
+        with stage("pd.read_excel"):
+            df = pd.read_excel(excel_file, sheet_name=source_sheet)
+        df = df.dropna(how="all")
+        df.columns = [str(column).strip() for column in df.columns]
+
+        missing = [
+            column for column in required_columns
+            if column not in df.columns
+        ]
+
+        if missing:
+            raise ValueError(
+                f"シート「{source_sheet}」に必要な列がありません: "
+                + "、".join(missing)
+            )
+
+        for supplier, supplier_df in _supplier_blocks(df, source_sheet):
+            rows = _order_rows(supplier_df)
+
+            if rows is None:
+                continue
+
+            order_df, usage_dates = rows
+            all_usage_dates.extend(usage_dates)
+            output_data.append((supplier, order_df))
+
+    if not output_data:
+        raise ValueError("発注数量が入力されたデータが見つかりません。")
+
+    buffer = io.BytesIO()
+    used_names = set()
+
+    with timed_exit("wb.save", excel_writer(buffer)) as writer:
+        sheet_map = []
+
+        for supplier, order_df in output_data:
+            sheet_name = safe_sheet_name(supplier, used_names)
+
+            with stage("to_excel"):
+                order_df.to_excel(
+                    writer,
+                    sheet_name=sheet_name,
+                    index=False,
+                    startrow=5,
+                )
+
+            sheet_map.append((sheet_name, supplier))
+
+        workbook = writer.book
+
+        for sheet_name, supplier in sheet_map:
+            ws = workbook[sheet_name]
+            is_tokuyou = order_type == "いわと"
+            apply_order_style(ws, is_tokuyou=is_tokuyou)
+
+            if is_tokuyou:
+                create_header_iwato(ws, supplier)
+            else:
+                create_header_yuhouse(ws, supplier)
+
+            ws["C6"] = "発注数量"
+            ws["J6"] = "備考欄"
+
+    token = detect_min_usage_date_token(all_usage_dates)
+    filename = (
+        f"発注書_全業者_{token}.xlsx"
+        if token
+        else "発注書_全業者.xlsx"
+    )
+
+    buffer.seek(0)
+    return buffer.read(), filename, len(output_data)
@@ -0,0 +1,222 @@
+import zipfile
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+from xml.etree.ElementTree import iterparse
+
+from xlsx_parts import MAIN_NS, sheet_paths
+
+
+# ------------------------------------------------------------
+# アップロードされたファイルの種類を先頭数行だけで判定する
+# xlsx の中の XML を直接読み、シート名と最初のシートの先頭
+# PROBE_ROWS 行だけを見る。openpyxl の read_only は開くときに
+# <dimension> の無いシートを最後まで走査するため使わない
+# （10万行の原本で数秒かかる）。
+# 違うファイルを選んだときは、重い処理の前に知らせる。
+# ------------------------------------------------------------
+PROBE_ROWS = 10
+
+RAW_KENSHU = "raw_kenshu"
+PROCESSED_KENSHU = "processed_kenshu"
+VENDOR_JOURNAL = "vendor_journal"
+MARUHACHI_TEMPLATE = "maruhachi_template"
+MARUHACHI_TAG = "maruhachi_tag"
+HOKUBU_TEMPLATE = "hokubu_template"
+UNKNOWN = "unknown"
+
+KIND_LABELS = {
+    RAW_KENSHU: "検収記録簿（原本）",
+    PROCESSED_KENSHU: "検収簿_加工済",
+    VENDOR_JOURNAL: "業者別仕訳表",
+    MARUHACHI_TEMPLATE: "丸八発注書テンプレート",
+    MARUHACHI_TAG: "丸八コード一覧（タグ）",
+    HOKUBU_TEMPLATE: "北部市場発注書テンプレート",
+    UNKNOWN: "不明なファイル",
+}
+
+# そのファイルを使う画面（違う画面に入れたときの案内）
+KIND_SCREENS = {
+    RAW_KENSHU: "「① 検収簿整形」",
+    PROCESSED_KENSHU: "「② 業者別仕訳表」「③ 注文書作成」「④ 丸八」「⑤ 北部市場」",
+    VENDOR_JOURNAL: "「業者別発注書作成」ページ",
+    MARUHACHI_TEMPLATE: "「④ 丸八発注書作成」のテンプレート欄",
+    MARUHACHI_TAG: "「④ 丸八発注書作成」のコード一覧欄",
+    HOKUBU_TEMPLATE: "「⑤ 北部市場発注書作成」のテンプレート欄",
+}
+
+# テンプレートのシート名（create_order_form_maruhachi / create_order_form_hokubu と同じ）
+# 補助機能の読み込みに失敗してもここは動くよう、名前だけを持つ
+MARUHACHI_TEMPLATE_SHEETS = (
+    "丸八ヒロタ発注書(介護老人福祉施設いわと）",
+    "丸八ヒロタ発注書(ユーハウス）",
+)
+MARUHACHI_TAG_SHEET = "タグ"
+HOKUBU_TEMPLATE_SHEETS = ("特養 (北部市場)", "ユーハウス(北部市場)")
+
+# 原本は7行目（0始まりで6）が見出し、加工済・仕訳表は1行目が見出し
+RAW_HEADER_ROW = 6
+KEY_HEADERS = ("仕入先", "食品名")
+
+
+@dataclass(frozen=True)
+class ProbeResult:
+    kind: str
+    sheet_names: tuple[str, ...] = ()
+    header_row: Optional[int] = None
+    headers: tuple[str, ...] = field(default=(), repr=False)
+
+    @property
+    def label(self) -> str:
+        return KIND_LABELS[self.kind]
+
+
+def _classify_sheets(sheet_names: list[str]) -> Optional[str]:
+    # 仕訳表にも「北部市場販売」のような仕入先シートがあるため、完全一致で見る
+    if MARUHACHI_TAG_SHEET in sheet_names:
+        return MARUHACHI_TAG
+
+    if any(name in sheet_names for name in MARUHACHI_TEMPLATE_SHEETS):
+        return MARUHACHI_TEMPLATE
+
+    if any(name in sheet_names for name in HOKUBU_TEMPLATE_SHEETS):
+        return HOKUBU_TEMPLATE
+
+    return None
+
+
+def _text(element) -> str:
+    return "".join(t.text or "" for t in element.iter(f"{MAIN_NS}t"))
+
+
+def _shared_strings(zf: zipfile.ZipFile, needed: set[int]) -> dict[int, str]:
+    """必要な番号の共有文字列だけを読む（見出しは先頭付近にあるので途中で止める）。"""
+    if not needed or "xl/sharedStrings.xml" not in zf.namelist():
+        return {}
+
+    last = max(needed)
+    found = {}
+    index = 0
+
+    with zf.open("xl/sharedStrings.xml") as f:
+        for _, el in iterparse(f):
+            if el.tag != f"{MAIN_NS}si":
+                continue
+            if index in needed:
+                found[index] = _text(el)
+            el.clear()
+            if index >= last:
+                break
+            index += 1
+
+    return found
+
+
+def _read_head_rows(zf: zipfile.ZipFile, path: str, max_rows: int) -> list[tuple]:
+    """最初のシートの先頭 max_rows 行を、行番号（0始まり）に合わせたリストで返す。"""
+    rows: dict[int, list] = {}
+    shared: set[int] = set()
+    row_number = 0
+
+    with zf.open(path) as f:
+        for _, el in iterparse(f):
+            if el.tag != f"{MAIN_NS}row":
+                continue
+
+            row_number = int(el.get("r", row_number + 1))
+            if row_number > max_rows:
+                break
+
+            values = []
+            for cell in el.iter(f"{MAIN_NS}c"):
+                kind = cell.get("t")
+                if kind == "inlineStr":
+                    values.append(_text(cell))
+                    continue
+
+                v = cell.find(f"{MAIN_NS}v")
+                if v is None or v.text is None:
+                    continue
+                if kind == "s":
+                    shared.add(int(v.text))
+                    values.append(int(v.text))
+                else:
+                    values.append(v.text)
+
+            rows[row_number - 1] = values
+            el.clear()
+
+    strings = _shared_strings(zf, shared)
+
+    return [
+        tuple(strings.get(v, "") if isinstance(v, int) else v for v in rows.get(i, ()))
+        for i in range(max(rows, default=-1) + 1)
+    ]
+
+
+def _find_header_row(rows: list[tuple]) -> tuple[Optional[int], tuple[str, ...]]:
+    for index, values in enumerate(rows):
+        texts = tuple(str(v).strip() for v in values if v is not None)
+        if all(key in texts for key in KEY_HEADERS):
+            return index, texts
+    return None, ()
+
+
+def probe_workbook(source, max_rows: int = PROBE_ROWS) -> ProbeResult:
+    """ファイルの種類を判定する。xlsx として開けないときは UNKNOWN。"""
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+    try:
+        with zipfile.ZipFile(source) as zf:
+            sheets = sheet_paths(zf)
+            sheet_names = [name for name, _ in sheets]
+            path = sheets[0][1] if sheets else None
+
+            kind = _classify_sheets(sheet_names)
+            if kind is not None:
+                return ProbeResult(kind, tuple(sheet_names))
+
+            if path is None:
+                return ProbeResult(UNKNOWN, tuple(sheet_names))
+
+            rows = _read_head_rows(zf, path, max_rows)
+
+    except (zipfile.BadZipFile, KeyError, ValueError, SyntaxError):
+        # xlsx でないファイルや壊れたファイルは、ここでは判定しない
+        return ProbeResult(UNKNOWN)
+
+    finally:
+        if hasattr(source, "seek"):
+            source.seek(0)
+
+    header_row, headers = _find_header_row(rows)
+
+    if header_row == RAW_HEADER_ROW:
+        kind = RAW_KENSHU
+    elif header_row == 0:
+        # ②で作る仕訳表は、各シートの最後に「コメント」列がある
+        kind = VENDOR_JOURNAL if "コメント" in headers else PROCESSED_KENSHU
+    else:
+        kind = UNKNOWN
+
+    return ProbeResult(kind, tuple(sheet_names), header_row, headers)
+
+
+def mismatch_message(result: ProbeResult, expected: Iterable[str]) -> Optional[str]:
+    """期待と違う種類なら、案内の文章を返す（判定できないときは None）。"""
+    expected = tuple(expected)
+
+    if result.kind in expected or result.kind == UNKNOWN:
+        return None
+
+    wanted = "・".join(KIND_LABELS[k] for k in expected)
+    message = (
+        f"このファイルは「{result.label}」のようです。"
+        f"ここでは「{wanted}」を選択してください。"
+    )
+
+    screen = KIND_SCREENS.get(result.kind)
+    if screen:
+        message += f"（このファイルは {screen} で使えます）"
+
+    return message
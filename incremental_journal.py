@@ -0,0 +1,188 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+from create_inspection_forms import (
+    iter_vendor_sheets,
+    prepare_vendor_journal_frame,
+    vendor_journal_file_name,
+    write_vendor_sheet,
+)
+from instrumentation import stage
+from output_store import OutputHandle, get_output_store
+from parallel_sheets import render_sheets
+from result_cache import CODE_VERSION
+from xlsx_parts import splice_sheets
+
+
+# ------------------------------------------------------------
+# ② 業者別仕訳表の差分作成
+# 仕入先ごとの行をハッシュにし、前回の出力の一覧（マニフェスト）と
+# 同じシートは作り直さずに、前回の xlsx からシートの XML をそのまま
+# 差し込む。書き直すのは内容が変わった仕入先だけ。
+# 前回の書式との対応が取れないときは、すべてのシートを作り直す。
+# ------------------------------------------------------------
+HISTORY_ENTRIES = int(os.environ.get("IWATO_JOURNAL_HISTORY", "32"))
+
+
+@dataclass(frozen=True)
+class JournalManifest:
+    """前回の出力に入っているシートと、その内容のハッシュ。"""
+
+    code_version: str
+    sheet_hashes: dict
+
+
+@dataclass(frozen=True)
+class IncrementalSummary:
+    sheet_count: int
+    rendered: int
+
+    @property
+    def reused(self) -> int:
+        return self.sheet_count - self.rendered
+
+
+def _sheet_hash(sheet_name: str, vendor_df: pd.DataFrame) -> str:
+    sha = hashlib.sha256()
+    sha.update(sheet_name.encode("utf-8"))
+    sha.update(repr([(str(c), str(t)) for c, t in vendor_df.dtypes.items()]).encode("utf-8"))
+    sha.update(pd.util.hash_pandas_object(vendor_df, index=False).to_numpy().tobytes())
+    return sha.hexdigest()
+
+
+# ------------------------------------------------------------
+# 作成
+# ------------------------------------------------------------
+def _write_placeholder(writer, sheet_name: str, vendor_df: pd.DataFrame) -> None:
+    # 中身は後で差し込むので、ブック側に残る設定（印刷範囲・見出し行）だけ作る
+    ws = writer.book.create_sheet(sheet_name)
+    last_col = ws.cell(row=1, column=vendor_df.shape[1]).column_letter
+    ws.print_area = f"A1:{last_col}{len(vendor_df) + 1}"
+    ws.print_title_rows = "1:1"
+
+
+def _render(sheets, reuse: set[str]) -> bytes:
+    # 作り直すシートは ②の通常の作成と同じく、複数のプロセスで作成する
+    return render_sheets(
+        write_vendor_sheet,
+        sheets,
+        placeholders=reuse,
+        write_placeholder=_write_placeholder,
+    )
+
+
+def render_vendor_journal(
+    df: pd.DataFrame,
+    previous: Optional[tuple[bytes, JournalManifest]] = None,
+) -> tuple[bytes, JournalManifest, IncrementalSummary]:
+    """prepare_vendor_journal_frame 済みの df から仕訳表を作る。
+
+    previous に前回の (出力, マニフェスト) を渡すと、内容が同じシートは
+    前回の出力から差し込む。
+    """
+    sheets = list(iter_vendor_sheets(df))
+    hashes = {name: _sheet_hash(name, vendor_df) for name, vendor_df in sheets}
+    reuse: set[str] = set()
+
+    if previous is not None and previous[1].code_version == CODE_VERSION:
+        previous_hashes = previous[1].sheet_hashes
+        reuse = {name for name, h in hashes.items() if previous_hashes.get(name) == h}
+
+        # 書式の一覧（styles.xml）をそろえるため、少なくとも1シートは作り直す
+        if len(reuse) == len(sheets):
+            reuse.discard(sheets[0][0])
+
+    data = _render(sheets, reuse)
+
+    if reuse:
+        with stage("journal.splice"):
+            spliced = splice_sheets(data, [(previous[0], reuse)])
+
+        if spliced is None:
+            reuse = set()
+            data = _render(sheets, reuse)
+        else:
+            data = spliced
+
+    return (
+        data,
+        JournalManifest(CODE_VERSION, hashes),
+        IncrementalSummary(len(sheets), len(sheets) - len(reuse)),
+    )
+
+
+# ------------------------------------------------------------
+# 前回の出力の記録（プロセス内で共有、ファイル名ごと）
+# ------------------------------------------------------------
+class JournalHistory:
+    def __init__(self, max_entries: int = HISTORY_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[OutputHandle, JournalManifest]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_name: str) -> Optional[tuple[OutputHandle, JournalManifest]]:
+        with self._lock:
+            entry = self._entries.get(file_name)
+            if entry is not None:
+                self._entries.move_to_end(file_name)
+            return entry
+
+    def put(self, file_name: str, handle: OutputHandle, manifest: JournalManifest) -> None:
+        with self._lock:
+            self._entries[file_name] = (handle, manifest)
+            self._entries.move_to_end(file_name)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_HISTORY: Optional[JournalHistory] = None
+_HISTORY_LOCK = threading.Lock()
+
+
+def get_journal_history() -> JournalHistory:
+    global _HISTORY
+
+    with _HISTORY_LOCK:
+        if _HISTORY is None:
+            _HISTORY = JournalHistory()
+        return _HISTORY
+
+
+def create_vendor_journal_incremental(uploaded_file):
+    """② を差分で作成し、(出力ストアのハンドル, 作り直したシート数) を返す。
+
+    同じ期間（同じ出力ファイル名）の前回の出力があれば、それを元にする。
+    """
+    with stage("pd.read_excel"):
+        df = pd.read_excel(uploaded_file)
+
+    df = prepare_vendor_journal_frame(df)
+    file_name = vendor_journal_file_name(df)
+
+    store = get_output_store()
+    history = get_journal_history()
+
+    previous = None
+    entry = history.get(file_name)
+
+    if entry is not None:
+        try:
+            previous = (store.read_bytes(entry[0]), entry[1])
+        except FileNotFoundError:
+            previous = None
+
+    data, manifest, summary = render_vendor_journal(df, previous)
+
+    with stage("output_store.put"):
+        handle = store.put_bytes(data, file_name)
+
+    history.put(file_name, handle, manifest)
+
+    return handle, summary
@@ -0,0 +1,129 @@
+import io
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import PurePath
+from typing import Optional
+
+from create_inspection_forms import format_inspection_workbook
+from instrumentation import stage
+from kenshu_frame import enable_copy_on_write
+from xlsx_output import OutputZipFile
+
+
+# ------------------------------------------------------------
+# ① 検収簿整形の一括処理
+# 複数の原本を別々のプロセスで同時に整形し、結果を1つの ZIP に
+# まとめる。openpyxl・pandas の処理は GIL を手放さないため、
+# スレッドではなくプロセスで並べる（時間はファイル数ではなく
+# CPU 数で割れる）。Streamlit はスレッドを持つため、子プロセスは
+# fork ではなく spawn で起動する。
+# ------------------------------------------------------------
+BATCH_WORKERS = int(os.environ.get("IWATO_BATCH_WORKERS", "0")) or (os.cpu_count() or 1)
+
+
+@dataclass(frozen=True)
+class BatchFileStatus:
+    """一括処理した1ファイルの結果（画面の一覧に1行で表示する）。"""
+
+    source_name: str
+    ok: bool
+    output_name: str = ""
+    seconds: float = 0.0
+    message: str = ""
+
+
+def _format_one(data: bytes) -> tuple[bytes, str, float]:
+    """子プロセスで1ファイルを整形する。"""
+    started = time.perf_counter()
+    output, file_name = format_inspection_workbook(io.BytesIO(data))
+    return output, file_name, time.perf_counter() - started
+
+
+def _unique_name(name: str, used: set[str]) -> str:
+    # 同じ期間の原本が2つあると出力名も同じになるため、番号を付ける
+    path = PurePath(name)
+    candidate = name
+    index = 2
+
+    while candidate in used:
+        candidate = f"{path.stem}_{index}{path.suffix}"
+        index += 1
+
+    used.add(candidate)
+    return candidate
+
+
+def format_inspection_batch(
+    files: list[tuple[str, bytes]],
+    max_workers: Optional[int] = None,
+) -> tuple[bytes, str, list[BatchFileStatus]]:
+    """(ファイル名, 内容) の一覧を整形し、(ZIP, ZIP名, ファイルごとの結果) を返す。
+
+    1ファイルの失敗はほかのファイルに影響せず、結果の一覧に理由を残す。
+    """
+    if not files:
+        raise ValueError("整形するファイルがありません。")
+
+    workers = max(1, min(max_workers or BATCH_WORKERS, len(files)))
+    results: dict[int, tuple] = {}
+    statuses: list[Optional[BatchFileStatus]] = [None] * len(files)
+
+    with stage("batch.process_pool"):
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            # spawn の子プロセスはアプリの設定を引き継がない
+            initializer=enable_copy_on_write,
+        ) as executor:
+            futures = {
+                executor.submit(_format_one, data): index
+                for index, (_name, data) in enumerate(files)
+            }
+
+            for future in as_completed(futures):
+                index = futures[future]
+                source_name = files[index][0]
+
+                try:
+                    results[index] = future.result()
+                except BrokenProcessPool:
+                    statuses[index] = BatchFileStatus(
+                        source_name,
+                        ok=False,
+                        message="処理中のプロセスが停止しました（メモリ不足の可能性があります）。",
+                    )
+                except Exception as exc:
+                    statuses[index] = BatchFileStatus(
+                        source_name,
+                        ok=False,
+                        message=f"{type(exc).__name__}: {exc}",
+                    )
+
+    # アップロード順に並べて ZIP に入れる
+    buffer = io.BytesIO()
+    used_names: set[str] = set()
+
+    with stage("batch.zip"):
+        # xlsx はすでに圧縮済みなので、ZIP では圧縮しない
+        with OutputZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as zf:
+            for index, (source_name, _data) in enumerate(files):
+                if index not in results:
+                    continue
+
+                output, file_name, seconds = results[index]
+                file_name = _unique_name(file_name, used_names)
+                zf.writestr(file_name, output)
+
+                statuses[index] = BatchFileStatus(
+                    source_name,
+                    ok=True,
+                    output_name=file_name,
+                    seconds=round(seconds, 1),
+                )
+
+    return buffer.getvalue(), f"検収簿_加工済_{len(results)}件.zip", statuses
@@ -0,0 +1,308 @@
+import functools
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Callable, Optional
+
+
+# ------------------------------------------------------------
+# 処理段階ごとの計測（所要時間・tracemalloc のピーク）
+# 作成処理1回分を trace で囲み、その中の stage ごとに記録する。
+# trace の外で stage を呼んでも何もしない（通常時の負荷はほぼなし）。
+# 所要時間（perf_counter）は常に記録する。
+# tracemalloc はプロセス全体で1つで、動いている間は同じプロセスの
+# すべての処理が数倍遅くなる。そのためメモリのピークは、
+# IWATO_TRACE_MEMORY=1 のときか、その作成だけ memory=True を
+# 指定したとき（cProfile を取るとき）にだけ測る。
+# 同時に複数の作成が走っているときのメモリ値は目安として扱う。
+# ------------------------------------------------------------
+TRACE_MEMORY = os.environ.get("IWATO_TRACE_MEMORY", "0") == "1"
+LOG_PATH = Path(
+    os.environ.get(
+        "IWATO_PERF_LOG",
+        Path(tempfile.gettempdir()) / "iwato_perf.jsonl",
+    )
+)
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+RECENT_TRACES = 50
+
+MB = 1024 * 1024
+
+
+class _Frame:
+    __slots__ = ("path", "started", "start_mem", "peak_seen")
+
+    def __init__(self, path: str, start_mem: int):
+        self.path = path
+        self.started = time.perf_counter()
+        self.start_mem = start_mem
+        self.peak_seen = start_mem
+
+
+class Trace:
+    """作成処理1回分の計測結果。同じ名前の段階は回数・合計時間にまとめる。"""
+
+    def __init__(self, name: str, meta: Optional[dict] = None):
+        self.name = name
+        self.meta = meta or {}
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.stages: dict[str, dict] = {}
+        self.total_seconds = 0.0
+        self.peak_mb: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def add(self, path: str, seconds: float, peak_bytes: Optional[int]) -> None:
+        stat = self.stages.setdefault(
+            path,
+            {"stage": path, "calls": 0, "seconds": 0.0, "peak_mb": None},
+        )
+        stat["calls"] += 1
+        stat["seconds"] += seconds
+
+        if peak_bytes is not None:
+            peak_mb = round(peak_bytes / MB, 2)
+            stat["peak_mb"] = max(stat["peak_mb"] or 0.0, peak_mb)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "total_seconds": round(self.total_seconds, 4),
+            "peak_mb": self.peak_mb,
+            "error": self.error,
+            "meta": self.meta,
+            "stages": [
+                {**stat, "seconds": round(stat["seconds"], 4)}
+                for stat in self.stages.values()
+            ],
+        }
+
+
+_local = threading.local()
+_recent: deque = deque(maxlen=RECENT_TRACES)
+_recent_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+
+def _stack() -> list:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _memory_enabled() -> bool:
+    return getattr(_local, "memory", False) and tracemalloc.is_tracing()
+
+
+def _enter(name: str) -> _Frame:
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    path = f"{parent.path} > {name}" if parent is not None and parent.path else name
+
+    start_mem = 0
+    if _memory_enabled():
+        current, peak = tracemalloc.get_traced_memory()
+        if parent is not None:
+            parent.peak_seen = max(parent.peak_seen, peak)
+        tracemalloc.reset_peak()
+        start_mem = current
+
+    frame = _Frame(path, start_mem)
+    stack.append(frame)
+    return frame
+
+
+def _exit(frame: _Frame) -> tuple[float, Optional[int]]:
+    stack = _stack()
+    stack.pop()
+    seconds = time.perf_counter() - frame.started
+
+    peak_bytes = None
+    if _memory_enabled():
+        _, peak = tracemalloc.get_traced_memory()
+        frame.peak_seen = max(frame.peak_seen, peak)
+        peak_bytes = frame.peak_seen - frame.start_mem
+        if stack:
+            stack[-1].peak_seen = max(stack[-1].peak_seen, frame.peak_seen)
+
+    return seconds, peak_bytes
+
+
+@contextmanager
+def stage(name: str):
+    """trace の中で、この段階の所要時間とメモリのピークを記録する。"""
+    trace_obj = getattr(_local, "trace", None)
+
+    if trace_obj is None:
+        yield
+        return
+
+    frame = _enter(name)
+    try:
+        yield
+    finally:
+        seconds, peak_bytes = _exit(frame)
+        trace_obj.add(frame.path, seconds, peak_bytes)
+
+
+def traced(name: Optional[str] = None):
+    """関数全体を1つの段階として記録するデコレーター。"""
+
+    def decorator(fn: Callable) -> Callable:
+        stage_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def timed_exit(name: str, cm):
+    """cm の終了処理（ExcelWriter の保存など）を1つの段階として記録する。"""
+    value = cm.__enter__()
+
+    try:
+        yield value
+    except BaseException:
+        if not cm.__exit__(*sys.exc_info()):
+            raise
+    else:
+        with stage(name):
+            cm.__exit__(None, None, None)
+
+
+def _start_tracemalloc() -> None:
+    global _tracemalloc_users
+
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc() -> None:
+    global _tracemalloc_users
+
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+@contextmanager
+def trace(name: str, memory: Optional[bool] = None, **meta):
+    """作成処理1回分の計測を開始する（入れ子の場合は外側の trace に含める）。
+
+    memory を省略すると IWATO_TRACE_MEMORY に従う。
+    """
+    if getattr(_local, "trace", None) is not None:
+        with stage(name):
+            yield _local.trace
+        return
+
+    if memory is None:
+        memory = TRACE_MEMORY
+
+    trace_obj = Trace(name, meta)
+    if memory:
+        _start_tracemalloc()
+    _local.trace = trace_obj
+    _local.memory = memory
+    _local.stack = []
+
+    frame = _enter("")
+    try:
+        yield trace_obj
+    except BaseException as exc:
+        trace_obj.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        seconds, peak_bytes = _exit(frame)
+        trace_obj.total_seconds = seconds
+        if peak_bytes is not None:
+            trace_obj.peak_mb = round(peak_bytes / MB, 2)
+
+        _local.trace = None
+        _local.memory = False
+        if memory:
+            _stop_tracemalloc()
+
+        _remember(trace_obj)
+
+
+def run_traced(name: str, fn: Callable, *args, **kwargs):
+    with trace(name):
+        return fn(*args, **kwargs)
+
+
+def run_traced_with_memory(name: str, fn: Callable, *args, **kwargs):
+    """run_traced と同じだが、IWATO_TRACE_MEMORY によらずメモリのピークも測る。"""
+    with trace(name, memory=True):
+        return fn(*args, **kwargs)
+
+
+# ------------------------------------------------------------
+# 記録の保存（直近の一覧＋ローテーションする JSONL ログ）
+# ------------------------------------------------------------
+_logger: Optional[logging.Logger] = None
+_logger_lock = threading.Lock()
+
+
+def _perf_logger() -> logging.Logger:
+    global _logger
+
+    with _logger_lock:
+        if _logger is None:
+            logger = logging.getLogger("iwato.perf")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+            LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                LOG_PATH,
+                maxBytes=LOG_MAX_BYTES,
+                backupCount=LOG_BACKUP_COUNT,
+                encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+
+            _logger = logger
+
+        return _logger
+
+
+def _remember(trace_obj: Trace) -> None:
+    record = trace_obj.to_dict()
+
+    with _recent_lock:
+        _recent.append(record)
+
+    try:
+        _perf_logger().info(json.dumps(record, ensure_ascii=False))
+    except OSError:
+        pass
+
+
+def recent_traces() -> list[dict]:
+    """直近の計測結果（新しい順）。"""
+    with _recent_lock:
+        return list(reversed(_recent))
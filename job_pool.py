@@ -0,0 +1,233 @@
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+
+# ------------------------------------------------------------
+# サーバー全体で共有するワーカープール
+# 複数の職員が同時に帳票を作成しても、openpyxl の読み込みが
+# 一斉に走ってメモリが溢れないよう、同時実行数とメモリ見積りで
+# 受付を制御する。上限を超えた依頼は順番待ちの列に並ぶ。
+# ------------------------------------------------------------
+MAX_WORKERS = int(os.environ.get("IWATO_MAX_WORKERS", "2"))
+MEMORY_BUDGET_MB = int(os.environ.get("IWATO_MEMORY_BUDGET_MB", "1536"))
+
+# openpyxl はセルごとにオブジェクトを持つため、xlsx（zip圧縮）の
+# ファイルサイズに対して数十倍のメモリを使う
+MEMORY_PER_UPLOAD_BYTE = 40
+BASE_JOB_MEMORY_MB = 64
+
+MB = 1024 * 1024
+
+
+def estimate_job_memory(upload_sizes: Iterable[int]) -> int:
+    """アップロードされたファイルサイズから、1件の処理に必要なメモリ（バイト）を見積もる。"""
+    total = sum(int(size or 0) for size in upload_sizes)
+    return BASE_JOB_MEMORY_MB * MB + total * MEMORY_PER_UPLOAD_BYTE
+
+
+class Job:
+    """プールに登録された1件の作成依頼。"""
+
+    def __init__(self, job_id: int, label: str, estimated_bytes: int, pool: "JobPool"):
+        self.job_id = job_id
+        self.label = label
+        self.estimated_bytes = estimated_bytes
+        self.future: Future = Future()
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self._pool = pool
+
+    def position(self) -> int:
+        """順番待ちの位置を返す（1 = 次に実行、0 = 実行中または完了）。"""
+        return self._pool.position(self)
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout: Optional[float] = None):
+        return self.future.result(timeout)
+
+
+class JobPool:
+    def __init__(self, max_workers: int = MAX_WORKERS, memory_budget_mb: int = MEMORY_BUDGET_MB):
+        if max_workers < 1:
+            raise ValueError("max_workers must be 1 or more")
+
+        self.max_workers = max_workers
+        self.memory_budget = memory_budget_mb * MB
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="iwato-job",
+        )
+        self._lock = threading.Lock()
+        self._waiting: deque[tuple[Job, Callable, tuple, dict]] = deque()
+        self._running: set[Job] = set()
+        self._memory_in_use = 0
+        self._ids = itertools.count(1)
+
+    # --------------------------------------------------------
+    # 受付
+    # --------------------------------------------------------
+    def submit(
+        self,
+        label: str,
+        fn: Callable,
+        *args,
+        upload_sizes: Iterable[int] = (),
+        **kwargs,
+    ) -> Job:
+        job = Job(
+            job_id=next(self._ids),
+            label=label,
+            estimated_bytes=estimate_job_memory(upload_sizes),
+            pool=self,
+        )
+
+        with self._lock:
+            self._waiting.append((job, fn, args, kwargs))
+            self._dispatch_locked()
+
+        return job
+
+    def _can_admit_locked(self, job: Job) -> bool:
+        if len(self._running) >= self.max_workers:
+            return False
+
+        # 何も実行していなければ、見積りが予算を超えていても1件は通す
+        if not self._running:
+            return True
+
+        return self._memory_in_use + job.estimated_bytes <= self.memory_budget
+
+    def _dispatch_locked(self) -> None:
+        # 先頭から順番に受け付ける（追い越しはしない）
+        while self._waiting:
+            job, fn, args, kwargs = self._waiting[0]
+
+            if not self._can_admit_locked(job):
+                break
+
+            self._waiting.popleft()
+            self._running.add(job)
+            self._memory_in_use += job.estimated_bytes
+            job.started_at = time.monotonic()
+
+            self._executor.submit(self._run, job, fn, args, kwargs)
+
+    def _run(self, job: Job, fn: Callable, args: tuple, kwargs: dict) -> None:
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as exc:
+            job.future.set_exception(exc)
+        else:
+            job.future.set_result(result)
+        finally:
+            with self._lock:
+                self._running.discard(job)
+                self._memory_in_use -= job.estimated_bytes
+                self._dispatch_locked()
+
+    # --------------------------------------------------------
+    # 状態確認
+    # --------------------------------------------------------
+    def position(self, job: Job) -> int:
+        with self._lock:
+            for index, (waiting_job, *_rest) in enumerate(self._waiting, start=1):
+                if waiting_job is job:
+                    return index
+        return 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "waiting": len(self._waiting),
+                "max_workers": self.max_workers,
+                "memory_in_use_mb": round(self._memory_in_use / MB, 1),
+                "memory_budget_mb": round(self.memory_budget / MB, 1),
+            }
+
+
+# ------------------------------------------------------------
+# プロセス内で1つだけ作成する（Streamlit の全セッションで共有）
+# ------------------------------------------------------------
+_POOL: Optional[JobPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_job_pool() -> JobPool:
+    global _POOL
+
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = JobPool()
+        return _POOL
+
+
+def submit_job(
+    label: str,
+    fn: Callable,
+    *args,
+    upload_sizes: Iterable[int] = (),
+    **kwargs,
+) -> Job:
+    """共有プールへ登録する（完了を待たない）。"""
+    return get_job_pool().submit(
+        label,
+        fn,
+        *args,
+        upload_sizes=upload_sizes,
+        **kwargs,
+    )
+
+
+def wait_for_job(
+    job: Job,
+    on_wait: Optional[Callable[[int], None]] = None,
+    poll_interval: float = 0.5,
+):
+    """完了まで待って結果を返す。
+
+    on_wait には待ち行列の位置（0 = 実行中）が変わるたびに渡される。
+    """
+    last_position = None
+
+    while not job.done():
+        position = job.position()
+
+        if on_wait is not None and position != last_position:
+            on_wait(position)
+            last_position = position
+
+        try:
+            return job.result(timeout=poll_interval)
+        except TimeoutError:
+            continue
+
+    return job.result()
+
+
+def run_job(
+    label: str,
+    fn: Callable,
+    *args,
+    upload_sizes: Iterable[int] = (),
+    on_wait: Optional[Callable[[int], None]] = None,
+    poll_interval: float = 0.5,
+    **kwargs,
+):
+    """共有プールで fn を実行し、完了まで待って結果を返す。"""
+    job = submit_job(
+        label,
+        fn,
+        *args,
+        upload_sizes=upload_sizes,
+        **kwargs,
+    )
+    return wait_for_job(job, on_wait, poll_interval)
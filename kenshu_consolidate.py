@@ -0,0 +1,105 @@
+import io
+from dataclasses import dataclass
+
+import pandas as pd
+
+from column_resolver import FACILITY_COLUMNS
+from create_inspection_forms import (
+    JOURNAL_LAYOUT_SHEETS,
+    build_order_workbook,
+    build_vendor_journal_workbook,
+)
+from instrumentation import stage
+from kenshu_frame import compact_kenshu_frame, text_values
+
+
+# ------------------------------------------------------------
+# 複数期間の検収簿_加工済をまとめる
+# 半月ごとの出力などを1つの DataFrame にし、中間の xlsx を作らずに
+# ②・③の作成処理へ渡す。ファイルは1つずつ読み、前のファイルに
+# 同じ行（納品日・使用日・朝昼夕・仕入先・食品名が同じ）があれば
+# 捨てる。残す行だけを持つので、読み込んだ全行を同時には持たない。
+# ------------------------------------------------------------
+KEY_COLUMNS = ("納品日", "使用日", "朝昼夕", "仕入先", "食品名")
+
+
+@dataclass(frozen=True)
+class ConsolidatedSource:
+    """まとめた1ファイルの行数（画面の一覧に1行で表示する）。"""
+
+    source_name: str
+    rows: int
+    kept: int
+
+    @property
+    def duplicates(self) -> int:
+        return self.rows - self.kept
+
+
+def _row_hashes(df: pd.DataFrame) -> pd.Series:
+    # ファイルごとにカテゴリや欠損の持ち方が違っても同じ値になるよう、文字列にそろえる
+    keys = pd.DataFrame(
+        {col: text_values(df[col]).astype(str) for col in KEY_COLUMNS}
+    )
+    return pd.util.hash_pandas_object(keys, index=False)
+
+
+def consolidate_kenshu(
+    sources: list[tuple[str, bytes]],
+) -> tuple[pd.DataFrame, list[ConsolidatedSource]]:
+    """(ファイル名, 内容) の一覧を1つの加工済み検収簿にまとめる。
+
+    重なった行は先に選ばれたファイルの行を残す。1つのファイルの中で
+    同じキーの行が複数あっても、それは別の行として残す。
+    """
+    if not sources:
+        raise ValueError("まとめるファイルがありません。")
+
+    seen: set[int] = set()
+    frames: list[pd.DataFrame] = []
+    summary: list[ConsolidatedSource] = []
+
+    for source_name, data in sources:
+        with stage("pd.read_excel"):
+            df = pd.read_excel(io.BytesIO(data))
+
+        df = df.rename(columns=FACILITY_COLUMNS.rename_map(df.columns))
+
+        missing = [col for col in KEY_COLUMNS if col not in df.columns]
+        if missing:
+            raise ValueError(
+                f"『{source_name}』に必要な列が見つかりません："
+                + "、".join(missing)
+                + "。①検収簿整形で作成した加工済み検収簿を使用してください。"
+            )
+
+        with stage("compact_kenshu_frame"):
+            df = compact_kenshu_frame(df)
+
+        with stage("consolidate.row_hash"):
+            hashes = _row_hashes(df)
+            keep = ~hashes.isin(seen).to_numpy()
+            seen.update(hashes.to_numpy().tolist())
+
+        summary.append(ConsolidatedSource(source_name, len(df), int(keep.sum())))
+        frames.append(df[keep])
+
+    with stage("consolidate.concat"):
+        # ファイルごとにカテゴリが違う列は object になるため、まとめた後で小さくし直す
+        merged = compact_kenshu_frame(pd.concat(frames, ignore_index=True))
+
+    return merged, summary
+
+
+def create_consolidated_vendor_journal(sources, layout=JOURNAL_LAYOUT_SHEETS):
+    """複数の加工済み検収簿から仕訳表を作成する（戻り値の最後はまとめた結果）。"""
+    df, summary = consolidate_kenshu(sources)
+    data, file_name = build_vendor_journal_workbook(df, layout)
+    return data, file_name, summary
+
+
+def create_consolidated_order_workbook(sources, order_type):
+    """複数の加工済み検収簿から注文書を作成する（戻り値の最後はまとめた結果）。"""
+    df, summary = consolidate_kenshu(sources)
+    data, file_name = build_order_workbook(df, order_type)
+    return data, file_name, summary
@@ -0,0 +1,176 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from column_resolver import FACILITY_COLUMNS
+from create_inspection_forms import build_order_workbook
+from instrumentation import stage
+from kenshu_frame import text_values
+
+
+# ------------------------------------------------------------
+# 訂正版の検収簿との差分だけの注文書
+# 前回と訂正版の検収簿_加工済を (使用日, 仕入先, 食品名, 単位) で突き合わせ、
+# 注文数量が変わった行だけを ③ と同じ書式の注文書にする。
+# 同じキーの行（朝昼夕の違いなど）は数量を合計してから比べる。
+# 取消の行は数量を 0 と書き、前回の数量は備考欄に書く（数量の列だけを
+# 見て納品されないように）。
+# 突き合わせはハッシュ結合（groupby と merge）なので、行数に比例した
+# 時間で終わる。
+# ------------------------------------------------------------
+DIFF_KEYS = ("使用日", "仕入先", "食品名", "単位")
+
+ADDED = "追加"
+REMOVED = "取消"
+CHANGED = "変更"
+
+# 注文書の種類ごとの数量列と、備考欄に前回の数量を書くときの名前
+QUANTITY_LABELS = {
+    "特養": {"特養入所者": "入所者", "特養職員": "職員"},
+    "ユーハウス": {"ユーハウス": ""},
+}
+
+
+@dataclass(frozen=True)
+class DiffSummary:
+    """差分の件数と、差分の注文書に載せた仕入先。"""
+
+    added: int
+    removed: int
+    changed: int
+    suppliers: tuple
+
+    @property
+    def lines(self) -> int:
+        return self.added + self.removed + self.changed
+
+
+def _quantity_labels(order_type: str) -> dict:
+    return QUANTITY_LABELS["特養" if "特養" in order_type else "ユーハウス"]
+
+
+def _line_totals(df: pd.DataFrame, qty_cols: list[str], source: str) -> pd.DataFrame:
+    """キーごとの数量の合計（数量がすべて0の行は除く）。"""
+    df = df.rename(columns=FACILITY_COLUMNS.rename_map(df.columns))
+
+    missing = [c for c in (*DIFF_KEYS, *qty_cols) if c not in df.columns]
+    if missing:
+        raise ValueError(
+            f"{source}の検収簿に必要な列が見つかりません："
+            + "、".join(missing)
+            + "。①検収簿整形で作成した加工済み検収簿を使用してください。"
+        )
+
+    # ③ と同じく、空欄のキーは上の行の値で埋める
+    lines = pd.DataFrame(
+        {c: text_values(df[c].ffill()).astype(str) for c in DIFF_KEYS}
+    )
+
+    for c in qty_cols:
+        lines[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
+
+    lines = lines[lines["仕入先"] != ""]
+
+    totals = (
+        lines.groupby(list(DIFF_KEYS), sort=False)[qty_cols]
+        .sum()
+        .round(6)
+    )
+
+    return totals[(totals != 0).any(axis=1)].reset_index()
+
+
+def _previous_note(row, labels: dict) -> str:
+    parts = [
+        f"{label} {row[f'{col}_前回']:g}".strip()
+        for col, label in labels.items()
+    ]
+    return f"{row['区分']}（前回 " + "・".join(parts) + "）"
+
+
+def diff_kenshu(old_df: pd.DataFrame, new_df: pd.DataFrame, order_type: str) -> pd.DataFrame:
+    """前回と訂正版の差分の行を、加工済み検収簿と同じ列名で返す。
+
+    区分は「追加」「取消」「変更」。数量は訂正版の値（取消の行は 0）、
+    備考欄には区分（変更・取消の行は前回の数量も）を書く。
+    """
+    labels = _quantity_labels(order_type)
+    qty_cols = list(labels)
+
+    with stage("diff.line_totals"):
+        old = _line_totals(old_df, qty_cols, "前回")
+        new = _line_totals(new_df, qty_cols, "訂正版")
+
+    with stage("diff.merge"):
+        merged = old.merge(
+            new,
+            on=list(DIFF_KEYS),
+            how="outer",
+            suffixes=("_前回", ""),
+            indicator=True,
+            sort=False,
+        )
+
+    old_qty = merged[[f"{c}_前回" for c in qty_cols]].fillna(0).to_numpy()
+    new_qty = merged[qty_cols].fillna(0).to_numpy()
+
+    status = np.select(
+        [
+            merged["_merge"] == "right_only",
+            merged["_merge"] == "left_only",
+            (old_qty != new_qty).any(axis=1),
+        ],
+        [ADDED, REMOVED, CHANGED],
+        default="",
+    )
+
+    merged = merged[status != ""]
+    status = status[status != ""]
+
+    delta = merged[list(DIFF_KEYS)].reset_index(drop=True)
+
+    for c in qty_cols:
+        delta[c] = merged[c].fillna(0).to_numpy()
+
+    notes = pd.Series(status, dtype=object)
+    previous = status != ADDED
+
+    if previous.any():
+        notes[previous] = (
+            merged[previous]
+            .assign(区分=status[previous])
+            .apply(_previous_note, axis=1, labels=labels)
+            .to_numpy()
+        )
+
+    delta["備考欄"] = notes.to_numpy()
+    delta["区分"] = status
+
+    return delta
+
+
+def create_delta_order_workbook(old_file, new_file, order_type):
+    """訂正版で数量が変わった行だけの注文書を作成する（戻り値の最後は件数）。"""
+    with stage("pd.read_excel"):
+        old_df = pd.read_excel(old_file)
+        new_df = pd.read_excel(new_file)
+
+    delta = diff_kenshu(old_df, new_df, order_type)
+
+    if delta.empty:
+        raise ValueError(
+            "前回と訂正版の検収簿で、注文数量が変わった行はありませんでした。"
+        )
+
+    counts = delta["区分"].value_counts()
+    summary = DiffSummary(
+        added=int(counts.get(ADDED, 0)),
+        removed=int(counts.get(REMOVED, 0)),
+        changed=int(counts.get(CHANGED, 0)),
+        suppliers=tuple(delta["仕入先"].drop_duplicates()),
+    )
+
+    data, file_name = build_order_workbook(delta, order_type, keep_zero=True)
+
+    return data, file_name.replace("注文書_", "注文書_差分_", 1), summary
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+
+# ------------------------------------------------------------
+# 加工済み検収簿の DataFrame を小さな型にそろえる
+# 仕入先・朝昼夕・単位・使用日・納品日は同じ値が何千行も続くため
+# カテゴリ型（整数コード）にし、groupby や絞り込みを整数で行う。
+# 数量列は float32 でも値が変わらないときだけ float32 にする。
+# ------------------------------------------------------------
+CATEGORY_COLUMNS = ("仕入先", "朝昼夕", "単位", "使用日", "納品日")
+
+QUANTITY_COLUMNS = ("特養入所者", "特養職員", "ユーハウス", "総合計")
+
+
+def enable_copy_on_write() -> None:
+    """pandas の copy-on-write を有効にする（アプリと子プロセスの起動時に1回呼ぶ）。
+
+    絞り込み結果は元の DataFrame とデータを共有し、書き換えるときだけコピーする。
+    作成処理はこれを前提に .copy() を付けないため、プロセス全体の設定として
+    読み込み順によらず最初に決めておく。
+    """
+    pd.set_option("mode.copy_on_write", True)
+
+
+def _is_category(series: pd.Series) -> bool:
+    return isinstance(series.dtype, pd.CategoricalDtype)
+
+
+def _downcast_quantity(series: pd.Series) -> pd.Series:
+    """値が変わらない範囲で、数量列をより小さい数値型にする。"""
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return pd.to_numeric(series, downcast="integer")
+
+    if series.dtype != np.float64:
+        return series
+
+    values = series.to_numpy()
+    narrowed = values.astype(np.float32)
+
+    # 0.1 のように float32 では別の値になるものが1つでもあれば float64 のまま
+    if not np.array_equal(narrowed.astype(np.float64), values, equal_nan=True):
+        return series
+
+    return pd.Series(narrowed, index=series.index, name=series.name)
+
+
+def compact_kenshu_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """読み込んだ直後の加工済み検収簿をカテゴリ型・小さな数値型へ変換する。"""
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not _is_category(df[col]):
+            df[col] = df[col].astype("category")
+
+    for col in QUANTITY_COLUMNS:
+        if col in df.columns:
+            df[col] = _downcast_quantity(df[col])
+
+    return df
+
+
+def text_values(
+    series: pd.Series,
+    fill: str = "",
+    blank: str | None = None,
+    strip: bool = True,
+) -> pd.Series:
+    """series.fillna(fill).astype(str).str.strip() と同じ文字列にする。
+
+    blank を指定すると、空文字になった値を blank に置き換える。
+    カテゴリ型なら種類ごとに1回だけ計算し、結果もカテゴリ型
+    （文字列順）で返すので、そのまま groupby や絞り込みに使える。
+    """
+    if not _is_category(series):
+        result = series.fillna(fill).astype(str)
+
+        if strip:
+            result = result.str.strip()
+
+        if blank is not None:
+            result = result.mask(result == "", blank)
+
+        return result
+
+    labels = series.cat.categories.astype(str)
+
+    if strip:
+        labels = labels.str.strip()
+
+    # 欠損（コード -1）は末尾の fill を指す
+    fill_label = fill.strip() if strip else fill
+    labels = np.append(labels.to_numpy(dtype=object), fill_label)
+
+    if blank is not None:
+        labels[labels == ""] = blank
+
+    categories = pd.Index(pd.unique(labels)).sort_values()
+    codes = categories.get_indexer(labels)[series.cat.codes.to_numpy()]
+
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=categories),
+        index=series.index,
+        name=series.name,
+    )
+
+
+def map_values(series: pd.Series, func) -> pd.Series:
+    """series.apply(func) と同じ結果を返す（カテゴリ型なら種類ごとに1回だけ呼ぶ）。"""
+    if not _is_category(series):
+        return series.apply(func)
+
+    mapped = np.empty(len(series.cat.categories) + 1, dtype=object)
+    mapped[:-1] = [func(value) for value in series.cat.categories]
+    mapped[-1] = func(np.nan)
+
+    return pd.Series(
+        mapped[series.cat.codes.to_numpy()],
+        index=series.index,
+        name=series.name,
+    ).infer_objects()
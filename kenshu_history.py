@@ -0,0 +1,595 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional
+
+import pandas as pd
+
+from instrumentation import stage
+from result_cache import CODE_VERSION
+
+
+# ------------------------------------------------------------
+# 加工済み検収簿の履歴（SQLite）
+# ① で整形した行を1つのデータベースに貯め、期間や仕入先での検索に
+# 使う（古い xlsx をアップロードし直して読み直さずに済む）。
+# IWATO_HISTORY_DB にファイルの場所を指定したときだけ保存する。
+# 同じ内容の検収簿は、行の内容のハッシュで1回だけ保存する。
+#
+# 使用日は「12/1金」のように年を持たないため、取り込んだ日に最も近い
+# 年の日付（前後半年以内）を usage_date（YYYY-MM-DD）として持つ。
+# 同じ使用日を含む検収簿を何度か取り込んだ場合（訂正版など）、
+# 検索では最後に取り込んだものを使う。
+#
+# 仕入先 × 週（月曜始まり）の数量の合計は vendor_week_totals に持ち、
+# 取り込みのたびに、その検収簿の使用日を含む週だけを集計し直す。
+# 集計画面はこの表だけを読むため、履歴の量によらず速い。
+#
+# 食品名の検索には、食品名の種類ごとの n-gram（1文字と2文字）の
+# 転置索引 food_ngrams を持つ。行ではなく食品名に索引を付け、
+# 見つかった食品名の行は kenshu_rows の食品名の索引で引く。
+# ------------------------------------------------------------
+HISTORY_DB = os.environ.get("IWATO_HISTORY_DB", "")
+
+# SQLite の列名 → 加工済み検収簿の列名（この順で返す）
+ROW_COLUMNS = {
+    "delivery_label": "納品日",
+    "usage_label": "使用日",
+    "meal": "朝昼夕",
+    "vendor": "仕入先",
+    "food": "食品名",
+    "conversion": "換算値",
+    "total": "総合計",
+    "unit": "単位",
+    "tokuyou_residents": "特養入所者",
+    "tokuyou_staff": "特養職員",
+    "yuhouse": "ユーハウス",
+}
+
+TEXT_COLUMNS = ("delivery_label", "usage_label", "meal", "vendor", "food", "unit")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingests (
+    ingest_id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL UNIQUE,
+    source_name TEXT NOT NULL,
+    ingested_at TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    first_date TEXT,
+    last_date TEXT,
+    code_version TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS kenshu_rows (
+    ingest_id INTEGER NOT NULL REFERENCES ingests(ingest_id) ON DELETE CASCADE,
+    row_no INTEGER NOT NULL,
+    usage_date TEXT,
+    delivery_label TEXT NOT NULL,
+    usage_label TEXT NOT NULL,
+    meal TEXT NOT NULL,
+    vendor TEXT NOT NULL,
+    food TEXT NOT NULL,
+    conversion REAL,
+    total REAL,
+    unit TEXT NOT NULL,
+    tokuyou_residents REAL,
+    tokuyou_staff REAL,
+    yuhouse REAL,
+    PRIMARY KEY (ingest_id, row_no)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS kenshu_rows_usage_date
+    ON kenshu_rows (usage_date, ingest_id);
+CREATE INDEX IF NOT EXISTS kenshu_rows_vendor
+    ON kenshu_rows (vendor, usage_date);
+CREATE INDEX IF NOT EXISTS kenshu_rows_food
+    ON kenshu_rows (food, usage_date);
+
+CREATE TABLE IF NOT EXISTS vendor_week_totals (
+    week_start TEXT NOT NULL,
+    vendor TEXT NOT NULL,
+    tokuyou_residents REAL NOT NULL,
+    tokuyou_staff REAL NOT NULL,
+    yuhouse REAL NOT NULL,
+    line_count INTEGER NOT NULL,
+    PRIMARY KEY (week_start, vendor)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS food_names (
+    food_id INTEGER PRIMARY KEY,
+    food TEXT NOT NULL UNIQUE,
+    normalized TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS food_ngrams (
+    gram TEXT NOT NULL,
+    food_id INTEGER NOT NULL REFERENCES food_names(food_id),
+    PRIMARY KEY (gram, food_id)
+) WITHOUT ROWID;
+"""
+
+# 1回の検索で行を引く食品名の数と、食品名ごとの行数の上限
+SEARCH_MAX_FOODS = 100
+SEARCH_LINES_PER_FOOD = 20
+
+# 週の始まり（月曜）。'weekday 0' は次の日曜（日曜ならその日）
+_WEEK_START = "date(r.usage_date, 'weekday 0', '-6 days')"
+
+# vendor_week_totals の列名 → 画面に出す列名
+WEEK_COLUMNS = {
+    "week_start": "週",
+    "vendor": "仕入先",
+    "tokuyou_residents": "特養入所者",
+    "tokuyou_staff": "特養職員",
+    "yuhouse": "ユーハウス",
+    "line_count": "行数",
+}
+
+# 同じ使用日の行は、その使用日を含む最後の取り込みのものだけを使う
+_LATEST = """
+r.ingest_id = (
+    SELECT MAX(l.ingest_id) FROM kenshu_rows AS l
+    WHERE l.usage_date IS r.usage_date
+)
+"""
+
+# 数量のある行（検収簿には載っていても、注文していない行は数量が0か空欄）
+_ORDERED = """
+(r.tokuyou_residents != 0 OR r.tokuyou_staff != 0 OR r.yuhouse != 0)
+"""
+
+_MMDD = re.compile(r"(\d+)/(\d+)")
+
+_logger = logging.getLogger("iwato.history")
+
+
+@dataclass(frozen=True)
+class IngestRecord:
+    """1回の取り込み（加工済み検収簿1ファイル分）。"""
+
+    ingest_id: int
+    content_hash: str
+    source_name: str
+    ingested_at: str
+    row_count: int
+    first_date: Optional[str]
+    last_date: Optional[str]
+    created: bool = False
+
+
+def infer_usage_date(label, reference: date) -> Optional[date]:
+    """「12/1金」を、reference に最も近い年の日付にする（読めなければ None）。"""
+    # create_inspection_forms.parse_mmdd と同じ読み方（年だけ補う）
+    match = _MMDD.search(str(label))
+
+    if match is None:
+        return None
+
+    month, day = int(match.group(1)), int(match.group(2))
+    candidates = []
+
+    for year in (reference.year - 1, reference.year, reference.year + 1):
+        try:
+            candidates.append(date(year, month, day))
+        except ValueError:
+            # 2/29 は閏年だけ。13/1 などはどの年でも読めない
+            continue
+
+    if not candidates:
+        return None
+
+    return min(candidates, key=lambda d: abs((d - reference).days))
+
+
+def canonical_rows(df: pd.DataFrame, reference: date) -> pd.DataFrame:
+    """加工済み検収簿を、kenshu_rows と同じ列の DataFrame にする。"""
+    rows = pd.DataFrame(index=range(len(df)))
+
+    for column, source in ROW_COLUMNS.items():
+        values = df[source].reset_index(drop=True) if source in df.columns else None
+
+        if column in TEXT_COLUMNS:
+            rows[column] = (
+                "" if values is None
+                else values.astype(object).where(values.notna(), "").astype(str).str.strip()
+            )
+        else:
+            rows[column] = (
+                float("nan") if values is None
+                else pd.to_numeric(values, errors="coerce").astype("float64")
+            )
+
+    # 使用日の種類ごとに1回だけ日付にする
+    dates = {
+        label: infer_usage_date(label, reference)
+        for label in rows["usage_label"].unique()
+    }
+    rows.insert(
+        0,
+        "usage_date",
+        rows["usage_label"].map(lambda v: dates[v].isoformat() if dates[v] else None),
+    )
+
+    return rows
+
+
+def normalize_food_name(value) -> str:
+    """検索用の食品名。全角・半角をそろえ（NFKC）、空白は丸八の _norm と同じく
+    全角の空白も含めて1つにまとめ、前後を落とす。英字は小文字にする。"""
+    if value is None:
+        return ""
+    t = unicodedata.normalize("NFKC", str(value))
+    t = t.replace("\u3000", " ")
+    t = re.sub(r"\s+", " ", t)
+    return t.strip().casefold()
+
+
+def food_ngrams(normalized: str) -> set[str]:
+    """索引に入れる n-gram（語ごとの1文字と2文字。空白をまたがない）。"""
+    grams = set()
+
+    for word in normalized.split(" "):
+        grams.update(word)
+        grams.update(word[i:i + 2] for i in range(len(word) - 1))
+
+    return grams
+
+
+def _query_grams(word: str) -> set[str]:
+    # 2文字以上の語は2文字の n-gram だけで探す（1文字より絞り込める）
+    if len(word) < 2:
+        return {word}
+    return {word[i:i + 2] for i in range(len(word) - 1)}
+
+
+def content_hash(rows: pd.DataFrame) -> str:
+    # 取り込んだ日で変わる usage_date は含めない
+    content = rows.drop(columns="usage_date")
+    sha = hashlib.sha256()
+    sha.update(repr(list(content.columns)).encode("utf-8"))
+    sha.update(pd.util.hash_pandas_object(content, index=False).to_numpy().tobytes())
+    return sha.hexdigest()
+
+
+class KenshuHistory:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(SCHEMA)
+
+            # 集計表より前に作った履歴なら、ここで一度だけ全体を集計する
+            has_rows = conn.execute("SELECT 1 FROM kenshu_rows LIMIT 1").fetchone() is not None
+
+            if has_rows and conn.execute("SELECT 1 FROM vendor_week_totals LIMIT 1").fetchone() is None:
+                self._refresh_weekly(conn, None, None)
+
+            if has_rows and conn.execute("SELECT 1 FROM food_names LIMIT 1").fetchone() is None:
+                foods = [row[0] for row in conn.execute("SELECT DISTINCT food FROM kenshu_rows")]
+                self._index_foods(conn, foods)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        # 書き込み中も検索できるように（一括整形では複数のプロセスから書く）
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    # --------------------------------------------------------
+    # 保存
+    # --------------------------------------------------------
+    def record(
+        self,
+        df: pd.DataFrame,
+        source_name: str,
+        ingested_at: Optional[datetime] = None,
+    ) -> IngestRecord:
+        """加工済み検収簿を保存する（同じ内容なら保存済みの記録を返す）。"""
+        ingested_at = ingested_at or datetime.now()
+
+        with stage("history.canonical_rows"):
+            rows = canonical_rows(df, ingested_at.date())
+            digest = content_hash(rows)
+
+        dates = rows["usage_date"].dropna()
+
+        with self._lock, closing(self._connect()) as conn, conn:
+            # 一括整形では別のプロセスも書くため、確認から保存までをまとめて押さえる
+            conn.execute("BEGIN IMMEDIATE")
+
+            existing = self._find(conn, digest)
+            if existing is not None:
+                return existing
+
+            with stage("history.insert"):
+                cursor = conn.execute(
+                    "INSERT INTO ingests (content_hash, source_name, ingested_at,"
+                    " row_count, first_date, last_date, code_version)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        digest,
+                        source_name,
+                        ingested_at.isoformat(timespec="seconds"),
+                        len(rows),
+                        dates.min() if len(dates) else None,
+                        dates.max() if len(dates) else None,
+                        CODE_VERSION,
+                    ),
+                )
+                ingest_id = cursor.lastrowid
+
+                columns = ["ingest_id", "row_no", *rows.columns]
+                conn.executemany(
+                    f"INSERT INTO kenshu_rows ({', '.join(columns)})"
+                    f" VALUES ({', '.join('?' * len(columns))})",
+                    (
+                        (ingest_id, row_no, *values)
+                        for row_no, values in enumerate(
+                            rows.itertuples(index=False, name=None)
+                        )
+                    ),
+                )
+
+            if len(dates):
+                with stage("history.weekly_totals"):
+                    self._refresh_weekly(conn, dates.min(), dates.max())
+
+            with stage("history.food_index"):
+                self._index_foods(conn, rows["food"].unique())
+
+        return IngestRecord(
+            ingest_id,
+            digest,
+            source_name,
+            ingested_at.isoformat(timespec="seconds"),
+            len(rows),
+            dates.min() if len(dates) else None,
+            dates.max() if len(dates) else None,
+            created=True,
+        )
+
+    def _find(self, conn, digest: str) -> Optional[IngestRecord]:
+        row = conn.execute(
+            "SELECT ingest_id, content_hash, source_name, ingested_at, row_count,"
+            " first_date, last_date FROM ingests WHERE content_hash = ?",
+            (digest,),
+        ).fetchone()
+
+        return None if row is None else IngestRecord(*row)
+
+    def _refresh_weekly(self, conn, first_date: Optional[str], last_date: Optional[str]) -> None:
+        """first_date〜last_date を含む週の集計を作り直す（None なら全期間）。"""
+        where = ["r.usage_date IS NOT NULL", _LATEST]
+        params = []
+
+        if first_date is not None:
+            week_from, week_to = conn.execute(
+                "SELECT date(?, 'weekday 0', '-6 days'), date(?, 'weekday 0')",
+                (first_date, last_date),
+            ).fetchone()
+
+            conn.execute(
+                "DELETE FROM vendor_week_totals WHERE week_start BETWEEN ? AND ?",
+                (week_from, week_to),
+            )
+            where.append("r.usage_date BETWEEN ? AND ?")
+            params += [week_from, week_to]
+        else:
+            conn.execute("DELETE FROM vendor_week_totals")
+
+        conn.execute(
+            "INSERT INTO vendor_week_totals"
+            f" SELECT {_WEEK_START} AS week_start, r.vendor,"
+            " TOTAL(r.tokuyou_residents), TOTAL(r.tokuyou_staff), TOTAL(r.yuhouse),"
+            " COUNT(*)"
+            " FROM kenshu_rows AS r"
+            " WHERE " + " AND ".join(where)
+            + " GROUP BY week_start, r.vendor",
+            params,
+        )
+
+    def _index_foods(self, conn, foods) -> None:
+        """まだ索引に無い食品名を food_names・food_ngrams に加える。"""
+        for food in foods:
+            normalized = normalize_food_name(food)
+
+            if not normalized:
+                continue
+
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO food_names (food, normalized) VALUES (?, ?)",
+                (food, normalized),
+            )
+
+            if cursor.rowcount:
+                conn.executemany(
+                    "INSERT INTO food_ngrams (gram, food_id) VALUES (?, ?)",
+                    [(gram, cursor.lastrowid) for gram in food_ngrams(normalized)],
+                )
+
+    def rebuild_weekly(self) -> None:
+        """週ごとの集計を全期間について作り直す。"""
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._refresh_weekly(conn, None, None)
+
+    # --------------------------------------------------------
+    # 検索
+    # --------------------------------------------------------
+    def search_foods(self, text: str, limit: int = SEARCH_MAX_FOODS) -> list[str]:
+        """text のすべての語を含む食品名（全角・半角、空白、大文字小文字は区別しない）。"""
+        words = [w for w in normalize_food_name(text).split(" ") if w]
+
+        if not words:
+            return []
+
+        grams = set().union(*(_query_grams(w) for w in words))
+
+        with closing(self._connect()) as conn:
+            candidates = conn.execute(
+                "SELECT f.food, f.normalized FROM food_names AS f"
+                " WHERE f.food_id IN ("
+                "  SELECT food_id FROM food_ngrams"
+                f"  WHERE gram IN ({', '.join('?' * len(grams))})"
+                "  GROUP BY food_id HAVING COUNT(*) = ?"
+                " ) ORDER BY f.normalized",
+                [*grams, len(grams)],
+            ).fetchall()
+
+        # n-gram がすべてあっても並びが違うことがあるため、語がそのまま含まれるか確かめる
+        matches = [
+            food for food, normalized in candidates
+            if all(w in normalized for w in words)
+        ]
+
+        return matches[:limit]
+
+    def search(
+        self,
+        text: str,
+        lines_per_food: int = SEARCH_LINES_PER_FOOD,
+    ) -> pd.DataFrame:
+        """食品名で注文した行を探し、食品名ごとに新しい使用日から lines_per_food 行を返す。"""
+        foods = self.search_foods(text)
+
+        if not foods:
+            return pd.DataFrame(columns=["usage_date", *ROW_COLUMNS.values()])
+
+        sql = (
+            f"SELECT usage_date, {', '.join(ROW_COLUMNS)} FROM ("
+            f" SELECT r.usage_date, {', '.join('r.' + c for c in ROW_COLUMNS)},"
+            "  ROW_NUMBER() OVER ("
+            "   PARTITION BY r.food ORDER BY r.usage_date DESC, r.row_no"
+            "  ) AS line_no"
+            " FROM kenshu_rows AS r"
+            f" WHERE r.food IN ({', '.join('?' * len(foods))}) AND {_ORDERED} AND {_LATEST}"
+            ") WHERE line_no <= ?"
+            " ORDER BY usage_date DESC, food"
+        )
+
+        with closing(self._connect()) as conn, stage("history.search"):
+            result = pd.read_sql_query(sql, conn, params=[*foods, lines_per_food])
+
+        return result.rename(columns=ROW_COLUMNS)
+
+    def weekly_totals(
+        self,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> pd.DataFrame:
+        """仕入先 × 週の数量の合計（週の月曜が start〜end の週）。"""
+        where = []
+        params = []
+
+        if start is not None:
+            where.append("week_start >= ?")
+            params.append(start.isoformat())
+
+        if end is not None:
+            where.append("week_start <= ?")
+            params.append(end.isoformat())
+
+        sql = (
+            f"SELECT {', '.join(WEEK_COLUMNS)} FROM vendor_week_totals"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + " ORDER BY week_start, vendor"
+        )
+
+        with closing(self._connect()) as conn:
+            result = pd.read_sql_query(sql, conn, params=params)
+
+        return result.rename(columns=WEEK_COLUMNS)
+
+    def ingests(self) -> list[IngestRecord]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT ingest_id, content_hash, source_name, ingested_at, row_count,"
+                " first_date, last_date FROM ingests ORDER BY ingest_id"
+            ).fetchall()
+
+        return [IngestRecord(*row) for row in rows]
+
+    def query(
+        self,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        vendor: Optional[str] = None,
+        food: Optional[str] = None,
+        latest_only: bool = True,
+    ) -> pd.DataFrame:
+        """使用日の期間（両端を含む）・仕入先・食品名で行を探す。
+
+        結果は加工済み検収簿と同じ列名に、usage_date（YYYY-MM-DD）を加えたもの。
+        """
+        where = []
+        params = []
+
+        if start is not None:
+            where.append("r.usage_date >= ?")
+            params.append(start.isoformat())
+
+        if end is not None:
+            where.append("r.usage_date <= ?")
+            params.append(end.isoformat())
+
+        if vendor is not None:
+            where.append("r.vendor = ?")
+            params.append(vendor)
+
+        if food is not None:
+            where.append("r.food = ?")
+            params.append(food)
+
+        if latest_only:
+            where.append(_LATEST)
+
+        sql = (
+            f"SELECT r.usage_date, {', '.join('r.' + c for c in ROW_COLUMNS)}"
+            " FROM kenshu_rows AS r"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + " ORDER BY r.usage_date, r.ingest_id, r.row_no"
+        )
+
+        with closing(self._connect()) as conn, stage("history.query"):
+            result = pd.read_sql_query(sql, conn, params=params)
+
+        return result.rename(columns=ROW_COLUMNS)
+
+
+_HISTORY: Optional[KenshuHistory] = None
+_HISTORY_LOCK = threading.Lock()
+
+
+def get_kenshu_history() -> Optional[KenshuHistory]:
+    """履歴のデータベース（IWATO_HISTORY_DB が空なら None）。"""
+    global _HISTORY
+
+    if not HISTORY_DB:
+        return None
+
+    with _HISTORY_LOCK:
+        if _HISTORY is None:
+            _HISTORY = KenshuHistory(HISTORY_DB)
+        return _HISTORY
+
+
+def record_processed_kenshu(df: pd.DataFrame, source_name: str) -> Optional[IngestRecord]:
+    """① の結果を履歴に保存する。保存に失敗しても ① は止めない。"""
+    history = get_kenshu_history()
+
+    if history is None:
+        return None
+
+    try:
+        return history.record(df, source_name)
+    except sqlite3.Error:
+        _logger.exception("検収簿の履歴を保存できませんでした: %s", source_name)
+        return None
@@ -0,0 +1,302 @@
+import datetime
+import io
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from openpyxl.cell.cell import ERROR_CODES
+from pandas.io.parsers import TextParser
+
+from instrumentation import stage
+
+
+# ------------------------------------------------------------
+# 検収記録簿（原本）の読み込み
+# 大きなファイルは openpyxl の read_only で1行ずつ読み、E～K列が
+# 空の行はその場で捨てる（DataFrame には入れない）。残った行は
+# CHUNK_ROWS 行ごとに DataFrame にして最後につなぐ。
+# 列の型は pd.read_excel(header=[6, 7]) と同じになるように決め、
+# 同じにできない列があるときは pd.read_excel で読み直す。
+# ------------------------------------------------------------
+INGEST_MODE = os.environ.get("IWATO_INGEST", "auto")
+STREAM_MIN_BYTES = int(float(os.environ.get("IWATO_STREAM_MIN_MB", "1")) * 1024 * 1024)
+CHUNK_ROWS = int(os.environ.get("IWATO_STREAM_CHUNK_ROWS", "20000"))
+
+HEADER_ROWS = (6, 7)
+
+# ExcelのE～K列（0始まりでは4～10）
+EK_SLICE = slice(4, 11)
+
+_NA = "na"
+
+
+def _source_size(source) -> int:
+    if isinstance(source, (str, Path)):
+        return Path(source).stat().st_size
+
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+
+    size = getattr(source, "size", None)
+    if size is not None:
+        return int(size)
+
+    with source.getbuffer() as view:
+        return view.nbytes
+
+
+def _rewind(source) -> None:
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+
+def _convert_cell(value):
+    """pandas の openpyxl 読み込みと同じ値にする（空欄は ""、整数値は int）。"""
+    if value is None:
+        return ""
+
+    if isinstance(value, bool):
+        return value
+
+    if isinstance(value, (int, float)):
+        as_int = int(value)
+        if as_int == value:
+            return as_int
+        return float(value)
+
+    if isinstance(value, str) and value in ERROR_CODES:
+        return np.nan
+
+    return value
+
+
+def _trim(row: list) -> list:
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+def _is_blank_cell(value) -> bool:
+    return value == "" or (isinstance(value, str) and value.strip() == "")
+
+
+def _value_kind(value) -> str:
+    """捨てた行の値が、列の型の決定にどう効くかを pandas の dtype 名で表す。"""
+    if value == "" or value != value:
+        return _NA
+
+    if isinstance(value, bool):
+        return "bool"
+
+    if isinstance(value, int):
+        return "int64"
+
+    if isinstance(value, float):
+        return "float64"
+
+    if isinstance(value, str):
+        return "object"
+
+    if isinstance(value, datetime.datetime):
+        return "datetime64[ns]"
+
+    return "unknown"
+
+
+def _merged_dtype(chunk_kinds: set[str], dropped_kinds: set[str], has_na: bool) -> Optional[str]:
+    """チャンクごとの型と捨てた行の値から、列全体を一度に読んだときの型を決める。
+
+    判断できない組み合わせは None（pd.read_excel で読み直す）。
+    """
+    # 文字列の列は、捨てた行に何があっても object のまま
+    if chunk_kinds == {"object"}:
+        return "object"
+
+    kinds = chunk_kinds | dropped_kinds
+
+    if not kinds:
+        return "float64"
+
+    if kinds == {"int64"}:
+        return "float64" if has_na else "int64"
+
+    if kinds <= {"int64", "float64"}:
+        return "float64"
+
+    if kinds in ({"object"}, {"datetime64[ns]"}):
+        return kinds.pop()
+
+    if kinds == {"bool"} and not has_na:
+        return "bool"
+
+    return None
+
+
+def _parse_chunk(header: list[list], rows: list[list], width: int) -> pd.DataFrame:
+    data = [list(h) for h in header]
+    data.extend(
+        row + [""] * (width - len(row))
+        for row in rows
+    )
+
+    return TextParser(
+        data,
+        header=list(range(len(header))),
+        skip_blank_lines=False,
+    ).read()
+
+
+def stream_raw_kenshu(
+    source,
+    header_rows: tuple[int, ...] = HEADER_ROWS,
+    chunk_rows: int = CHUNK_ROWS,
+) -> Optional[pd.DataFrame]:
+    """原本を1行ずつ読み、E～K列が空の行を除いた DataFrame を返す。
+
+    pd.read_excel と同じ列・型にできない場合は None を返す。
+    """
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True, keep_links=False)
+
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()
+        rows = ws.iter_rows(values_only=True)
+
+        # 見出しより上の行と2段見出し
+        first_data_row = max(header_rows) + 1
+        top_rows = []
+        for values in rows:
+            top_rows.append(_trim([_convert_cell(v) for v in values]))
+            if len(top_rows) == first_data_row:
+                break
+
+        if len(top_rows) < first_data_row:
+            return None
+
+        width = max(len(r) for r in top_rows)
+        if width < EK_SLICE.stop:
+            return None
+
+        # 上段の空欄は左の見出しで埋める（pd.read_excel と同じ）
+        header = []
+        control_row = [True] * width
+        for index in header_rows:
+            row = top_rows[index] + [""] * (width - len(top_rows[index]))
+            last = row[0]
+            for i in range(1, width):
+                if not control_row[i]:
+                    last = row[i]
+                if row[i] == "" or row[i] is None:
+                    row[i] = last
+                else:
+                    control_row[i] = False
+                    last = row[i]
+            header.append(row)
+
+        chunks: list[pd.DataFrame] = []
+        pending: list[list] = []
+        dropped_kinds: list[set[str]] = [set() for _ in range(width)]
+        blank_lines = 0
+
+        for values in rows:
+            row = _trim([_convert_cell(v) for v in values])
+
+            # 空行は、後ろにデータ行が続くときだけ欠損として数える
+            if not row:
+                blank_lines += 1
+                continue
+
+            if len(row) > width:
+                return None
+
+            if blank_lines:
+                for kinds in dropped_kinds:
+                    kinds.add(_NA)
+                blank_lines = 0
+
+            # E～K列がすべて空の行はここで捨てる（列の型への影響だけ記録）
+            if all(_is_blank_cell(v) for v in row[EK_SLICE]):
+                for i in range(width):
+                    dropped_kinds[i].add(_value_kind(row[i]) if i < len(row) else _NA)
+                continue
+
+            pending.append(row)
+
+            if len(pending) >= chunk_rows:
+                chunks.append(_parse_chunk(header, pending, width))
+                pending = []
+
+        if pending:
+            chunks.append(_parse_chunk(header, pending, width))
+
+    finally:
+        wb.close()
+
+    if not chunks:
+        return None
+
+    # ------------------------------------------------------------
+    # チャンクごとの型をそろえる
+    # ------------------------------------------------------------
+    targets = {}
+
+    for position in range(chunks[0].shape[1]):
+        chunk_kinds = set()
+        has_na = _NA in dropped_kinds[position]
+
+        for chunk in chunks:
+            series = chunk.iloc[:, position]
+            if series.isna().all():
+                has_na = True
+                continue
+            chunk_kinds.add(str(series.dtype))
+            has_na = has_na or bool(series.isna().any())
+
+        target = _merged_dtype(
+            chunk_kinds,
+            dropped_kinds[position] - {_NA},
+            has_na,
+        )
+        if target is None:
+            return None
+        targets[position] = target
+
+    for chunk in chunks:
+        for position, target in targets.items():
+            if str(chunk.iloc[:, position].dtype) != target:
+                chunk.isetitem(position, chunk.iloc[:, position].astype(target))
+
+    return pd.concat(chunks, ignore_index=True)
+
+
+def read_raw_kenshu(uploaded_file, ingest: Optional[str] = None) -> pd.DataFrame:
+    """検収記録簿（原本）を読み込む。
+
+    ingest="pandas" は pd.read_excel、"stream" は1行ずつの読み込み、
+    "auto"（既定）は STREAM_MIN_BYTES 以上のファイルだけ1行ずつ読む。
+    """
+    ingest = ingest or INGEST_MODE
+
+    if ingest == "auto":
+        ingest = "stream" if _source_size(uploaded_file) >= STREAM_MIN_BYTES else "pandas"
+
+    if ingest == "stream":
+        if isinstance(uploaded_file, (bytes, bytearray)):
+            uploaded_file = io.BytesIO(uploaded_file)
+
+        with stage("stream_raw_kenshu"):
+            df = stream_raw_kenshu(uploaded_file)
+
+        if df is not None:
+            return df
+
+        _rewind(uploaded_file)
+
+    elif ingest != "pandas":
+        raise ValueError("ingest must be 'auto', 'stream' or 'pandas'")
+
+    with stage("pd.read_excel"):
+        return pd.read_excel(uploaded_file, header=list(HEADER_ROWS))
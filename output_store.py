@@ -0,0 +1,217 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from instrumentation import stage
+
+
+# ------------------------------------------------------------
+# 作成済みファイルの保存場所（ディスク）
+# st.session_state にはバイト列ではなくハンドルだけを持たせ、
+# ダウンロード時にここから読み出す。内容のハッシュで保存するため、
+# 同じ内容のファイルは1つだけ保存される。
+# ------------------------------------------------------------
+STORE_DIR = Path(
+    os.environ.get(
+        "IWATO_OUTPUT_STORE_DIR",
+        Path(tempfile.gettempdir()) / "iwato_output_store",
+    )
+)
+TTL_SECONDS = int(float(os.environ.get("IWATO_OUTPUT_TTL_HOURS", "12")) * 3600)
+MAX_TOTAL_MB = int(os.environ.get("IWATO_OUTPUT_MAX_TOTAL_MB", "2048"))
+# 保存のたびにはディレクトリ全体を見ない。容量の合計は保存・削除のたびに
+# 足し引きし、全体を見直すのは起動時・容量超過時・この間隔ごとだけ
+SCAN_INTERVAL_SECONDS = int(float(os.environ.get("IWATO_OUTPUT_SCAN_MINUTES", "10")) * 60)
+# 容量を超えたら、上限のこの割合まで古いものから削除する（超えるたびに見直さないよう）
+EVICT_TO_RATIO = 0.9
+
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class OutputHandle:
+    """保存済みファイルへの参照（セッションにはこれだけを保持する）。"""
+
+    digest: str
+    file_name: str
+    size: int
+
+
+class OutputStore:
+    def __init__(
+        self,
+        root: str | Path = STORE_DIR,
+        ttl_seconds: int = TTL_SECONDS,
+        max_total_bytes: int = MAX_TOTAL_MB * 1024 * 1024,
+    ):
+        self.root = Path(root)
+        self.ttl_seconds = ttl_seconds
+        self.max_total_bytes = max_total_bytes
+        self._lock = threading.Lock()
+
+        # 保存済みのファイル → 大きさ（合計は _total_bytes）
+        self._sizes: dict[Path, int] = {}
+        self._total_bytes = 0
+        self._scanned_at = 0.0
+
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            self._evict_locked()
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    # --------------------------------------------------------
+    # 保存
+    # --------------------------------------------------------
+    def put_bytes(self, data: bytes, file_name: str) -> OutputHandle:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+
+        with self._lock:
+            if path.exists():
+                os.utime(path)
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+
+            self._added_locked(path, len(data))
+
+        return OutputHandle(digest=digest, file_name=file_name, size=len(data))
+
+    def put_file(self, src: str | Path, file_name: Optional[str] = None) -> OutputHandle:
+        """ファイルをストアへ移動する（内容をメモリへ読み込まない）。"""
+        src = Path(src)
+
+        sha = hashlib.sha256()
+        with src.open("rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                sha.update(chunk)
+
+        digest = sha.hexdigest()
+        path = self._path(digest)
+        size = src.stat().st_size
+
+        with self._lock:
+            if path.exists():
+                os.utime(path)
+                src.unlink()
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(".tmp")
+                shutil.move(str(src), tmp)
+                os.replace(tmp, path)
+
+            self._added_locked(path, size)
+
+        return OutputHandle(digest=digest, file_name=file_name or src.name, size=size)
+
+    # --------------------------------------------------------
+    # 読み出し
+    # --------------------------------------------------------
+    def exists(self, handle: OutputHandle) -> bool:
+        return self._path(handle.digest).exists()
+
+    def open(self, handle: OutputHandle):
+        return self._path(handle.digest).open("rb")
+
+    def read_bytes(self, handle: OutputHandle) -> bytes:
+        return self._path(handle.digest).read_bytes()
+
+    # --------------------------------------------------------
+    # 期限切れ・容量超過の削除
+    # --------------------------------------------------------
+    def _added_locked(self, path: Path, size: int) -> None:
+        """保存したファイルを合計に足し、必要なときだけ全体を見直す。"""
+        if path not in self._sizes:
+            self._sizes[path] = size
+            self._total_bytes += size
+
+        if (
+            self._total_bytes > self.max_total_bytes
+            or time.time() - self._scanned_at > SCAN_INTERVAL_SECONDS
+        ):
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        """ディレクトリ全体を見直し、期限切れと容量超過のファイルを削除する。
+
+        ほかのプロセスが同じ場所へ保存・削除していても、ここで合計が正しくなる。
+        """
+        now = time.time()
+        entries = []
+
+        for path in self.root.glob("*/*"):
+            if path.suffix == ".tmp":
+                continue
+
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+
+            if now - stat.st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        removed = 0
+
+        # 古いものから順に削除
+        if total > self.max_total_bytes:
+            for _, size, path in entries:
+                if total <= self.max_total_bytes * EVICT_TO_RATIO:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+
+        self._sizes = {path: size for _, size, path in entries[removed:]}
+        self._total_bytes = total
+        self._scanned_at = now
+
+    def evict(self) -> None:
+        with self._lock:
+            self._evict_locked()
+
+
+# ------------------------------------------------------------
+# プロセス内で1つだけ作成する（Streamlit の全セッションで共有）
+# ------------------------------------------------------------
+_STORE: Optional[OutputStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_output_store() -> OutputStore:
+    global _STORE
+
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = OutputStore()
+        return _STORE
+
+
+def store_generated(fn: Callable, *args, **kwargs):
+    """fn が返す (バイト列, ファイル名, ...) を保存し、先頭2つをハンドルへ置き換える。"""
+    data, file_name, *rest = fn(*args, **kwargs)
+
+    with stage("output_store.put"):
+        handle = get_output_store().put_bytes(data, file_name)
+
+    if rest:
+        return (handle, *rest)
+
+    return handle
@@ -0,0 +1,189 @@
+import streamlit as st
+
+from kenshu_history import get_kenshu_history
+
+
+st.set_page_config(
+    page_title="週別集計",
+    page_icon="📊",
+    layout="wide",
+)
+
+
+# ------------------------------------------------------------
+# 元の発注・検収サポートシステムへ戻る
+# ------------------------------------------------------------
+with st.sidebar:
+    if st.button(
+        "🏠 発注・検収サポートシステムへ戻る",
+        key="back_to_app3",
+        use_container_width=True,
+    ):
+        st.switch_page("app3.py")
+
+
+# ------------------------------------------------------------
+# ゆるかわデザイン
+# ------------------------------------------------------------
+st.markdown(
+    """
+    <style>
+    .stApp {
+        background:
+            linear-gradient(90deg, rgba(255,170,130,0.035) 1px, transparent 1px),
+            linear-gradient(180deg, rgba(255,170,130,0.035) 1px, transparent 1px),
+            linear-gradient(180deg, #fffaf7 0%, #fff7fb 52%, #f7fbff 100%);
+        background-size: 28px 28px, 28px 28px, auto;
+    }
+
+    .block-container {
+        max-width: 1180px;
+        padding-top: 2rem;
+        padding-bottom: 3rem;
+    }
+
+    h1 {
+        display: inline-block;
+        color: #ff7f50 !important;
+        background: linear-gradient(180deg, #fff5ed 0%, #ffede2 100%);
+        border: 2px solid #ffa56e;
+        border-radius: 999px;
+        padding: 0.35rem 1.35rem 0.45rem;
+        font-size: 2.05rem !important;
+        font-weight: 850 !important;
+        box-shadow: 0 8px 20px rgba(255,149,99,0.14);
+    }
+
+    [data-testid="stMetric"] {
+        background: rgba(255,255,255,0.94);
+        border: 1px solid #efdcd2;
+        border-radius: 17px;
+        padding: 0.75rem 1rem;
+        box-shadow: 0 6px 18px rgba(95,75,85,0.06);
+    }
+
+    [data-testid="stAlert"] {
+        border-radius: 15px;
+    }
+    </style>
+    """,
+    unsafe_allow_html=True,
+)
+
+
+# ------------------------------------------------------------
+# 画面
+# 履歴の週ごとの集計表（vendor_week_totals）だけを読む。
+# 検収簿の行は読まないので、履歴が増えても表示の時間は変わらない。
+# ------------------------------------------------------------
+QUANTITY_CHOICES = ["特養入所者", "特養職員", "ユーハウス", "3施設の合計"]
+
+st.title("週別集計")
+st.caption("🟠 仕入先ごと　🟢 週ごと（月曜始まり）　🔵 施設ごとの数量の合計")
+
+history = get_kenshu_history()
+
+if history is None:
+    st.info(
+        "検収簿の履歴が設定されていません。"
+        "環境変数 IWATO_HISTORY_DB に履歴の保存先を指定すると、"
+        "① 検収簿整形のたびに集計されます。"
+    )
+    st.stop()
+
+totals = history.weekly_totals()
+
+if totals.empty:
+    st.info("まだ履歴がありません。① 検収簿整形を行うと、ここに集計されます。")
+    st.stop()
+
+totals["3施設の合計"] = totals[["特養入所者", "特養職員", "ユーハウス"]].sum(axis=1)
+
+weeks = sorted(totals["週"].unique())
+vendors = sorted(totals["仕入先"].unique())
+
+col_qty, col_weeks = st.columns([1, 2])
+
+with col_qty:
+    quantity = st.radio(
+        "集計する数量",
+        QUANTITY_CHOICES,
+        key="weekly_quantity",
+    )
+
+with col_weeks:
+    if len(weeks) > 1:
+        first_week, last_week = st.select_slider(
+            "期間（週の月曜日）",
+            options=weeks,
+            value=(weeks[max(0, len(weeks) - 12)], weeks[-1]),
+            key="weekly_range",
+        )
+    else:
+        first_week = last_week = weeks[0]
+        st.caption(f"期間：{first_week} の週")
+
+selected_vendors = st.multiselect(
+    "仕入先（空欄ならすべて）",
+    vendors,
+    key="weekly_vendors",
+)
+
+view = totals[(totals["週"] >= first_week) & (totals["週"] <= last_week)]
+
+if selected_vendors:
+    view = view[view["仕入先"].isin(selected_vendors)]
+
+if view.empty:
+    st.info("選んだ期間・仕入先の履歴はありません。")
+    st.stop()
+
+table = view.pivot_table(
+    index="仕入先",
+    columns="週",
+    values=quantity,
+    aggfunc="sum",
+    fill_value=0,
+)
+table["期間合計"] = table.sum(axis=1)
+table = table.sort_values("期間合計", ascending=False)
+
+m1, m2, m3 = st.columns(3)
+m1.metric("週数", f"{view['週'].nunique()} 週")
+m2.metric("仕入先", f"{view['仕入先'].nunique()} 社")
+m3.metric(f"{quantity}の合計", f"{view[quantity].sum():,.1f}")
+
+st.subheader("📈 週ごとの推移")
+st.bar_chart(
+    view.pivot_table(
+        index="週",
+        columns="仕入先",
+        values=quantity,
+        aggfunc="sum",
+        fill_value=0,
+    ),
+    height=360,
+)
+
+st.subheader("📋 仕入先 × 週")
+st.dataframe(
+    table.round(1),
+    use_container_width=True,
+)
+
+st.download_button(
+    "📥 この表を CSV でダウンロード",
+    data=table.round(1).to_csv().encode("utf-8-sig"),
+    file_name=f"週別集計_{quantity}_{first_week}_{last_week}.csv",
+    mime="text/csv",
+    key="download_weekly_csv",
+)
+
+ingests = history.ingests()
+latest = ingests[-1] if ingests else None
+
+if latest is not None:
+    st.caption(
+        f"履歴：{len(ingests)} ファイル"
+        f"（最後の取り込み {latest.ingested_at.replace('T', ' ')}・{latest.source_name}）"
+    )
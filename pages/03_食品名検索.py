@@ -0,0 +1,142 @@
+import streamlit as st
+
+from kenshu_history import SEARCH_LINES_PER_FOOD, SEARCH_MAX_FOODS, get_kenshu_history
+
+
+st.set_page_config(
+    page_title="食品名検索",
+    page_icon="🔍",
+    layout="wide",
+)
+
+
+# ------------------------------------------------------------
+# 元の発注・検収サポートシステムへ戻る
+# ------------------------------------------------------------
+with st.sidebar:
+    if st.button(
+        "🏠 発注・検収サポートシステムへ戻る",
+        key="back_to_app3",
+        use_container_width=True,
+    ):
+        st.switch_page("app3.py")
+
+
+# ------------------------------------------------------------
+# ゆるかわデザイン
+# ------------------------------------------------------------
+st.markdown(
+    """
+    <style>
+    .stApp {
+        background:
+            linear-gradient(90deg, rgba(255,170,130,0.035) 1px, transparent 1px),
+            linear-gradient(180deg, rgba(255,170,130,0.035) 1px, transparent 1px),
+            linear-gradient(180deg, #fffaf7 0%, #fff7fb 52%, #f7fbff 100%);
+        background-size: 28px 28px, 28px 28px, auto;
+    }
+
+    .block-container {
+        max-width: 1180px;
+        padding-top: 2rem;
+        padding-bottom: 3rem;
+    }
+
+    h1 {
+        display: inline-block;
+        color: #ff7f50 !important;
+        background: linear-gradient(180deg, #fff5ed 0%, #ffede2 100%);
+        border: 2px solid #ffa56e;
+        border-radius: 999px;
+        padding: 0.35rem 1.35rem 0.45rem;
+        font-size: 2.05rem !important;
+        font-weight: 850 !important;
+        box-shadow: 0 8px 20px rgba(255,149,99,0.14);
+    }
+
+    [data-testid="stTextInput"] input {
+        font-size: 1.15rem;
+    }
+
+    [data-testid="stMetric"] {
+        background: rgba(255,255,255,0.94);
+        border: 1px solid #efdcd2;
+        border-radius: 17px;
+        padding: 0.75rem 1rem;
+        box-shadow: 0 6px 18px rgba(95,75,85,0.06);
+    }
+
+    [data-testid="stAlert"] {
+        border-radius: 15px;
+    }
+    </style>
+    """,
+    unsafe_allow_html=True,
+)
+
+
+# ------------------------------------------------------------
+# 画面
+# 「○○を最後に頼んだのはいつ・どこから・いくつ？」に答える。
+# 食品名の n-gram 索引で食品名を絞り、その食品名の行だけを読む。
+# ------------------------------------------------------------
+QUANTITY_COLUMNS = ["特養入所者", "特養職員", "ユーハウス"]
+
+st.title("食品名検索")
+st.caption("🟠 食品名の一部で検索　🟢 最後に注文した日・仕入先　🔵 数量")
+
+history = get_kenshu_history()
+
+if history is None:
+    st.info(
+        "検収簿の履歴が設定されていません。"
+        "環境変数 IWATO_HISTORY_DB に履歴の保存先を指定すると、"
+        "① 検収簿整形のたびに検索できる食品名が増えます。"
+    )
+    st.stop()
+
+query = st.text_input(
+    "食品名（一部でも可。空白で区切ると、すべてを含む食品名を探します）",
+    key="food_search_query",
+    placeholder="例：しいたけ　国産",
+)
+
+if not query.strip():
+    st.stop()
+
+lines = history.search(query)
+
+if lines.empty:
+    st.info(f"「{query}」を含む食品名の注文は、履歴に見つかりませんでした。")
+    st.stop()
+
+foods = lines["食品名"].nunique()
+
+if foods >= SEARCH_MAX_FOODS:
+    st.warning(
+        f"該当する食品名が多いため、{SEARCH_MAX_FOODS} 件までを表示しています。"
+        "もう少し詳しく入力してください。"
+    )
+
+# 食品名ごとに、いちばん新しい行
+last_orders = (
+    lines.sort_values("usage_date", ascending=False, na_position="last")
+    .drop_duplicates("食品名")
+    .sort_values("食品名")
+)
+
+st.subheader(f"🕒 最後の注文（{foods} 品目）")
+st.dataframe(
+    last_orders[["食品名", "usage_date", "使用日", "仕入先", *QUANTITY_COLUMNS, "単位"]]
+    .rename(columns={"usage_date": "日付"}),
+    hide_index=True,
+    use_container_width=True,
+)
+
+with st.expander(f"📋 これまでの注文（食品名ごとに新しい順に {SEARCH_LINES_PER_FOOD} 行まで）"):
+    st.dataframe(
+        lines[["usage_date", "使用日", "朝昼夕", "仕入先", "食品名", *QUANTITY_COLUMNS, "単位"]]
+        .rename(columns={"usage_date": "日付"}),
+        hide_index=True,
+        use_container_width=True,
+    )
@@ -0,0 +1,299 @@
+import tempfile
+from functools import partial
+from pathlib import Path
+
+import streamlit as st
+
+from header_probe import PROCESSED_KENSHU
+from instrumentation import stage
+from kenshu_frame import enable_copy_on_write
+from output_store import get_output_store
+from supplier_templates import (
+    FACILITY_MODES,
+    LAYOUT_SHEETS,
+    LAYOUT_SINGLE,
+    fill_template_orders_both_facilities,
+    list_definitions,
+    load_definition,
+)
+from ui_jobs import probe_upload, run_generation, upload_matches
+
+
+st.set_page_config(
+    page_title="テンプレート発注書作成",
+    page_icon="🧾",
+    layout="wide",
+)
+
+# この画面から開いたときも、作成処理は copy-on-write で動かす
+enable_copy_on_write()
+
+
+# ------------------------------------------------------------
+# 元の発注・検収サポートシステムへ戻る
+# ------------------------------------------------------------
+with st.sidebar:
+    if st.button(
+        "🏠 発注・検収サポートシステムへ戻る",
+        key="back_to_app3",
+        use_container_width=True,
+    ):
+        st.switch_page("app3.py")
+
+
+# ------------------------------------------------------------
+# ゆるかわデザイン
+# ------------------------------------------------------------
+st.markdown(
+    """
+    <style>
+    .stApp {
+        background:
+            linear-gradient(90deg, rgba(255,170,130,0.035) 1px, transparent 1px),
+            linear-gradient(180deg, rgba(255,170,130,0.035) 1px, transparent 1px),
+            linear-gradient(180deg, #fffaf7 0%, #fff7fb 52%, #f7fbff 100%);
+        background-size: 28px 28px, 28px 28px, auto;
+    }
+
+    .block-container {
+        max-width: 980px;
+        padding-top: 2rem;
+        padding-bottom: 3rem;
+    }
+
+
+    h1 {
+        display: inline-block;
+        color: #ff7f50 !important;
+        background: linear-gradient(180deg, #fff5ed 0%, #ffede2 100%);
+        border: 2px solid #ffa56e;
+        border-radius: 999px;
+        padding: 0.35rem 1.35rem 0.45rem;
+        font-size: 2.05rem !important;
+        font-weight: 850 !important;
+        box-shadow: 0 8px 20px rgba(255,149,99,0.14);
+    }
+
+    h2 {
+        color: #493f49 !important;
+        background: rgba(255,255,255,0.94);
+        border: 1px solid #efdcd2;
+        border-left: 7px solid #ff9563;
+        border-radius: 17px;
+        padding: 0.75rem 1rem;
+        box-shadow: 0 7px 20px rgba(103,76,89,0.07);
+    }
+
+    [data-testid="stFileUploader"] {
+        background: rgba(255,255,255,0.94);
+        border: 1.5px dashed #e9ae91;
+        border-radius: 17px;
+        padding: 0.75rem;
+        box-shadow: 0 6px 18px rgba(95,75,85,0.06);
+    }
+
+    .stButton > button,
+    [data-testid="stDownloadButton"] > button {
+        width: 100%;
+        color: white !important;
+        background: linear-gradient(90deg, #ff9b68 0%, #f59ab6 52%, #bca9ef 100%);
+        border: none;
+        border-radius: 999px;
+        font-weight: 820;
+        min-height: 2.8rem;
+        box-shadow: 0 9px 19px rgba(225,132,145,0.22);
+    }
+
+    [data-testid="stAlert"] {
+        border-radius: 15px;
+    }
+    </style>
+    """,
+    unsafe_allow_html=True,
+)
+
+
+# ------------------------------------------------------------
+# アップロードされたファイルの確認
+# ------------------------------------------------------------
+def has_sheets(uploaded_file, sheets, label):
+    """定義にあるシートが、アップロードされたブックにあるか。"""
+    if uploaded_file is None:
+        return False
+
+    missing = [
+        name for name in sheets
+        if name not in probe_upload(uploaded_file).sheet_names
+    ]
+
+    if missing:
+        st.error(f"⚠ {label}に『" + "』『".join(missing) + "』シートが見つかりません。")
+        return False
+
+    return True
+
+
+# ------------------------------------------------------------
+# 作成（一時フォルダに両施設分を作り、作成済みファイルとして保存）
+# ------------------------------------------------------------
+def build_template_order_files(definition_key, kenshu_bytes, template_bytes, lookup_bytes, layout):
+    definition = load_definition(definition_key)
+
+    with tempfile.TemporaryDirectory() as td:
+        td = Path(td)
+
+        k_path = td / "kenshu.xlsx"
+        t_path = td / "template.xlsm"
+
+        k_path.write_bytes(kenshu_bytes)
+        t_path.write_bytes(template_bytes)
+
+        lookup_paths = {}
+
+        for name, data in lookup_bytes.items():
+            lookup_paths[name] = td / f"{name}.xlsm"
+            lookup_paths[name].write_bytes(data)
+
+        paths = fill_template_orders_both_facilities(
+            definition,
+            kenshu_xlsx_path=k_path,
+            template_xlsm_path=t_path,
+            out_dir=td / "out",
+            lookup_paths=lookup_paths,
+            layout=layout,
+        )
+
+        store = get_output_store()
+
+        with stage("output_store.put"):
+            return tuple(store.put_file(path) for path in paths)
+
+
+# ------------------------------------------------------------
+# 画面
+# 仕入先ごとの違いは suppliers/*.json の定義にあり、この画面は
+# 定義を選んで、定義が求めるファイルを受け取るだけ。
+# ------------------------------------------------------------
+XLSM_MIME = "application/vnd.ms-excel.sheet.macroEnabled.12"
+
+st.title("テンプレート発注書作成")
+st.caption("🟠 仕入先の定義を選択　🟢 テンプレートへ書き込み　🔵 両施設の発注書を作成")
+
+try:
+    definitions = {d.key: d for d in list_definitions()}
+except ValueError as e:
+    st.error(f"⚠ {e}")
+    st.stop()
+
+if not definitions:
+    st.info("仕入先の定義がありません。suppliers フォルダに定義ファイル（.json）を置いてください。")
+    st.stop()
+
+definition_key = st.selectbox(
+    "仕入先",
+    list(definitions),
+    format_func=lambda key: definitions[key].name,
+    key="template_order_definition",
+)
+definition = definitions[definition_key]
+
+st.header(f"🧾 {definition.name} 発注書を作成")
+
+layout = st.radio(
+    "出力形式",
+    [LAYOUT_SHEETS, LAYOUT_SINGLE],
+    format_func=lambda value: {
+        LAYOUT_SHEETS: "ページごとのシート",
+        LAYOUT_SINGLE: "1シート（ページごとに改ページ）",
+    }[value],
+    horizontal=True,
+    key="template_order_layout",
+)
+
+kenshu_file = st.file_uploader(
+    "検収簿_加工済（①で作成したExcel）",
+    type=["xlsx"],
+    key=f"template_order_kenshu_{definition_key}",
+)
+
+template_file = st.file_uploader(
+    f"{definition.name} 発注書テンプレート",
+    type=["xlsm"],
+    key=f"template_order_template_{definition_key}",
+)
+
+lookup_files = {
+    spec.name: st.file_uploader(
+        spec.label,
+        type=["xlsm"],
+        key=f"template_order_lookup_{definition_key}_{spec.name}",
+    )
+    for spec in definition.lookups
+}
+
+kenshu_ok = upload_matches(kenshu_file, PROCESSED_KENSHU)
+template_ok = has_sheets(
+    template_file,
+    [f.sheet for f in definition.facilities],
+    "テンプレート",
+)
+lookups_ok = all(
+    has_sheets(lookup_files[spec.name], [spec.sheet], spec.label)
+    for spec in definition.lookups
+)
+
+output_key = f"template_order_output_{definition_key}"
+
+if st.button(f"🧾 {definition.name} 発注書を作成する"):
+    if not (kenshu_file and template_file and all(lookup_files.values())):
+        st.warning("⚠ 必要なファイルをすべて選択してください。")
+
+    elif not (kenshu_ok and template_ok and lookups_ok):
+        st.warning("⚠ 種類の違うファイルがあります。上の案内に沿って選び直してください。")
+
+    else:
+        try:
+            with st.spinner(f"{definition.name} 発注書を作成しています…"):
+                st.session_state[output_key] = run_generation(
+                    f"テンプレート発注書（{definition.name}）",
+                    build_template_order_files,
+                    definition_key,
+                    kenshu_file.getvalue(),
+                    template_file.getvalue(),
+                    {name: f.getvalue() for name, f in lookup_files.items()},
+                    layout,
+                    uploads=[kenshu_file, template_file, *lookup_files.values()],
+                    options={
+                        "definition": definition.digest,
+                        "layout": layout,
+                    },
+                )
+
+            st.success(f"🌸 {definition.name} 発注書を作成しました！")
+
+        except Exception as error:
+            st.session_state.pop(output_key, None)
+            st.error("発注書の作成中にエラーが発生しました。")
+            st.exception(error)
+
+handles = st.session_state.get(output_key)
+store = get_output_store()
+
+if handles is not None and not all(store.exists(h) for h in handles):
+    st.session_state.pop(output_key, None)
+    st.info("作成済みファイルの保存期間が過ぎました。もう一度作成してください。")
+
+elif handles is not None:
+    st.markdown("### 📥 作成済みファイル")
+
+    for column, mode, handle in zip(st.columns(len(handles)), FACILITY_MODES, handles):
+        facility = definition.facility(mode)
+
+        with column:
+            st.download_button(
+                f"📥 {facility.label}：{definition.name} 発注書",
+                data=partial(store.read_bytes, handle),
+                file_name=handle.file_name,
+                mime=XLSM_MIME,
+                key=f"download_{output_key}_{facility.mode}",
+            )
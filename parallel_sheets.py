@@ -0,0 +1,185 @@
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+from instrumentation import stage, timed_exit
+from kenshu_frame import enable_copy_on_write
+from xlsx_output import excel_writer
+from xlsx_parts import splice_sheets
+
+
+# ------------------------------------------------------------
+# 仕入先ごとのシートを複数のプロセスで作成する
+# ②仕訳表・③注文書は仕入先ごとにシートを書き、書式を整える処理が
+# 大半を占める（openpyxl はセルごとに Python のオブジェクトを作るため
+# GIL を手放さない）。仕入先をプロセスごとに分けて別々のブックに
+# 書き、最後に1つのブックへシートの XML を差し込む。
+# 元のブックには、子プロセスを待つ間に1シート目だけを実際に書き、
+# 残りは印刷設定だけを持つ仮のシートにしておく（シート名・印刷範囲は
+# workbook.xml 側に残るため）。書式番号の対応が取れないときは、
+# すべてのシートを順に作り直す。
+# ------------------------------------------------------------
+SHEET_WORKERS = int(os.environ.get("IWATO_SHEET_WORKERS", "0")) or (os.cpu_count() or 1)
+
+# 子プロセスの起動とデータの受け渡しの分、小さいファイルは順に作るほうが早い
+PARALLEL_MIN_ROWS = int(os.environ.get("IWATO_PARALLEL_MIN_ROWS", "5000"))
+
+# (シート名, 行, 追加の引数...)。write_sheet(writer, シート名, 行, 追加の引数...) で書く
+SheetSpec = tuple
+
+
+def _write_sheets(
+    write_sheet: Callable,
+    sheets: list[SheetSpec],
+    placeholders: set[str],
+    write_placeholder: Optional[Callable],
+) -> bytes:
+    buffer = io.BytesIO()
+
+    with timed_exit("wb.save", excel_writer(buffer)) as writer:
+        for sheet_name, *args in sheets:
+            if sheet_name in placeholders:
+                write_placeholder(writer, sheet_name, *args)
+            else:
+                write_sheet(writer, sheet_name, *args)
+
+    return buffer.getvalue()
+
+
+def _print_settings(ws) -> tuple:
+    return ws.print_area or None, ws.print_title_rows, ws.print_title_cols
+
+
+def _render_chunk(write_sheet: Callable, sheets: list[SheetSpec]) -> tuple[bytes, dict]:
+    """子プロセスで一部のシートを1つのブックに書き、(ブック, 印刷設定) を返す。"""
+    buffer = io.BytesIO()
+    print_settings = {}
+
+    with excel_writer(buffer) as writer:
+        for sheet_name, *args in sheets:
+            write_sheet(writer, sheet_name, *args)
+
+            print_settings[sheet_name] = _print_settings(writer.book[sheet_name])
+
+    return buffer.getvalue(), print_settings
+
+
+def _split(sheets: list[SheetSpec], count: int) -> list[list[SheetSpec]]:
+    """行数がなるべく均等になるよう、シートを count 個に分ける。"""
+    chunks: list[list[SheetSpec]] = [[] for _ in range(count)]
+    rows = [0] * count
+
+    for spec in sorted(sheets, key=lambda spec: len(spec[1]), reverse=True):
+        smallest = rows.index(min(rows))
+        chunks[smallest].append(spec)
+        rows[smallest] += len(spec[1])
+
+    return [chunk for chunk in chunks if chunk]
+
+
+# ------------------------------------------------------------
+# プロセスプール（サーバー全体で共有）
+# 子プロセスは pandas・openpyxl の読み込みに時間がかかるため、
+# 依頼ごとには作らず使い回す。
+# ------------------------------------------------------------
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_sheet_pool() -> ProcessPoolExecutor:
+    global _POOL
+
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(
+                max_workers=SHEET_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                # spawn の子プロセスはアプリの設定を引き継がない
+                initializer=enable_copy_on_write,
+            )
+        return _POOL
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    # 子プロセスが落ちたプールは使えないため、次の依頼で作り直す
+    global _POOL
+
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL = None
+
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_sheets(
+    write_sheet: Callable,
+    sheets: list[SheetSpec],
+    max_workers: Optional[int] = None,
+    placeholders: set[str] = frozenset(),
+    write_placeholder: Optional[Callable] = None,
+) -> bytes:
+    """sheets を1つのブックに書き、xlsx のバイト列を返す。
+
+    シートが複数あり、行数が PARALLEL_MIN_ROWS 以上のときは、2シート目以降を
+    子プロセスで作成して差し込む。write_sheet は子プロセスから呼ぶため、
+    モジュールの直下で定義した関数にする。
+    placeholders のシートは作成せず、write_placeholder(writer, シート名, ...) で
+    仮のシートだけを書く（呼び出し側が後で別のブックから差し込む）。
+    """
+    workers = max_workers or SHEET_WORKERS
+    rendered = [spec for spec in sheets if spec[0] not in placeholders]
+    total_rows = sum(len(spec[1]) for spec in rendered)
+
+    if workers < 2 or len(rendered) < 2 or total_rows < PARALLEL_MIN_ROWS:
+        return _write_sheets(write_sheet, sheets, placeholders, write_placeholder)
+
+    first, rest = rendered[0], rendered[1:]
+    pool = get_sheet_pool()
+    buffer = io.BytesIO()
+
+    try:
+        with stage("sheets.submit"):
+            futures = [
+                pool.submit(_render_chunk, write_sheet, chunk)
+                for chunk in _split(rest, min(workers, len(rest)))
+            ]
+
+        with timed_exit("wb.save", excel_writer(buffer)) as writer:
+            # 子プロセスが書いている間に、1シート目と仮のシートを書く
+            for sheet_name, *args in sheets:
+                if sheet_name == first[0]:
+                    write_sheet(writer, sheet_name, *args)
+                elif sheet_name in placeholders:
+                    write_placeholder(writer, sheet_name, *args)
+                else:
+                    writer.book.create_sheet(sheet_name)
+
+            with stage("sheets.wait"):
+                chunks = [future.result() for future in futures]
+
+            # 仮のシートには、ブック側に残る設定（印刷範囲・見出し行）だけ写す
+            for _data, settings in chunks:
+                for sheet_name, (area, title_rows, title_cols) in settings.items():
+                    ws = writer.book[sheet_name]
+                    ws.print_area = area
+                    ws.print_title_rows = title_rows
+                    ws.print_title_cols = title_cols
+
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        return _write_sheets(write_sheet, sheets, placeholders, write_placeholder)
+
+    with stage("sheets.splice"):
+        spliced = splice_sheets(
+            buffer.getvalue(),
+            [(data, set(settings)) for data, settings in chunks],
+        )
+
+    if spliced is None:
+        return _write_sheets(write_sheet, sheets, placeholders, write_placeholder)
+
+    return spliced
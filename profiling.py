@@ -0,0 +1,121 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------------------------
+# cProfile による詳細計測（必要なときだけ）
+# IWATO_PROFILE=1 で全ての作成処理を、または診断パネルの切り替えで
+# そのセッションの作成処理を cProfile で包み、.pstats を保存する。
+# ファイル名には入力ファイルのハッシュを入れるので、遅かった
+# アップロードと結果を突き合わせられる。
+# ------------------------------------------------------------
+PROFILE_ENABLED = os.environ.get("IWATO_PROFILE", "0") == "1"
+PROFILE_DIR = Path(
+    os.environ.get(
+        "IWATO_PROFILE_DIR",
+        Path(tempfile.gettempdir()) / "iwato_profiles",
+    )
+)
+MAX_PROFILES = int(os.environ.get("IWATO_PROFILE_KEEP", "50"))
+TOP_N = 30
+
+
+@dataclass(frozen=True)
+class ProfileRecord:
+    path: Path
+    name: str
+    input_hash: str
+    created_at: str
+
+    @property
+    def file_name(self) -> str:
+        return self.path.name
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r'[\\/:*?"<>|\s]+', "_", name).strip("_") or "generation"
+
+
+def _prune() -> None:
+    """古い .pstats を MAX_PROFILES 件まで減らす。"""
+    files = sorted(PROFILE_DIR.glob("*.pstats"), key=lambda p: p.stat().st_mtime)
+
+    for path in files[: max(len(files) - MAX_PROFILES, 0)]:
+        path.unlink(missing_ok=True)
+
+
+def profiled_call(name: str, input_hash: str, fn: Callable, *args, **kwargs):
+    """fn を cProfile で包んで実行し、結果を .pstats として保存する。"""
+    profiler = cProfile.Profile()
+
+    try:
+        profiler.enable()
+    except ValueError:
+        # ほかの計測ツールが動いている（Python 3.12 以降は同時に1つまで）
+        logger.warning("profiler busy, running %s without profiling", name)
+        return fn(*args, **kwargs)
+
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profiler.disable()
+
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = PROFILE_DIR / f"{stamp}_{_safe_name(name)}_{input_hash[:12]}.pstats"
+
+        try:
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(path)
+            _prune()
+        except OSError:
+            logger.exception("failed to save profile: %s", path)
+
+
+def recent_profiles(limit: int = 20) -> list[ProfileRecord]:
+    """保存済みの .pstats（新しい順）。"""
+    if not PROFILE_DIR.exists():
+        return []
+
+    files = sorted(
+        PROFILE_DIR.glob("*.pstats"),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+
+    records = []
+    for path in files[:limit]:
+        stamp_date, stamp_time, *rest = path.stem.split("_")
+        input_hash = rest.pop() if rest else ""
+
+        records.append(
+            ProfileRecord(
+                path=path,
+                name="_".join(rest),
+                input_hash=input_hash,
+                created_at=datetime.strptime(
+                    f"{stamp_date}{stamp_time}", "%Y%m%d%H%M%S"
+                ).isoformat(timespec="seconds"),
+            )
+        )
+
+    return records
+
+
+def profile_summary(path: str | Path, top_n: int = TOP_N) -> str:
+    """累積時間（cumulative）の上位 top_n 件をテキストで返す。"""
+    stream = io.StringIO()
+    stats = pstats.Stats(str(path), stream=stream)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(top_n)
+    return stream.getvalue()
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import fields, is_dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from instrumentation import run_traced, run_traced_with_memory
+from job_pool import submit_job, wait_for_job
+from output_store import OutputHandle, get_output_store
+from profiling import PROFILE_ENABLED, profiled_call
+from single_flight import get_single_flight
+
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------------------------
+# 作成結果キャッシュ
+# 同じファイル・同じ設定での再作成は、保存済みの結果をすぐに返す。
+# キー = 入力ファイルのハッシュ + 設定（order_type など）+ コードのバージョン
+# 値は出力ストアのハンドルなので、キャッシュ自体は小さい。
+# ------------------------------------------------------------
+MAX_ENTRIES = int(os.environ.get("IWATO_RESULT_CACHE_ENTRIES", "512"))
+
+APP_DIR = Path(__file__).resolve().parent
+
+
+def _compute_code_version() -> str:
+    """アプリのソースコードと仕入先定義から版数を作る（変わればキャッシュは無効）。"""
+    sha = hashlib.sha256()
+
+    sources = [
+        *APP_DIR.glob("*.py"),
+        *APP_DIR.glob("pages/*.py"),
+        *APP_DIR.glob("suppliers/*.json"),
+    ]
+
+    for path in sorted(sources):
+        sha.update(path.name.encode("utf-8"))
+        sha.update(path.read_bytes())
+
+    return sha.hexdigest()[:16]
+
+
+CODE_VERSION = _compute_code_version()
+
+
+def hash_input(value) -> str:
+    """アップロードファイル・バイト列・パスの内容ハッシュを返す。"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(value).hexdigest()
+
+    if isinstance(value, (str, Path)):
+        sha = hashlib.sha256()
+        with Path(value).open("rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    # Streamlit の UploadedFile（BytesIO）はコピーせずに読む
+    with value.getbuffer() as view:
+        return hashlib.sha256(view).hexdigest()
+
+
+def make_cache_key(name: str, inputs: Iterable = (), options: Optional[dict] = None) -> str:
+    payload = {
+        "name": name,
+        "inputs": [hash_input(v) for v in inputs],
+        "options": options or {},
+        "code_version": CODE_VERSION,
+    }
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _handles_in(value):
+    if isinstance(value, OutputHandle):
+        yield value
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _handles_in(item)
+    elif is_dataclass(value) and not isinstance(value, type):
+        for f in fields(value):
+            yield from _handles_in(getattr(value, f.name))
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, object]" = OrderedDict()
+        self._stats: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, name: str, hit: bool) -> None:
+        stat = self._stats.setdefault(name, {"hits": 0, "misses": 0})
+        stat["hits" if hit else "misses"] += 1
+
+    def get(self, key: str, name: str = ""):
+        with self._lock:
+            value = self._entries.get(key)
+
+            # 出力ストアから期限切れで消えていたら無効
+            if value is not None:
+                store = get_output_store()
+                if all(store.exists(h) for h in _handles_in(value)):
+                    self._entries.move_to_end(key)
+                else:
+                    del self._entries[key]
+                    value = None
+
+            self._record(name, value is not None)
+
+        if value is not None:
+            logger.info("result cache hit: %s", name)
+
+        return value
+
+    def put(self, key: str, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, dict]:
+        with self._lock:
+            result = {}
+            for name, stat in self._stats.items():
+                total = stat["hits"] + stat["misses"]
+                result[name] = {
+                    **stat,
+                    "hit_rate": round(stat["hits"] / total, 3) if total else 0.0,
+                }
+            return result
+
+
+# ------------------------------------------------------------
+# プロセス内で1つだけ作成する（Streamlit の全セッションで共有）
+# ------------------------------------------------------------
+_CACHE: Optional[ResultCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    global _CACHE
+
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ResultCache()
+        return _CACHE
+
+
+def cached_call(
+    name: str,
+    fn: Callable,
+    *args,
+    inputs: Iterable = (),
+    options: Optional[dict] = None,
+    upload_sizes: Iterable[int] = (),
+    on_wait: Optional[Callable[[int], None]] = None,
+    profile: bool = False,
+    **kwargs,
+):
+    """入力と設定が同じなら保存済みの結果を返す。
+
+    保存済みの結果がなければ共有プールで fn を実行する。同じ依頼が
+    ほかのセッションで実行中なら、新しく実行せずにその結果を待つ。
+    profile=True（または IWATO_PROFILE=1）のときは、キャッシュを使わずに
+    cProfile で包んで実行し直す（このときはメモリのピークも測る）。
+    """
+    cache = get_result_cache()
+    inputs = list(inputs)
+    key = make_cache_key(name, inputs, options)
+
+    if profile or PROFILE_ENABLED:
+        input_hash = hashlib.sha256(
+            "".join(hash_input(v) for v in inputs).encode("ascii")
+        ).hexdigest()
+
+        job = submit_job(
+            name,
+            profiled_call,
+            name,
+            input_hash,
+            run_traced_with_memory,
+            name,
+            fn,
+            *args,
+            upload_sizes=upload_sizes,
+            **kwargs,
+        )
+        result = wait_for_job(job, on_wait)
+        cache.put(key, result)
+        return result
+
+    value = cache.get(key, name)
+    if value is not None:
+        return value
+
+    job, _shared = get_single_flight().submit(
+        key,
+        lambda: submit_job(
+            name,
+            run_traced,
+            name,
+            fn,
+            *args,
+            upload_sizes=upload_sizes,
+            **kwargs,
+        ),
+        on_success=lambda result: cache.put(key, result),
+    )
+
+    return wait_for_job(job, on_wait)
@@ -0,0 +1,76 @@
+import threading
+from typing import Callable, Optional
+
+from job_pool import Job
+
+
+# ------------------------------------------------------------
+# 同じ依頼の同時実行をまとめる（single-flight）
+# ボタンの二度押しや、ほかのセッションが同じファイル・同じ設定で
+# 作成中のときは、新しく openpyxl を動かさずに実行中の結果を待つ。
+# 待ち合わせはプールのジョブ（Future）単位なので、最初に依頼した
+# 画面が再実行で中断されても、処理自体は最後まで続く。
+# ------------------------------------------------------------
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: dict[str, Job] = {}
+        self.shared_count = 0
+
+    def submit(
+        self,
+        key: str,
+        start: Callable[[], Job],
+        on_success: Optional[Callable[[object], None]] = None,
+    ) -> tuple[Job, bool]:
+        """key の処理が実行中ならそのジョブを、なければ start() で開始したジョブを返す。
+
+        戻り値の2つ目は、実行中のジョブを共有した場合に True。
+        """
+        with self._lock:
+            job = self._flights.get(key)
+
+            # 完了直後（キャッシュ保存前）のジョブも共有して取りこぼさない
+            if job is not None:
+                self.shared_count += 1
+                return job, True
+
+            job = start()
+            self._flights[key] = job
+
+        # 結果の保存（キャッシュ）を先に行ってから一覧から外す
+        if on_success is not None:
+            def _store(future):
+                if not future.cancelled() and future.exception() is None:
+                    on_success(future.result())
+
+            job.future.add_done_callback(_store)
+
+        job.future.add_done_callback(lambda _future: self._forget(key, job))
+
+        return job, False
+
+    def _forget(self, key: str, job: Job) -> None:
+        with self._lock:
+            if self._flights.get(key) is job:
+                del self._flights[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+
+# ------------------------------------------------------------
+# プロセス内で1つだけ作成する（Streamlit の全セッションで共有）
+# ------------------------------------------------------------
+_FLIGHTS: Optional[SingleFlight] = None
+_FLIGHTS_LOCK = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    global _FLIGHTS
+
+    with _FLIGHTS_LOCK:
+        if _FLIGHTS is None:
+            _FLIGHTS = SingleFlight()
+        return _FLIGHTS
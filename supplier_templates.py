@@ -0,0 +1,933 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from copy import copy
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import openpyxl
+import pandas as pd
+from openpyxl.formula.translate import Translator
+from openpyxl.utils import get_column_letter, range_boundaries
+from openpyxl.worksheet.pagebreak import Break
+
+from instrumentation import stage, traced
+from kenshu_frame import compact_kenshu_frame, map_values, text_values
+from xlsx_output import save_workbook
+
+
+# ------------------------------------------------------------
+# テンプレート発注書（④ 丸八・⑤ 北部市場 など）の共通エンジン
+# 仕入先ごとの違い（絞り込み・まとめ方・テンプレートのどのセルに
+# 何を書くか・どこでページを分けるか）は suppliers/*.json の定義に書く。
+# 定義とテンプレートのシートから「書き込み計画」（FillPlan）を一度だけ
+# 作って使い回し、ページごとには、消去済みのテンプレートを複製して
+# 変わるセル（明細行・見出しのセル）だけを書く。
+# 新しい仕入先は、定義ファイルを1つ置けば「テンプレート発注書作成」
+# ページから作成できる。
+# ------------------------------------------------------------
+SUPPLIER_DIR = Path(__file__).resolve().parent / "suppliers"
+
+# アプリの外に置いた定義のフォルダ（os.pathsep 区切り）。
+# 同じ名前の定義は suppliers/ のものが優先（④・⑤ の発注書は変わらない）
+EXTRA_SUPPLIER_DIRS = [
+    Path(p)
+    for p in os.environ.get("IWATO_SUPPLIER_DIR", "").split(os.pathsep)
+    if p
+]
+
+PLAN_CACHE_ENTRIES = int(os.environ.get("IWATO_FILL_PLAN_ENTRIES", "32"))
+
+FACILITY_MODES = ("tokuyou", "yuhouse")
+
+# 出力形式
+# sheets: ページごとにテンプレートのシートを複製する
+# single: テンプレートの1ページ分を1シートに縦に積み、改ページで区切る
+LAYOUT_SHEETS = "sheets"
+LAYOUT_SINGLE = "single"
+
+# 値の書き方（定義の "format"）
+FORMATS = ("text", "text_or_empty", "norm", "quantity", "quantity_with_unit")
+
+# 見出しのセル・シート名の {列名|変換} に使える変換
+_PLACEHOLDER = re.compile(r"\{([^{}|]+)(?:\|(\w+))?\}")
+_MMDD = re.compile(r"(\d{1,2})/(\d{1,2})")
+
+
+def _norm(s) -> str:
+    if s is None:
+        return ""
+    return re.sub(r"\s+", " ", str(s).replace("　", " ")).strip()
+
+
+def _parse_mmdd(value):
+    if value is None:
+        return None
+    m = _MMDD.search(str(value))
+    if not m:
+        return None
+    return pd.Timestamp(year=2000, month=int(m.group(1)), day=int(m.group(2)))
+
+
+def _month_day(value) -> str:
+    """'4/18土' -> '4月18日'（月日がなければそのまま）"""
+    if value is None:
+        return ""
+    s = str(value)
+    m = _MMDD.search(s)
+    if not m:
+        return s
+    return f"{int(m.group(1))}月{int(m.group(2))}日"
+
+
+TEXT_FILTERS = {
+    "month_day": _month_day,
+}
+
+
+def _format_qty_with_unit(qty, unit) -> str:
+    if qty is None:
+        return ""
+
+    try:
+        q = float(qty)
+    except Exception:
+        return ""
+
+    if q == 0:
+        return ""
+
+    q_str = str(int(q)) if q.is_integer() else str(q)
+    unit_str = "" if unit is None else str(unit).strip()
+    return f"{q_str}{unit_str}"
+
+
+def sanitize_sheet_title(title: str, existing: set[str]) -> str:
+    t = re.sub(r'[:\\/*?\[\]]', "-", str(title)).strip()
+
+    if t.startswith("'"):
+        t = t[1:]
+    if t.endswith("'"):
+        t = t[:-1]
+    if not t:
+        t = "Sheet"
+
+    t = t[:31]
+
+    base = t
+    i = 2
+    while t in existing:
+        suffix = f"_{i}"
+        t = base[: 31 - len(suffix)] + suffix
+        i += 1
+    return t
+
+
+def _render_text(template: str, values: dict) -> str:
+    def replace(m):
+        value = values.get(m.group(1), "")
+        if m.group(2):
+            value = TEXT_FILTERS[m.group(2)](value)
+        return str(value)
+
+    return _PLACEHOLDER.sub(replace, template)
+
+
+# ------------------------------------------------------------
+# 仕入先定義（suppliers/<key>.json）
+# ------------------------------------------------------------
+@dataclass(frozen=True)
+class FieldSpec:
+    """明細行の1列：column 列目に、検収簿の value 列を format で書く。"""
+
+    column: int
+    value: tuple
+    format: str = "text"
+    unit: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class FacilitySpec:
+    mode: str
+    label: str
+    sheet: str
+    quantities: tuple
+    missing_message: str
+    cells: tuple            # (セル, 文字列) ページごとに書く
+    fields: tuple           # 明細行
+    fixed_fields: tuple     # 固定行
+
+
+@dataclass(frozen=True)
+class LookupSpec:
+    """別ブックの対応表（key_column の値 → value_column の値）。"""
+
+    name: str
+    label: str
+    sheet: str
+    first_row: int
+    key_column: int
+    value_column: int
+
+
+@dataclass(frozen=True)
+class FixedRowsSpec:
+    """テンプレートに品目が並んだ行。key_column に値がある行だけを使う。"""
+
+    first_row: int
+    last_row: int
+    key_column: int
+    key: FieldSpec
+    lookup: Optional[str]
+    clear_columns: tuple
+
+
+@dataclass(frozen=True)
+class SupplierDefinition:
+    key: str
+    digest: str
+    name: str
+    supplier: str
+    out_prefix: str
+    required_columns: tuple
+    required_message: str
+    not_found_message: str
+    no_quantity_message: Optional[str]
+    drop_blank: tuple
+    page_by: tuple
+    page_sort: tuple        # (列名, "mmdd" または "text")
+    keep_empty_pages: bool
+    title: str
+    continued_title: str
+    line_by: tuple
+    drop_zero_lines: bool   # まとめた後に数量が0になった明細も除く
+    lookups: tuple
+    fixed_rows: Optional[FixedRowsSpec]
+    detail_first_row: int
+    detail_rows: int
+    detail_clear_columns: Optional[tuple]   # None なら全列
+    facilities: tuple
+    copy_print_settings: bool
+    template_sheets: str    # "hide" または "remove"
+
+    @property
+    def detail_last_row(self) -> int:
+        return self.detail_first_row + self.detail_rows - 1
+
+    def facility(self, mode: str) -> FacilitySpec:
+        for facility in self.facilities:
+            if facility.mode == mode:
+                return facility
+        raise ValueError("facility_mode must be 'tokuyou' or 'yuhouse'")
+
+    def lookup(self, name: str) -> LookupSpec:
+        for lookup in self.lookups:
+            if lookup.name == name:
+                return lookup
+        raise KeyError(name)
+
+
+def _field(data: dict, where: str) -> FieldSpec:
+    value = data["value"]
+    spec = FieldSpec(
+        column=int(data.get("column", 0)),
+        value=tuple(value) if isinstance(value, list) else (value,),
+        format=data.get("format", "text"),
+        unit=data.get("unit"),
+    )
+
+    if spec.format not in FORMATS:
+        raise ValueError(f"{where} の format「{spec.format}」は使えません（{'、'.join(FORMATS)}）。")
+
+    return spec
+
+
+def _unique_keys(where: str):
+    """同じキーが2回あると json は後の値だけを残すため、読み込み時に止める。"""
+    def hook(pairs):
+        data = {}
+        for name, value in pairs:
+            if name in data:
+                raise ValueError(f"{where} に {name} が2回書かれています。")
+            data[name] = value
+        return data
+
+    return hook
+
+
+def parse_definition(key: str, text: str) -> SupplierDefinition:
+    """定義ファイルの JSON を読み、SupplierDefinition にする。"""
+    where = f"仕入先定義 {key}.json"
+    data = json.loads(text, object_pairs_hook=_unique_keys(where))
+
+    try:
+        pages = data["pages"]
+        detail = data["detail_rows"]
+
+        facilities = tuple(
+            FacilitySpec(
+                mode=mode,
+                label=spec["label"],
+                sheet=spec["sheet"],
+                quantities=tuple(spec["quantities"]),
+                missing_message=spec["missing_message"],
+                cells=tuple(spec.get("cells", {}).items()),
+                fields=tuple(_field(f, where) for f in spec["fields"]),
+                fixed_fields=tuple(_field(f, where) for f in spec.get("fixed_fields", ())),
+            )
+            for mode, spec in data["facilities"].items()
+        )
+
+        fixed = data.get("fixed_rows")
+        fixed_rows = None
+
+        if fixed is not None:
+            fixed_rows = FixedRowsSpec(
+                first_row=int(fixed["first_row"]),
+                last_row=int(fixed["last_row"]),
+                key_column=int(fixed["key_column"]),
+                key=_field(fixed["key"], where),
+                lookup=fixed["key"].get("lookup"),
+                clear_columns=tuple(fixed["clear_columns"]),
+            )
+
+        definition = SupplierDefinition(
+            key=key,
+            digest=hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            name=data["name"],
+            supplier=data["supplier"],
+            out_prefix=data.get("out_prefix", f"{data['name']}発注書"),
+            required_columns=tuple(data["required_columns"]),
+            required_message=data.get(
+                "required_message",
+                "加工済み検収簿に必要な列が見つかりません：{columns}",
+            ),
+            not_found_message=data.get(
+                "not_found_message",
+                f"{data['supplier']}のデータが見つかりません。",
+            ),
+            no_quantity_message=data.get("no_quantity_message"),
+            drop_blank=tuple(data.get("drop_blank", ())),
+            page_by=tuple(pages["by"]),
+            page_sort=tuple(
+                (s["value"], s.get("as", "text"))
+                for s in pages.get("sort", ())
+            ),
+            keep_empty_pages=bool(pages.get("keep_empty", False)),
+            title=pages["title"],
+            continued_title=pages.get("continued_title", pages["title"]),
+            line_by=tuple(data["lines"]["by"]),
+            drop_zero_lines=bool(data["lines"].get("drop_zero", False)),
+            lookups=tuple(
+                LookupSpec(
+                    name=name,
+                    label=spec.get("label", name),
+                    sheet=spec["sheet"],
+                    first_row=int(spec.get("first_row", 2)),
+                    key_column=int(spec["key_column"]),
+                    value_column=int(spec["value_column"]),
+                )
+                for name, spec in data.get("lookups", {}).items()
+            ),
+            fixed_rows=fixed_rows,
+            detail_first_row=int(detail["first_row"]),
+            detail_rows=int(detail["rows"]),
+            detail_clear_columns=(
+                tuple(detail["clear_columns"])
+                if "clear_columns" in detail
+                else None
+            ),
+            facilities=facilities,
+            copy_print_settings=bool(data.get("copy_print_settings", False)),
+            template_sheets=data.get("template_sheets", "remove"),
+        )
+
+    except KeyError as e:
+        raise ValueError(f"{where} に {e.args[0]} がありません。") from None
+
+    # 作成は FACILITY_MODES の施設ごとに行うため、どの施設も1つずつ必要
+    if sorted(f.mode for f in definition.facilities) != sorted(FACILITY_MODES):
+        raise ValueError(f"{where} の facilities には {'・'.join(FACILITY_MODES)} を1つずつ書いてください。")
+
+    if definition.fixed_rows is not None and definition.fixed_rows.lookup is not None:
+        definition.lookup(definition.fixed_rows.lookup)
+
+    return definition
+
+
+def _definition_paths() -> dict:
+    paths = {}
+
+    for folder in [SUPPLIER_DIR, *EXTRA_SUPPLIER_DIRS]:
+        for path in sorted(folder.glob("*.json")):
+            paths.setdefault(path.stem, path)
+
+    return paths
+
+
+def load_definition(key: str) -> SupplierDefinition:
+    path = _definition_paths().get(key)
+
+    if path is None:
+        raise ValueError(f"仕入先定義 {key}.json が見つかりません。")
+
+    return parse_definition(key, path.read_text(encoding="utf-8"))
+
+
+def list_definitions() -> list[SupplierDefinition]:
+    """定義の一覧（名前順）。"""
+    return [
+        parse_definition(key, path.read_text(encoding="utf-8"))
+        for key, path in sorted(_definition_paths().items())
+    ]
+
+
+# ------------------------------------------------------------
+# 書き込み計画（定義・施設・テンプレートの内容ごとにキャッシュ）
+# ------------------------------------------------------------
+@dataclass(frozen=True)
+class FillPlan:
+    sheet: str
+    clear_cells: tuple      # (行, 列) テンプレートで一度だけ消す
+    fixed_rows: dict        # 固定行のキー → 行
+    block_rows: int         # 1ページ分の行数（1シートにまとめるとき）
+
+
+class _LRU:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_PLANS = _LRU(PLAN_CACHE_ENTRIES)
+_LOOKUPS = _LRU(PLAN_CACHE_ENTRIES)
+
+
+def _file_digest(path: Path) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def _print_area_bounds(ws):
+    """印刷範囲の (最小列, 最小行, 最大列, 最大行)。未設定なら None。"""
+    if not ws.print_area:
+        return None
+
+    return range_boundaries(ws.print_area.split(",")[0].split("!")[-1])
+
+
+@traced()
+def compile_plan(definition: SupplierDefinition, facility: FacilitySpec, ws) -> FillPlan:
+    """テンプレートのシートを読み、消すセル・固定行の位置を求める。"""
+    clear = []
+    fixed_rows = {}
+    fixed = definition.fixed_rows
+
+    if fixed is not None:
+        for r in range(fixed.first_row, fixed.last_row + 1):
+            key = ws.cell(r, fixed.key_column).value
+            if key is None or str(key).strip() == "":
+                break
+            fixed_rows[str(key).strip()] = r
+            clear.extend((r, c) for c in fixed.clear_columns)
+
+    columns = definition.detail_clear_columns or range(1, ws.max_column + 1)
+
+    for r in range(definition.detail_first_row, definition.detail_last_row + 1):
+        clear.extend((r, c) for c in columns)
+
+    block_rows = max(ws.max_row, definition.detail_last_row)
+    area = _print_area_bounds(ws)
+
+    if area is not None:
+        block_rows = max(block_rows, area[3])
+
+    return FillPlan(facility.sheet, tuple(clear), fixed_rows, block_rows)
+
+
+def get_fill_plan(definition: SupplierDefinition, facility: FacilitySpec, ws, template_digest: str) -> FillPlan:
+    key = (definition.key, definition.digest, facility.mode, template_digest)
+    plan = _PLANS.get(key)
+
+    if plan is None:
+        plan = compile_plan(definition, facility, ws)
+        _PLANS.put(key, plan)
+
+    return plan
+
+
+@traced()
+def load_lookup(spec: LookupSpec, path: str | Path) -> dict:
+    """対応表を読む（同じファイルなら2回目からはキャッシュ）。"""
+    key = (spec, _file_digest(path))
+    mapping = _LOOKUPS.get(key)
+
+    if mapping is not None:
+        return mapping
+
+    wb = openpyxl.load_workbook(Path(path), data_only=True, keep_vba=True)
+
+    if spec.sheet not in wb.sheetnames:
+        raise KeyError(f"{spec.label}に『{spec.sheet}』シートが見つかりません。")
+
+    ws = wb[spec.sheet]
+    mapping = {}
+
+    for r in range(spec.first_row, ws.max_row + 1):
+        value = ws.cell(r, spec.value_column).value
+        k = _norm(ws.cell(r, spec.key_column).value)
+
+        if not k or value is None:
+            continue
+
+        mapping[k] = str(value)
+
+    _LOOKUPS.put(key, mapping)
+    return mapping
+
+
+# ------------------------------------------------------------
+# 検収簿 → ページごとの明細
+# ------------------------------------------------------------
+def _read_lines(definition: SupplierDefinition, facility: FacilitySpec, kenshu_xlsx_path):
+    """(ページのキー, 明細の DataFrame) を、ページの順に返す。"""
+    with stage("pd.read_excel"):
+        df = pd.read_excel(Path(kenshu_xlsx_path))
+
+    with stage("compact_kenshu_frame"):
+        df = compact_kenshu_frame(df)
+
+    missing = [c for c in definition.required_columns if c not in df.columns]
+
+    if missing:
+        raise KeyError(definition.required_message.format(columns="、".join(missing)))
+
+    df["仕入先"] = text_values(df["仕入先"])
+    df = df[df["仕入先"] == definition.supplier]
+
+    for col in definition.drop_blank:
+        df = df[df[col].notna()]
+
+    if df.empty:
+        raise ValueError(definition.not_found_message)
+
+    missing = [c for c in facility.quantities if c not in df.columns]
+
+    if missing:
+        raise KeyError(facility.missing_message.format(columns="、".join(missing)))
+
+    qty_cols = list(facility.quantities)
+
+    for col in qty_cols:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+
+    # ページのキーは文字列（カテゴリ型のコード）でまとめる
+    for col in definition.page_by:
+        df[col] = text_values(df[col], strip=False)
+
+    page_by = list(definition.page_by)
+    keys = page_by + list(definition.line_by)
+
+    pages = OrderedDict()
+
+    if definition.keep_empty_pages:
+        # 数量がなくても、キーがあればページを作る
+        for page_key in df.groupby(page_by, sort=True, observed=True).size().index:
+            pages[page_key if isinstance(page_key, tuple) else (page_key,)] = []
+
+    df = df[(df[qty_cols] != 0).any(axis=1)]
+
+    if df.empty and definition.no_quantity_message:
+        raise ValueError(definition.no_quantity_message)
+
+    with stage("groupby"):
+        lines = (
+            df.groupby(keys, dropna=False, observed=True)[qty_cols]
+            .sum()
+            .reset_index()
+        )
+
+    # 打ち消し合う行（+x と -x）は、指定がなければ数量なしの明細として残す
+    if definition.drop_zero_lines:
+        lines = lines[(lines[qty_cols] != 0).any(axis=1)]
+
+    if definition.page_sort:
+        sort_cols = []
+
+        for col, kind in definition.page_sort:
+            if kind == "mmdd":
+                lines[f"{col}_dt"] = map_values(lines[col], _parse_mmdd)
+                sort_cols.append(f"{col}_dt")
+            else:
+                sort_cols.append(col)
+
+        lines = lines.sort_values(sort_cols, na_position="last")
+
+    lines = lines.reset_index(drop=True)
+
+    for i, page_key in enumerate(zip(*(lines[c] for c in page_by))):
+        pages.setdefault(page_key, []).append(i)
+
+    for page_key, rows in pages.items():
+        yield page_key, lines.iloc[rows]
+
+
+def _field_value(spec: FieldSpec, line):
+    if spec.format == "quantity":
+        q = float(line[spec.value[0]] or 0)
+        return q if q != 0 else None
+
+    if spec.format == "quantity_with_unit":
+        total = sum(float(line[c] or 0) for c in spec.value)
+        return _format_qty_with_unit(total, line[spec.unit])
+
+    value = line[spec.value[0]]
+
+    if spec.format == "norm":
+        return _norm(value)
+
+    if spec.format == "text_or_empty":
+        return str(value or "")
+
+    return str(value)
+
+
+def _write_fields(ws, row: int, fields: tuple, line) -> None:
+    for spec in fields:
+        ws.cell(row, spec.column).value = _field_value(spec, line)
+
+
+# ------------------------------------------------------------
+# ページ（シートの複製、または1シートへの積み重ね）
+# ------------------------------------------------------------
+def _copy_print_settings(base_ws, ws2) -> None:
+    ws2.sheet_format = copy(base_ws.sheet_format)
+    ws2.sheet_properties = copy(base_ws.sheet_properties)
+    ws2.print_options = copy(base_ws.print_options)
+    ws2.page_margins = copy(base_ws.page_margins)
+    ws2.page_setup = copy(base_ws.page_setup)
+
+    ws2.print_area = base_ws.print_area
+    ws2.print_title_rows = base_ws.print_title_rows
+    ws2.print_title_cols = base_ws.print_title_cols
+
+    for key, dim in base_ws.row_dimensions.items():
+        ws2.row_dimensions[key].height = dim.height
+        ws2.row_dimensions[key].hidden = dim.hidden
+        ws2.row_dimensions[key].outlineLevel = dim.outlineLevel
+
+    for key, dim in base_ws.column_dimensions.items():
+        ws2.column_dimensions[key].width = dim.width
+        ws2.column_dimensions[key].hidden = dim.hidden
+        ws2.column_dimensions[key].bestFit = dim.bestFit
+        ws2.column_dimensions[key].outline_level = dim.outline_level
+
+    # odd header / footer only
+    ws2.oddHeader.left.text = base_ws.oddHeader.left.text
+    ws2.oddHeader.center.text = base_ws.oddHeader.center.text
+    ws2.oddHeader.right.text = base_ws.oddHeader.right.text
+
+    ws2.oddFooter.left.text = base_ws.oddFooter.left.text
+    ws2.oddFooter.center.text = base_ws.oddFooter.center.text
+    ws2.oddFooter.right.text = base_ws.oddFooter.right.text
+
+
+@traced()
+def _copy_sheet(wb, base_ws, title: str, copy_print_settings: bool):
+    ws = wb.copy_worksheet(base_ws)
+    ws.title = sanitize_sheet_title(title, set(wb.sheetnames))
+
+    if copy_print_settings:
+        _copy_print_settings(base_ws, ws)
+
+    return ws
+
+
+# テンプレートの1ページ分（1シートにまとめるとき、2ページ目からは
+# 同じシートの下へ値・書式・結合・行の高さを写す）
+@dataclass(frozen=True)
+class _TemplateBlock:
+    rows: int
+    cells: tuple       # (行, 列, 値, 書式)
+    merged: tuple      # (最小列, 最小行, 最大列, 最大行)
+    heights: tuple     # (行, 高さ)
+
+
+def _template_block(ws, rows: int) -> _TemplateBlock:
+    """消去済みのテンプレートから、1ページ分の内容を読む。"""
+    cells = tuple(
+        (cell.row, cell.column, cell.value, cell._style)
+        for row in ws.iter_rows()
+        for cell in row
+        if cell.has_style or cell.value is not None
+    )
+
+    merged = tuple(
+        rng.bounds
+        for rng in ws.merged_cells.ranges
+        if rng.max_row <= rows
+    )
+
+    heights = tuple(
+        (r, ws.row_dimensions[r].height)
+        for r in range(1, rows + 1)
+        if ws.row_dimensions[r].height is not None
+    )
+
+    return _TemplateBlock(rows, cells, merged, heights)
+
+
+@traced()
+def _stack_block(ws, block: _TemplateBlock, offset: int):
+    """テンプレートの1ページ分を offset 行下へ写す（copy_worksheet と同じく書式は複製）。"""
+    for row, col, value, style in block.cells:
+        cell = ws.cell(row + offset, col)
+        cell._style = copy(style)
+
+        if isinstance(value, str) and value.startswith("="):
+            value = Translator(
+                value,
+                origin=f"{get_column_letter(col)}{row}",
+            ).translate_formula(row_delta=offset)
+
+        if value is not None:
+            cell.value = value
+
+    for min_col, min_row, max_col, max_row in block.merged:
+        ws.merge_cells(
+            start_row=min_row + offset,
+            start_column=min_col,
+            end_row=max_row + offset,
+            end_column=max_col,
+        )
+
+    for row, height in block.heights:
+        ws.row_dimensions[row + offset].height = height
+
+
+def _finish_single_sheet(ws, block: _TemplateBlock, pages: int):
+    """ページの間の改ページと、全ページ分の印刷設定。"""
+    if pages == 0:
+        # 明細のない施設は、ページごとのシートと同じくテンプレートの設定のまま
+        # （印刷範囲を 0 行目までにすると、Excel が壊れた名前として扱う）
+        return
+
+    for page in range(1, pages):
+        ws.row_breaks.append(
+            Break(id=page * block.rows)
+        )
+
+    area = _print_area_bounds(ws)
+
+    if area is not None:
+        min_col, min_row, max_col, _max_row = area
+        ws.print_area = (
+            f"{get_column_letter(min_col)}{min_row}:"
+            f"{get_column_letter(max_col)}{pages * block.rows}"
+        )
+
+    # ページごとのシート（copy_worksheet は印刷タイトルを写さない）と同じく、
+    # 各ページに見出しを重ねて印刷しない。openpyxl には印刷タイトルを消す公開の
+    # 方法がない（print_title_rows は None を無視する）ため、読み込み時に設定される
+    # 属性を直接消す。requirements.txt で openpyxl の版を固定し、
+    # tests/test_supplier_templates.py で印刷タイトルが残らないことを確かめている。
+    ws._print_rows = None
+
+    # 1ページに収める設定なら、ページ数分の高さに広げる
+    setup = ws.sheet_properties.pageSetUpPr
+
+    if setup is not None and setup.fitToPage:
+        ws.page_setup.fitToHeight = (ws.page_setup.fitToHeight or 0) * pages
+
+
+class _Pages:
+    """新しいページを用意し、(シート, 行のずれ) を返す。"""
+
+    def __init__(self, wb, base_ws, definition: SupplierDefinition, facility: FacilitySpec,
+                 plan: FillPlan, layout: str):
+        self.wb = wb
+        self.base_ws = base_ws
+        self.definition = definition
+        self.facility = facility
+        self.single = layout == LAYOUT_SINGLE
+        self.block = _template_block(base_ws, plan.block_rows) if self.single else None
+        self.count = 0
+
+    def new(self, values: dict, continued: bool):
+        self.count += 1
+        values = {**values, "facility": self.facility.label, "page": self.count}
+
+        if not self.single:
+            title = self.definition.continued_title if continued else self.definition.title
+            ws = _copy_sheet(
+                self.wb,
+                self.base_ws,
+                _render_text(title, values),
+                self.definition.copy_print_settings,
+            )
+            offset = 0
+
+        elif self.count == 1:
+            # 1ページ目はテンプレートのシートをそのまま使う
+            ws = self.base_ws
+            offset = 0
+
+        else:
+            ws = self.base_ws
+            offset = (self.count - 1) * self.block.rows
+            _stack_block(ws, self.block, offset)
+
+        for coordinate, text in self.facility.cells:
+            ws[coordinate].offset(row=offset).value = _render_text(text, values)
+
+        return ws, offset
+
+    def finish(self):
+        if self.single:
+            _finish_single_sheet(self.base_ws, self.block, self.count)
+
+
+# ------------------------------------------------------------
+# 作成
+# ------------------------------------------------------------
+def fill_template_orders(
+    definition: SupplierDefinition,
+    kenshu_xlsx_path: str | Path,
+    template_xlsm_path: str | Path,
+    facility_mode: str,
+    out_path: str | Path,
+    lookup_paths: Optional[dict] = None,
+    layout: str = LAYOUT_SHEETS,
+) -> Path:
+    """定義に沿って、1施設分の発注書ブックを作成する。"""
+    facility = definition.facility(facility_mode)
+    template_xlsm_path = Path(template_xlsm_path)
+    out_path = Path(out_path)
+
+    pages = list(_read_lines(definition, facility, kenshu_xlsx_path))
+
+    lookups = {
+        spec.name: load_lookup(spec, (lookup_paths or {})[spec.name])
+        for spec in definition.lookups
+    }
+
+    with stage("load_workbook"):
+        wb = openpyxl.load_workbook(template_xlsm_path, keep_vba=True)
+
+    if facility.sheet not in wb.sheetnames:
+        raise KeyError(f"テンプレートに『{facility.sheet}』シートが見つかりません。")
+
+    base_ws = wb[facility.sheet]
+    plan = get_fill_plan(definition, facility, base_ws, _file_digest(template_xlsm_path))
+
+    # 消すセルはテンプレートで一度だけ消し、複製したシートには消去済みで写す
+    for r, c in plan.clear_cells:
+        base_ws.cell(r, c).value = None
+
+    fixed = definition.fixed_rows
+    lookup = lookups.get(fixed.lookup) if fixed is not None and fixed.lookup else None
+    writer = _Pages(wb, base_ws, definition, facility, plan, layout)
+    detail_rows = definition.detail_rows
+
+    for page_key, lines in pages:
+        values = dict(zip(definition.page_by, page_key))
+        ws, offset = writer.new({**values, "group_page": 1}, continued=False)
+
+        details = []
+
+        for _, line in lines.iterrows():
+            row = None
+
+            if fixed is not None:
+                key = _field_value(fixed.key, line)
+                if lookup is not None:
+                    key = lookup.get(_norm(key))
+                row = plan.fixed_rows.get(key)
+
+            if row is not None:
+                _write_fields(ws, row + offset, facility.fixed_fields, line)
+            else:
+                details.append(line)
+
+        for start in range(0, len(details), detail_rows):
+            if start:
+                ws, offset = writer.new(
+                    {**values, "group_page": start // detail_rows + 1},
+                    continued=True,
+                )
+
+            for i, line in enumerate(details[start:start + detail_rows]):
+                _write_fields(ws, definition.detail_first_row + offset + i, facility.fields, line)
+
+    writer.finish()
+
+    # ------------------------------------------------------------
+    # テンプレートのシート（1シートの出力では、それ自体が発注書）
+    # ------------------------------------------------------------
+    if definition.template_sheets == "hide":
+        for spec in definition.facilities:
+            if spec.sheet in wb.sheetnames and not (writer.single and spec.sheet == facility.sheet):
+                wb[spec.sheet].sheet_state = "hidden"
+
+    elif not writer.single:
+        wb.remove(base_ws)
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with stage("wb.save"):
+        save_workbook(wb, out_path)
+
+    return out_path
+
+
+def fill_template_orders_both_facilities(
+    definition: SupplierDefinition,
+    kenshu_xlsx_path: str | Path,
+    template_xlsm_path: str | Path,
+    out_dir: str | Path,
+    out_prefix: Optional[str] = None,
+    lookup_paths: Optional[dict] = None,
+    layout: str = LAYOUT_SHEETS,
+) -> tuple[Path, Path]:
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    prefix = out_prefix or definition.out_prefix
+    paths = []
+
+    for mode in FACILITY_MODES:
+        facility = definition.facility(mode)
+
+        with stage(facility.label):
+            paths.append(
+                fill_template_orders(
+                    definition,
+                    kenshu_xlsx_path=kenshu_xlsx_path,
+                    template_xlsm_path=template_xlsm_path,
+                    facility_mode=mode,
+                    out_path=out_dir / f"{prefix}_{facility.label}.xlsm",
+                    lookup_paths=lookup_paths,
+                    layout=layout,
+                )
+            )
+
+    return tuple(paths)
@@ -0,0 +1,18 @@
+import pytest
+
+from kenshu_frame import enable_copy_on_write
+from workbooks import generate_outputs, make_test_fixtures
+
+
+# アプリと同じく、作成処理は copy-on-write で動かす
+enable_copy_on_write()
+
+
+@pytest.fixture(scope="session")
+def fixtures(tmp_path_factory):
+    return make_test_fixtures(tmp_path_factory.mktemp("fixtures"))
+
+
+@pytest.fixture(scope="session")
+def outputs(fixtures, tmp_path_factory):
+    return generate_outputs(fixtures, tmp_path_factory.mktemp("outputs"))
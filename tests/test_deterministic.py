@@ -0,0 +1,60 @@
+"""決まった出力（IWATO_DETERMINISTIC_XLSX=1）では、ハッシュのシードが違っても
+同じバイト列になるか。設定は読み込み時に決まるため、別のプロセスで作る。"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+
+WORKBOOKS = Path(__file__).resolve().parent / "workbooks.py"
+
+
+def _generate(out_dir: Path, hash_seed: str) -> dict[str, bytes]:
+    env = {
+        **os.environ,
+        "IWATO_DETERMINISTIC_XLSX": "1",
+        "PYTHONHASHSEED": hash_seed,
+    }
+    env.pop("SOURCE_DATE_EPOCH", None)
+
+    subprocess.run([sys.executable, str(WORKBOOKS), str(out_dir)], env=env, check=True)
+
+    return {
+        path.name: path.read_bytes()
+        for path in sorted((out_dir / "outputs").iterdir())
+    }
+
+
+@pytest.fixture(scope="module")
+def generated(tmp_path_factory):
+    return [
+        _generate(tmp_path_factory.mktemp(f"seed{seed}"), seed)
+        for seed in ("1", "2")
+    ]
+
+
+def test_same_files(generated):
+    first, second = generated
+    assert sorted(first) == sorted(second)
+    assert len(first) == 9
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "proc.xlsx",
+        "journal.xlsx",
+        "order_t.xlsx",
+        "order_y.xlsx",
+        "vendor_orders.xlsx",
+        "maru_特養.xlsm",
+        "maru_ユーハウス.xlsm",
+        "hoku_特養.xlsm",
+        "hoku_ユーハウス.xlsm",
+    ],
+)
+def test_identical_bytes_across_hash_seeds(generated, name):
+    first, second = generated
+    assert first[name] == second[name]
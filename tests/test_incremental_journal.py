@@ -0,0 +1,96 @@
+"""② の差分作成：内容が同じ仕入先のシートは、前回の出力から作り直さずに使う。"""
+import io
+import zipfile
+
+import pandas as pd
+import pytest
+
+import parallel_sheets
+from create_inspection_forms import prepare_vendor_journal_frame
+from incremental_journal import JournalManifest, render_vendor_journal
+from instrumentation import trace
+from workbooks import snapshot
+from xlsx_parts import sheet_paths
+
+
+@pytest.fixture(scope="module")
+def journal_df(outputs):
+    return prepare_vendor_journal_frame(pd.read_excel(outputs["proc.xlsx"]))
+
+
+@pytest.fixture(scope="module")
+def previous(journal_df):
+    data, manifest, summary = render_vendor_journal(journal_df)
+    assert summary.rendered == summary.sheet_count
+    return data, manifest
+
+
+@pytest.fixture(scope="module")
+def changed_df(journal_df):
+    # 先頭の行の数量だけを変える（1社分だけが変わる）
+    df = journal_df.copy()
+    df.loc[df.index[0], "総合計"] += 1
+    return df
+
+
+def _sheets_xml(data: bytes) -> dict[str, bytes]:
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return {name: zf.read(path) for name, path in sheet_paths(zf)}
+
+
+def test_only_changed_vendor_is_rendered(previous, changed_df):
+    data, manifest, summary = render_vendor_journal(changed_df, previous)
+
+    changed = {
+        name for name, digest in manifest.sheet_hashes.items()
+        if previous[1].sheet_hashes[name] != digest
+    }
+
+    assert len(changed) == 1
+    assert summary.rendered == 1
+    assert summary.reused == summary.sheet_count - 1
+
+    # 作り直さなかったシートは、前回の出力の XML そのまま
+    before, after = _sheets_xml(previous[0]), _sheets_xml(data)
+    for name in manifest.sheet_hashes:
+        if name not in changed:
+            assert after[name] == before[name], name
+
+
+def test_incremental_output_matches_full_render(previous, changed_df):
+    incremental, _, _ = render_vendor_journal(changed_df, previous)
+    full, _, _ = render_vendor_journal(changed_df)
+
+    assert snapshot(io.BytesIO(incremental)) == snapshot(io.BytesIO(full))
+
+
+def test_same_input_rebuilds_one_sheet(previous, journal_df):
+    _, _, summary = render_vendor_journal(journal_df, previous)
+
+    # 書式の一覧をそろえるため、1シートだけは作り直す
+    assert summary.rendered == 1
+
+
+def test_other_code_version_rebuilds_everything(previous, changed_df):
+    stale = (previous[0], JournalManifest("other", previous[1].sheet_hashes))
+    _, _, summary = render_vendor_journal(changed_df, stale)
+
+    assert summary.rendered == summary.sheet_count
+
+
+def test_parallel_render_matches_sequential(previous, journal_df, monkeypatch):
+    """作り直すシートを子プロセスで作っても、順に作ったときと同じ内容になる。"""
+    df = journal_df.copy()
+    for i in (0, len(df) // 2, len(df) - 1):
+        df.loc[df.index[i], "総合計"] += 1
+
+    sequential, _, _ = render_vendor_journal(df, previous)
+
+    monkeypatch.setattr(parallel_sheets, "SHEET_WORKERS", 2)
+    monkeypatch.setattr(parallel_sheets, "PARALLEL_MIN_ROWS", 0)
+    with trace("test") as t:
+        parallel, _, summary = render_vendor_journal(df, previous)
+
+    assert summary.rendered > 1
+    assert "sheets.splice" in t.stages
+    assert snapshot(io.BytesIO(parallel)) == snapshot(io.BytesIO(sequential))
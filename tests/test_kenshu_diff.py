@@ -0,0 +1,118 @@
+"""訂正版との差分（追加・変更・取消）。"""
+import io
+
+import pandas as pd
+import pytest
+
+from kenshu_diff import ADDED, CHANGED, REMOVED, create_delta_order_workbook, diff_kenshu
+
+
+TOKUYOU = "特養（介護老人福祉施設いわと）"
+
+COLUMNS = ["使用日", "朝昼夕", "仕入先", "食品名", "単位", "特養入所者", "特養職員"]
+
+
+def _frame(rows) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+OLD = _frame(
+    [
+        ("12/1金", "朝食", "A商店", "にんじん", "kg", 1, 0),
+        ("12/1金", "朝食", "A商店", "たまねぎ", "kg", 2, 0),
+        # 同じキーの行（朝昼夕だけ違う）は合計してから比べる
+        ("12/1金", "昼食", "A商店", "たまねぎ", "kg", 1, 1),
+        ("12/2土", "朝食", "B商店", "牛乳", "本", 4, 0),
+    ]
+)
+
+NEW = _frame(
+    [
+        ("12/1金", "朝食", "A商店", "にんじん", "kg", 1, 0),
+        ("12/1金", "朝食", "A商店", "たまねぎ", "kg", 3, 2),
+        ("12/2土", "朝食", "B商店", "卵", "個", 0, 2),
+        # 数量がすべて0の行は、注文がないものとして扱う
+        ("12/2土", "朝食", "B商店", "豆腐", "丁", 0, 0),
+    ]
+)
+
+
+@pytest.fixture
+def delta():
+    return diff_kenshu(OLD, NEW, TOKUYOU).set_index("食品名")
+
+
+def test_only_changed_lines(delta):
+    assert sorted(delta.index) == ["たまねぎ", "卵", "牛乳"]
+
+
+def test_added(delta):
+    row = delta.loc["卵"]
+    assert row["区分"] == ADDED
+    assert (row["特養入所者"], row["特養職員"]) == (0, 2)
+    assert row["備考欄"] == ADDED
+
+
+def test_changed_sums_same_key_and_notes_previous(delta):
+    row = delta.loc["たまねぎ"]
+    assert row["区分"] == CHANGED
+    assert (row["特養入所者"], row["特養職員"]) == (3, 2)
+    assert row["備考欄"] == "変更（前回 入所者 3・職員 1）"
+
+
+def test_removed_orders_nothing_and_notes_previous(delta):
+    row = delta.loc["牛乳"]
+    assert row["区分"] == REMOVED
+    assert (row["特養入所者"], row["特養職員"]) == (0, 0)
+    assert row["備考欄"] == "取消（前回 入所者 4・職員 0）"
+
+
+def test_no_difference():
+    assert diff_kenshu(OLD, OLD.copy(), TOKUYOU).empty
+
+
+def test_delta_order_workbook_from_processed_sheet(outputs, tmp_path):
+    processed = outputs["proc.xlsx"]
+    df = pd.read_excel(processed)
+
+    first = df["特養入所者"].first_valid_index()
+    df.loc[first, "特養入所者"] += 1
+    corrected = tmp_path / "検収簿_加工済_訂正.xlsx"
+    df.to_excel(corrected, index=False)
+
+    data, file_name, summary = create_delta_order_workbook(processed, corrected, TOKUYOU)
+
+    assert (summary.added, summary.changed, summary.removed) == (0, 1, 0)
+    assert summary.suppliers == (df.loc[:first, "仕入先"].ffill().iloc[-1],)
+    assert file_name.startswith("注文書_差分_")
+    assert data[:2] == b"PK"
+
+
+def test_delta_order_workbook_without_changes(outputs):
+    processed = outputs["proc.xlsx"]
+
+    with pytest.raises(ValueError):
+        create_delta_order_workbook(processed, processed, TOKUYOU)
+
+
+def test_delta_order_workbook_writes_zero_for_removed(outputs, tmp_path):
+    processed = outputs["proc.xlsx"]
+    df = pd.read_excel(processed)
+
+    first = df["特養入所者"].first_valid_index()
+    food = df.loc[first, "食品名"]
+    df.loc[df["食品名"] == food, ["特養入所者", "特養職員"]] = 0
+    corrected = tmp_path / "検収簿_加工済_訂正.xlsx"
+    df.to_excel(corrected, index=False)
+
+    data, _, summary = create_delta_order_workbook(processed, corrected, TOKUYOU)
+
+    assert summary.removed >= 1
+
+    sheets = pd.read_excel(io.BytesIO(data), sheet_name=None, header=None)
+    lines = pd.concat(sheets.values())
+    removed = lines[lines[1] == food]
+
+    assert not removed.empty
+    assert (removed[2] == 0).all() and (removed[4] == 0).all()
+    assert removed[10].str.startswith("取消（前回 入所者 ").all()
@@ -0,0 +1,115 @@
+"""KenshuHistory の週ごとの集計が、加工済み検収簿から直接集計した値と一致するか。"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from kenshu_history import KenshuHistory, infer_usage_date
+
+
+INGESTED_AT = datetime(2000, 12, 3, 9, 0)
+
+QUANTITIES = ["特養入所者", "特養職員", "ユーハウス"]
+
+
+def _expected_weekly(df: pd.DataFrame, reference) -> pd.DataFrame:
+    """加工済み検収簿から、仕入先 × 週（月曜始まり）の合計を pandas で求める。"""
+    dates = df["使用日"].map(lambda v: infer_usage_date(v, reference) if pd.notna(v) else None)
+    rows = pd.DataFrame(
+        {
+            "週": dates.map(lambda d: (d - timedelta(days=d.weekday())).isoformat() if d else None),
+            "仕入先": df["仕入先"].astype(object).where(df["仕入先"].notna(), "").astype(str).str.strip(),
+            **{c: pd.to_numeric(df[c], errors="coerce").fillna(0) for c in QUANTITIES},
+        }
+    ).dropna(subset=["週"])
+
+    totals = rows.groupby(["週", "仕入先"]).agg(
+        **{c: (c, "sum") for c in QUANTITIES},
+        行数=("仕入先", "size"),
+    )
+    return totals.reset_index().sort_values(["週", "仕入先"]).reset_index(drop=True)
+
+
+def _actual_weekly(history: KenshuHistory) -> pd.DataFrame:
+    return history.weekly_totals().sort_values(["週", "仕入先"]).reset_index(drop=True)
+
+
+@pytest.fixture
+def processed(outputs):
+    return pd.read_excel(outputs["proc.xlsx"])
+
+
+@pytest.fixture
+def history(tmp_path):
+    return KenshuHistory(str(tmp_path / "history.db"))
+
+
+def test_weekly_totals_match_processed_sheet(history, processed):
+    record = history.record(processed, "proc.xlsx", INGESTED_AT)
+
+    assert record.created
+    assert record.row_count == len(processed)
+
+    pd.testing.assert_frame_equal(
+        _actual_weekly(history),
+        _expected_weekly(processed, INGESTED_AT.date()),
+        check_dtype=False,
+    )
+
+
+def test_same_content_is_recorded_once(history, processed):
+    first = history.record(processed, "proc.xlsx", INGESTED_AT)
+    second = history.record(processed.copy(), "proc_copy.xlsx", INGESTED_AT + timedelta(hours=1))
+
+    assert not second.created
+    assert second.ingest_id == first.ingest_id
+    assert len(history.ingests()) == 1
+
+
+def test_corrected_sheet_replaces_weekly_totals(history, processed):
+    history.record(processed, "proc.xlsx", INGESTED_AT)
+
+    corrected = processed.copy()
+    first = corrected["特養入所者"].first_valid_index()
+    corrected.loc[first, "特養入所者"] += 1
+
+    record = history.record(corrected, "proc_訂正.xlsx", INGESTED_AT + timedelta(hours=1))
+
+    assert record.created
+    pd.testing.assert_frame_equal(
+        _actual_weekly(history),
+        _expected_weekly(corrected, INGESTED_AT.date()),
+        check_dtype=False,
+    )
+
+    # 集計表を全期間作り直しても同じ
+    history.rebuild_weekly()
+    pd.testing.assert_frame_equal(
+        _actual_weekly(history),
+        _expected_weekly(corrected, INGESTED_AT.date()),
+        check_dtype=False,
+    )
+
+
+def test_search_skips_lines_without_quantity(history, processed):
+    """検収簿に載っていても数量のない行は、最後の注文として出さない。"""
+    df = processed.copy()
+    df["仕入先"] = df["仕入先"].ffill()
+    df["使用日"] = df["使用日"].ffill()
+
+    # いちばん多くの使用日に載っている食品の、最後の使用日の行を注文なしにする
+    food = df.groupby("食品名")["使用日"].nunique().idxmax()
+    rows = df["食品名"] == food
+    dates = df.loc[rows, "使用日"].map(lambda v: infer_usage_date(v, INGESTED_AT.date()))
+    latest = df.loc[dates.idxmax(), "使用日"]
+    unordered = rows & (df["使用日"] == latest)
+    df.loc[unordered, QUANTITIES] = 0
+    df.loc[unordered, "特養職員"] = None
+
+    history.record(df, "proc.xlsx", INGESTED_AT)
+    lines = history.search(food)
+    lines = lines[lines["食品名"] == food]
+
+    assert len(lines) == rows.sum() - unordered.sum()
+    assert lines.iloc[0]["使用日"] != latest
+    assert (lines[QUANTITIES].fillna(0) != 0).any(axis=1).all()
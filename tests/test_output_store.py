@@ -0,0 +1,76 @@
+"""作成済みファイルの保存場所：容量の合計は保存のたびにディレクトリを見ずに数える。"""
+import os
+import time
+
+import pytest
+
+import output_store
+from output_store import OutputStore
+
+
+def _disk_bytes(store: OutputStore) -> int:
+    return sum(p.stat().st_size for p in store.root.glob("*/*"))
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    calls = []
+    evict = OutputStore._evict_locked
+
+    def counted(self):
+        calls.append(self)
+        evict(self)
+
+    monkeypatch.setattr(OutputStore, "_evict_locked", counted)
+    return calls
+
+
+def test_put_does_not_scan_within_budget(tmp_path, scans):
+    store = OutputStore(tmp_path, max_total_bytes=1000)
+    assert len(scans) == 1  # 起動時
+
+    store.put_bytes(b"a" * 100, "a.xlsx")
+    store.put_bytes(b"b" * 100, "b.xlsx")
+    store.put_bytes(b"a" * 100, "a2.xlsx")  # 同じ内容は数えない
+
+    src = tmp_path / "c.xlsx"
+    src.write_bytes(b"c" * 50)
+    store.put_file(src)
+
+    assert len(scans) == 1
+    assert store._total_bytes == _disk_bytes(store) == 250
+
+
+def test_over_budget_removes_oldest(tmp_path, scans):
+    store = OutputStore(tmp_path, max_total_bytes=250)
+
+    handles = []
+    for i, name in enumerate("abc"):
+        handle = store.put_bytes(name.encode() * 100, f"{name}.xlsx")
+        path = store._path(handle.digest)
+        os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+        handles.append(handle)
+
+    assert len(scans) == 2  # 起動時と、3つ目で容量を超えたとき
+    assert [store.exists(h) for h in handles] == [False, True, True]
+    assert store._total_bytes == _disk_bytes(store) == 200
+
+
+def test_startup_and_interval_scan_expire_files(tmp_path, monkeypatch):
+    store = OutputStore(tmp_path, ttl_seconds=60)
+    old = store.put_bytes(b"old", "old.xlsx")
+    past = time.time() - 120
+    os.utime(store._path(old.digest), (past, past))
+
+    # 起動時に見直す
+    assert not OutputStore(tmp_path, ttl_seconds=60).exists(old)
+
+    # 一定の間隔が過ぎた後の保存でも見直す
+    old = store.put_bytes(b"old", "old.xlsx")
+    os.utime(store._path(old.digest), (past, past))
+    monkeypatch.setattr(output_store, "SCAN_INTERVAL_SECONDS", 0)
+
+    store.put_bytes(b"new", "new.xlsx")
+
+    assert not store.exists(old)
+    assert store._total_bytes == _disk_bytes(store) == 3
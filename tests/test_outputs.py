@@ -0,0 +1,71 @@
+"""①～⑤・業者別発注書の出力が、基準（golden/outputs.json）とセルごとに一致するか。
+
+基準は、処理を速くする変更の前の作成処理で同じ疑似データから作ったもの。
+出力を意図して変えたときは IWATO_UPDATE_GOLDEN=1 で実行して作り直す。
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from workbooks import load_golden, snapshot, write_golden
+
+
+GOLDEN = load_golden()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def update_golden(outputs):
+    if os.environ.get("IWATO_UPDATE_GOLDEN") == "1":
+        write_golden(outputs)
+        pytest.skip("golden/outputs.json を作り直しました")
+
+
+def test_all_outputs_have_a_baseline(outputs):
+    assert sorted(outputs) == sorted(GOLDEN)
+
+
+@pytest.mark.parametrize("name", sorted(GOLDEN))
+def test_output_matches_baseline(outputs, name):
+    expected = GOLDEN[name]
+    actual = snapshot(outputs[name])
+
+    assert actual["sheets"] == expected["sheets"]
+
+    for sheet, want in expected["sheet"].items():
+        got = actual["sheet"][sheet]
+
+        for key in want:
+            if key == "rows":
+                continue
+            assert got[key] == want[key], f"{name} / {sheet} の {key}"
+
+        for row, (a, b) in enumerate(zip(got["rows"], want["rows"]), start=1):
+            assert a == b, f"{name} / {sheet} の {row} 行目のセルが基準と違います"
+
+
+def test_hokubu_keeps_offsetting_lines(outputs, fixtures, tmp_path):
+    """同じ品目の +x と -x は、まとめて0になっても明細に残す（数量は空欄）。"""
+    from create_order_form_hokubu import (
+        SUPPLIER_NAME,
+        generate_hokubu_order_forms_both_facilities,
+    )
+
+    df = pd.read_excel(outputs["proc.xlsx"])
+    row = df[df["仕入先"] == SUPPLIER_NAME].iloc[0]
+
+    plus, minus = row.copy(), row.copy()
+    plus["食品名"] = minus["食品名"] = "相殺テスト品"
+    for col in ["特養入所者", "特養職員", "ユーハウス"]:
+        plus[col], minus[col] = 5, -5
+
+    kenshu = tmp_path / "kenshu.xlsx"
+    pd.concat([df, pd.DataFrame([plus, minus])], ignore_index=True).to_excel(kenshu, index=False)
+
+    for path in generate_hokubu_order_forms_both_facilities(
+        kenshu, fixtures.hokubu_template, tmp_path, "hoku"
+    ):
+        sheets = pd.read_excel(path, sheet_name=None, header=None)
+        assert any(
+            (sheet == "相殺テスト品").any().any() for sheet in sheets.values()
+        ), path.name
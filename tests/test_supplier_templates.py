@@ -0,0 +1,67 @@
+"""仕入先定義（suppliers/*.json）の読み込みと、テンプレート発注書の作成。"""
+import json
+import re
+import zipfile
+
+import openpyxl
+import pytest
+
+from supplier_templates import (
+    FACILITY_MODES,
+    LAYOUT_SINGLE,
+    SUPPLIER_DIR,
+    load_definition,
+    parse_definition,
+)
+
+
+def _hokubu() -> dict:
+    return json.loads((SUPPLIER_DIR / "hokubu.json").read_text(encoding="utf-8"))
+
+
+def test_definitions_load():
+    definition = parse_definition("hokubu", json.dumps(_hokubu(), ensure_ascii=False))
+    assert [f.mode for f in definition.facilities] == ["tokuyou", "yuhouse"]
+
+
+def test_definition_needs_every_facility():
+    data = _hokubu()
+    del data["facilities"]["yuhouse"]
+
+    with pytest.raises(ValueError, match="hokubu.json の facilities"):
+        parse_definition("hokubu", json.dumps(data, ensure_ascii=False))
+
+
+def test_definition_with_facility_listed_twice():
+    text = (SUPPLIER_DIR / "hokubu.json").read_text(encoding="utf-8")
+    text = text.replace('"yuhouse": {', '"tokuyou": {', 1)
+
+    with pytest.raises(ValueError, match="hokubu.json に tokuyou が2回"):
+        parse_definition("hokubu", text)
+
+
+def test_single_layout_has_no_print_titles(outputs, fixtures, tmp_path):
+    """1シートの出力は各ページに見出しがあるため、テンプレートの印刷タイトルを残さない。"""
+    from create_order_form_hokubu import generate_hokubu_order_forms_both_facilities
+
+    wb = openpyxl.load_workbook(fixtures.hokubu_template, keep_vba=True)
+    for ws in wb.worksheets:
+        ws.print_title_rows = "1:6"
+    template = tmp_path / "template.xlsm"
+    wb.save(template)
+
+    definition = load_definition("hokubu")
+    paths = generate_hokubu_order_forms_both_facilities(
+        outputs["proc.xlsx"], template, tmp_path, "hoku", layout=LAYOUT_SINGLE
+    )
+
+    for mode, path in zip(FACILITY_MODES, paths):
+        with zipfile.ZipFile(path) as zf:
+            names = zf.read("xl/workbook.xml").decode("utf-8")
+
+        # もう一方の施設のテンプレートのシートは、テンプレートのまま残る
+        titles = re.findall(r'<definedName name="_xlnm.Print_Titles"[^>]*>([^<]*)<', names)
+        sheet = definition.facility(mode).sheet
+
+        assert titles
+        assert not [t for t in titles if t.startswith(f"'{sheet}'!")], path.name
@@ -0,0 +1,195 @@
+"""テスト用の出力ブックの作成と、セルごとの比較に使うスナップショット。
+
+python tests/workbooks.py OUT_DIR で、テスト用の疑似データから ①～⑤・業者別発注書の
+出力を OUT_DIR に作る（決まった出力のテストで、別のプロセスから呼ぶ）。
+"""
+import hashlib
+import json
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+import openpyxl
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.fixtures import FixtureSet, make_fixture_set  # noqa: E402
+
+
+# 4日分・5社。丸八・北部市場は使用日ごとに複数ページになる行数
+FIXTURE_ROWS = 600
+FIXTURE_VENDORS = 5
+FIXTURE_DAYS = 4
+
+GOLDEN_PATH = Path(__file__).resolve().parent / "golden" / "outputs.json"
+
+TOKUYOU = "特養（介護老人福祉施設いわと）"
+YUHOUSE = "ユーハウスいわと"
+
+
+def make_test_fixtures(out_dir: str | Path) -> FixtureSet:
+    return make_fixture_set(
+        out_dir,
+        rows=FIXTURE_ROWS,
+        vendor_count=FIXTURE_VENDORS,
+        days=FIXTURE_DAYS,
+    )
+
+
+def generate_outputs(fixtures: FixtureSet, out_dir: str | Path) -> dict[str, Path]:
+    """①～⑤・業者別発注書の出力を作り、{名前: パス} を返す。"""
+    from create_inspection_forms import (
+        create_order_workbook,
+        create_vendor_journal_workbook,
+        format_inspection_workbook,
+    )
+    from create_order_form_hokubu import generate_hokubu_order_forms_both_facilities
+    from create_order_form_maruhachi import generate_maruhachi_order_forms_both_facilities
+    from create_order_form_vendor_sheets import create_orders_from_vendor_sheets
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    outputs = {}
+
+    def put(name: str, data: bytes) -> Path:
+        path = out_dir / name
+        path.write_bytes(data)
+        outputs[name] = path
+        return path
+
+    processed = put("proc.xlsx", format_inspection_workbook(fixtures.raw_kenshu)[0])
+    journal = put("journal.xlsx", create_vendor_journal_workbook(processed)[0])
+    put("order_t.xlsx", create_order_workbook(processed, TOKUYOU)[0])
+    put("order_y.xlsx", create_order_workbook(processed, YUHOUSE)[0])
+    put("vendor_orders.xlsx", create_orders_from_vendor_sheets(journal, "いわと")[0])
+
+    for name, path in zip(
+        ("maru_特養.xlsm", "maru_ユーハウス.xlsm"),
+        generate_maruhachi_order_forms_both_facilities(
+            processed,
+            fixtures.maruhachi_template,
+            fixtures.maruhachi_tag,
+            out_dir,
+            "maru",
+        ),
+    ):
+        outputs[name] = Path(path)
+
+    for name, path in zip(
+        ("hoku_特養.xlsm", "hoku_ユーハウス.xlsm"),
+        generate_hokubu_order_forms_both_facilities(
+            processed,
+            fixtures.hokubu_template,
+            out_dir,
+            "hoku",
+        ),
+    ):
+        outputs[name] = Path(path)
+
+    return outputs
+
+
+# ------------------------------------------------------------
+# スナップショット
+# シートごとに、行ごとのセル（値・フォント・塗り・罫線・配置・表示形式）の
+# ハッシュと、シートの設定（印刷範囲・結合・列幅・改ページなど）を持つ。
+# 行ごとのハッシュなので、違いがあればどの行かが分かる。
+# ------------------------------------------------------------
+def _color(color):
+    if color is None:
+        return None
+    if color.type == "rgb":
+        return color.rgb
+    return (color.type, color.value, color.tint)
+
+
+def _value(value):
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _cell(cell) -> tuple:
+    font, fill, border, align = cell.font, cell.fill, cell.border, cell.alignment
+    return (
+        _value(cell.value),
+        font.name, font.sz, font.b, font.i, _color(font.color),
+        fill.fill_type, _color(fill.fgColor) if fill.fill_type else None,
+        border.left.style, border.right.style, border.top.style, border.bottom.style,
+        align.horizontal, align.vertical, align.wrap_text, align.shrink_to_fit,
+        cell.number_format,
+    )
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(repr(value).encode("utf-8")).hexdigest()[:16]
+
+
+def _sheet_snapshot(ws) -> dict:
+    setup = ws.page_setup
+    fit = ws.sheet_properties.pageSetUpPr
+
+    return {
+        "dims": [ws.max_row, ws.max_column],
+        "print_area": ws.print_area,
+        "print_title_rows": ws.print_title_rows,
+        "sheet_state": ws.sheet_state,
+        "freeze_panes": ws.freeze_panes,
+        "page_setup": [
+            setup.paperSize,
+            setup.orientation,
+            setup.fitToWidth,
+            setup.fitToHeight,
+            fit.fitToPage if fit is not None else None,
+            ws.print_options.horizontalCentered,
+            ws.page_margins.left,
+            ws.page_margins.top,
+        ],
+        "row_breaks": [b.id for b in ws.row_breaks.brk],
+        "merged": _digest(sorted(map(str, ws.merged_cells.ranges))),
+        "widths": _digest(sorted((k, v.width) for k, v in ws.column_dimensions.items())),
+        "heights": _digest(
+            sorted((k, v.height) for k, v in ws.row_dimensions.items() if v.height)
+        ),
+        "rows": [
+            _digest([_cell(ws.cell(r, c)) for c in range(1, ws.max_column + 1)])
+            for r in range(1, ws.max_row + 1)
+        ],
+    }
+
+
+def snapshot(path: str | Path) -> dict:
+    wb = openpyxl.load_workbook(path)
+    return {
+        "sheets": wb.sheetnames,
+        "sheet": {ws.title: _sheet_snapshot(ws) for ws in wb.worksheets},
+    }
+
+
+def load_golden() -> dict:
+    return json.loads(GOLDEN_PATH.read_text(encoding="utf-8"))
+
+
+def write_golden(outputs: dict[str, Path]) -> None:
+    GOLDEN_PATH.parent.mkdir(parents=True, exist_ok=True)
+    GOLDEN_PATH.write_text(
+        json.dumps(
+            {name: snapshot(path) for name, path in sorted(outputs.items())},
+            ensure_ascii=False,
+            indent=1,
+        )
+        + "\n",
+        encoding="utf-8",
+    )
+
+
+if __name__ == "__main__":
+    from kenshu_frame import enable_copy_on_write
+
+    enable_copy_on_write()
+    out = Path(sys.argv[1])
+    generate_outputs(make_test_fixtures(out / "fixtures"), out / "outputs")
@@ -0,0 +1,65 @@
+import streamlit as st
+
+from header_probe import mismatch_message, probe_workbook
+from result_cache import cached_call
+
+
+# ------------------------------------------------------------
+# 作成の実行（app3・pages/* で共通）
+# 同じファイル・同じ設定の結果があれば再利用し、同じ依頼が作成中なら
+# その結果を待つ。どちらもなければ共有プールで作成する
+# （混雑時は順番待ちの位置を表示）。
+# ------------------------------------------------------------
+def run_generation(label, fn, *args, uploads=(), options=None):
+    status = st.empty()
+
+    def show_position(position):
+        if position > 0:
+            status.info(
+                f"⏳ ほかの方の作成が終わるまでお待ちください（順番待ち {position} 番目）"
+            )
+        else:
+            status.empty()
+
+    try:
+        return cached_call(
+            label,
+            fn,
+            *args,
+            inputs=uploads,
+            options=options,
+            upload_sizes=[f.size for f in uploads if f is not None],
+            on_wait=show_position,
+            profile=st.session_state.get("profile_generation", False),
+        )
+    finally:
+        status.empty()
+
+
+# ------------------------------------------------------------
+# アップロードされたファイルの種類の確認
+# 先頭の数行だけで判定し、違う種類なら作成ボタンの前で知らせる。
+# 判定はファイルごとに1回だけ（再実行のたびに読み直さない）。
+# ------------------------------------------------------------
+def probe_upload(uploaded_file):
+    probes = st.session_state.setdefault("upload_probes", {})
+    result = probes.get(uploaded_file.file_id)
+
+    if result is None:
+        result = probe_workbook(uploaded_file)
+        probes[uploaded_file.file_id] = result
+
+    return result
+
+
+def upload_matches(uploaded_file, *expected):
+    if uploaded_file is None:
+        return False
+
+    message = mismatch_message(probe_upload(uploaded_file), expected)
+
+    if message is not None:
+        st.error(f"⚠ {message}")
+        return False
+
+    return True
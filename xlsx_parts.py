@@ -0,0 +1,164 @@
+import io
+import posixpath
+import re
+import zipfile
+from typing import Optional
+from xml.etree.ElementTree import fromstring, iterparse, tostring
+
+from xlsx_output import OutputZipFile
+
+
+# ------------------------------------------------------------
+# xlsx（zip）の中身を openpyxl を通さずに扱うための共通処理
+# ------------------------------------------------------------
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_CELL_STYLE = re.compile(rb'(<(?:c|row)\b[^>]*?\ss=")(\d+)(")')
+_COL_STYLE = re.compile(rb'(<col\b[^>]*?\sstyle=")(\d+)(")')
+
+
+def sheet_paths(zf: zipfile.ZipFile) -> list[tuple[str, str]]:
+    """(シート名, zip 内のシート XML のパス) をブックの並び順で返す。"""
+    with zf.open("xl/workbook.xml") as f:
+        sheets = [
+            (el.get("name"), el.get(f"{REL_NS}id"))
+            for _, el in iterparse(f)
+            if el.tag == f"{MAIN_NS}sheet"
+        ]
+
+    with zf.open("xl/_rels/workbook.xml.rels") as f:
+        targets = {
+            el.get("Id"): el.get("Target")
+            for _, el in iterparse(f)
+            if el.tag == f"{PKG_REL_NS}Relationship"
+        }
+
+    paths = []
+
+    for name, rel_id in sheets:
+        target = targets.get(rel_id)
+
+        if target is None:
+            paths.append((name, None))
+        elif target.startswith("/"):
+            paths.append((name, target.lstrip("/")))
+        else:
+            paths.append((name, posixpath.normpath(posixpath.join("xl", target))))
+
+    return paths
+
+
+# ------------------------------------------------------------
+# 別のブックからシートを差し込む
+# シートの XML が参照する書式番号（s="3" など）はブックごとに違う
+# 可能性があるため、書式の中身で対応を取り直してから差し込む。
+# ------------------------------------------------------------
+def _style_keys(styles_xml: bytes) -> list[str]:
+    """cellXfs の番号ごとに、参照先のフォント・罫線などを展開した文字列を返す。"""
+    root = fromstring(styles_xml)
+
+    def children(tag):
+        element = root.find(f"{MAIN_NS}{tag}")
+        return [] if element is None else list(element)
+
+    fonts = [tostring(e) for e in children("fonts")]
+    fills = [tostring(e) for e in children("fills")]
+    borders = [tostring(e) for e in children("borders")]
+    num_fmts = {e.get("numFmtId"): e.get("formatCode") for e in children("numFmts")}
+
+    keys = []
+
+    for xf in children("cellXfs"):
+        attrs = dict(xf.attrib)
+        font = fonts[int(attrs.pop("fontId", 0))]
+        fill = fills[int(attrs.pop("fillId", 0))]
+        border = borders[int(attrs.pop("borderId", 0))]
+        num_fmt_id = attrs.pop("numFmtId", "0")
+
+        keys.append(
+            repr(
+                (
+                    sorted(attrs.items()),
+                    font,
+                    fill,
+                    border,
+                    num_fmts.get(num_fmt_id, num_fmt_id),
+                    [tostring(c) for c in xf],
+                )
+            )
+        )
+
+    return keys
+
+
+def _style_map(source_styles: bytes, target_styles: bytes) -> dict[int, Optional[int]]:
+    """差し込む元の書式番号 → 差し込む先の書式番号（先のブックに無い書式は None）。"""
+    target_index = {key: i for i, key in reversed(list(enumerate(_style_keys(target_styles))))}
+
+    return {
+        i: target_index.get(key)
+        for i, key in enumerate(_style_keys(source_styles))
+    }
+
+
+def _remap_styles(sheet_xml: bytes, mapping: dict[int, Optional[int]]) -> Optional[bytes]:
+    missing = False
+
+    def replace(match):
+        nonlocal missing
+        new = mapping.get(int(match.group(2)))
+        if new is None:
+            missing = True
+            return match.group(0)
+        return match.group(1) + str(new).encode("ascii") + match.group(3)
+
+    sheet_xml = _CELL_STYLE.sub(replace, sheet_xml)
+    sheet_xml = _COL_STYLE.sub(replace, sheet_xml)
+
+    return None if missing else sheet_xml
+
+
+def splice_sheets(
+    target_bytes: bytes,
+    sources: list[tuple[bytes, set[str]]],
+) -> Optional[bytes]:
+    """target_bytes の仮シートを、sources の各ブックの同じ名前のシートで置き換える。
+
+    sources は (ブック, そのブックから取るシート名) の一覧。シートが見つからない、
+    または使っている書式が target 側に無いときは None を返す（呼び出し側で
+    すべてのシートを作り直す）。
+    """
+    with zipfile.ZipFile(io.BytesIO(target_bytes)) as target_zf:
+        target_paths = dict(sheet_paths(target_zf))
+        target_styles = target_zf.read("xl/styles.xml")
+        replacements = {}
+
+        for source_bytes, names in sources:
+            with zipfile.ZipFile(io.BytesIO(source_bytes)) as source_zf:
+                source_paths = dict(sheet_paths(source_zf))
+
+                mapping = _style_map(source_zf.read("xl/styles.xml"), target_styles)
+                identity = all(old == new for old, new in mapping.items())
+
+                for name in names:
+                    if name not in source_paths or name not in target_paths:
+                        return None
+
+                    sheet_xml = source_zf.read(source_paths[name])
+
+                    if not identity:
+                        sheet_xml = _remap_styles(sheet_xml, mapping)
+                        if sheet_xml is None:
+                            return None
+
+                    replacements[target_paths[name]] = sheet_xml
+
+        out = io.BytesIO()
+
+        with OutputZipFile(out, "w") as out_zf:
+            for info in target_zf.infolist():
+                out_zf.writestr(info, replacements.get(info.filename) or target_zf.read(info))
+
+    return out.getvalue()